@@ -1,6 +1,6 @@
 # models.py
 from db import Base
-from sqlalchemy import Column, Integer, Float, String, Text, DateTime, Numeric
+from sqlalchemy import Column, Integer, Float, String, Text, DateTime, Numeric, Index
 from sqlalchemy.sql import func
 
 # ---------- Orders (if you still need customer orders; keep for history) ----------
@@ -28,6 +28,9 @@ class Item(Base):
     floor_price = Column(Numeric(10, 2), default=0.0)
     # default owner number requested earlier; can be overridden per-item in DB
     store_owner_whatsapp = Column(String, nullable=True, default="+917499591914")
+    # recomputed nightly by replenishment.py; None -> DEFAULT_REORDER_THRESHOLD / legacy qty
+    reorder_point = Column(Integer, nullable=True, index=True)
+    reorder_qty = Column(Integer, nullable=True)
 
 # ---------- Pricing change log ----------
 class PriceChangeLog(Base):
@@ -54,6 +57,39 @@ class SupplierMessage(Base):
     supplier_id = Column(Integer)
     message_text = Column(Text)
     created_at = Column(DateTime, default=func.now())
+    parse_status = Column(String, nullable=True, index=True)  # None (pending) / regex / llm / unparsed
+
+# ---------- Structured quotes extracted once per supplier message ----------
+class SupplierQuote(Base):
+    __tablename__ = "supplier_quotes"
+    id = Column(Integer, primary_key=True, index=True)
+    message_id = Column(Integer, index=True)
+    supplier_id = Column(Integer, index=True)
+    item_key = Column(String, nullable=True)        # utils.item_key(item name), e.g. "rice"
+    price = Column(Numeric(10, 2), nullable=True)
+    price_max = Column(Numeric(10, 2), nullable=True)  # upper end of "₹40-45"
+    unit = Column(String, nullable=True)            # kg / litre / loaf / piece ...
+    min_qty = Column(Integer, nullable=True)        # bulk tier, e.g. orders > 100 kg
+    eta_days = Column(Integer, nullable=True)
+    source = Column(String, default="regex")        # regex / llm
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (Index("ix_supplier_quotes_item_price", "item_key", "price"),)
+
+# ---------- Inbound WhatsApp messages (webhook queue, MessageSid = idempotency key) ----------
+class InboundMessage(Base):
+    __tablename__ = "inbound_messages"
+    id = Column(Integer, primary_key=True, index=True)
+    message_sid = Column(String, unique=True, nullable=False)
+    sender = Column(String, index=True)
+    body = Column(Text)
+    status = Column(String, default="queued", index=True)  # queued / processing / done / failed
+    reply = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    received_at = Column(DateTime(timezone=True), server_default=func.now())
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+    owner = Column(String, nullable=True)                         # process that claimed it (queued -> processing)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
 
 # ---------- Sales history ----------
 class SalesHistory(Base):
@@ -73,3 +109,27 @@ class RestockAlertLog(Base):
     qty = Column(Integer)  # current qty at alert time
     provider_sid = Column(String, nullable=True)  # Twilio message SID
     note = Column(Text, nullable=True)
+
+# ---------- Scheduler: shard leases (leader election) and run history, see scheduler.py ----------
+class JobLease(Base):
+    __tablename__ = "job_leases"
+    name = Column(String, primary_key=True)     # "<job>:<shard>" or "worker:<owner>" heartbeat
+    owner = Column(String, nullable=False)      # host:pid:nonce
+    expires_at = Column(DateTime, nullable=False)
+
+class JobRun(Base):
+    __tablename__ = "job_runs"
+    id = Column(Integer, primary_key=True, index=True)
+    job_name = Column(String, nullable=False)
+    shard = Column(Integer, default=0)
+    shards = Column(Integer, default=1)
+    owner = Column(String)
+    scheduled_for = Column(DateTime)            # slot this run covers (catch-up runs keep the missed slot)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime, nullable=True)
+    duration_ms = Column(Float, nullable=True)
+    status = Column(String, default="running")  # running / ok / error
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+
+    __table_args__ = (Index("ix_job_runs_job_shard_slot", "job_name", "shard", "scheduled_for"),)
@@ -8,11 +8,14 @@ OPENROUTER_API_KEY = a
 URL = "https://openrouter.ai/api/v1/chat/completions"
 headers = {"Authorization": f"Bearer {a}"}
 
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+
 def llm(prompt):
     res = requests.post(URL, json={
         "model": "openai/gpt-4o-mini",
         "messages": [{"role": "user", "content": prompt}]
-    }, headers=headers)
+    }, headers=headers, timeout=LLM_TIMEOUT)
+    res.raise_for_status()
     return res.json()["choices"][0]["message"]["content"]
 
 def forecast(ts, stock, lead, name):
@@ -2,17 +2,23 @@
 import os
 import json
 import time
+import hashlib
 import asyncio
+import datetime
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
-from typing import Optional
+from typing import Optional, List
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Body, Depends, Request, Response
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import func, or_
 from sqlalchemy.orm import sessionmaker
 
 # DB + models (keep your actual file name; many of your snippets used MODELS)
-from db import engine
+from db import engine, Base
 from MODELS import (
     Item,
     SalesHistory,
@@ -21,6 +27,8 @@ from MODELS import (
     RestockAlertLog,
     PriceChangeLog,
     Order,
+    InboundMessage,
+    SupplierQuote,
 )
 
 # Keep the imports/assignments you insisted on exactly as-is
@@ -28,26 +36,46 @@ from auth_utils import create_access_token, get_current_user
 from testing import STOCK_MONITOR_INTERVAL as j
 from testing import DEFAULT_REORDER_THRESHOLD as k
 from testing import ALERT_SUPPRESSION_SECONDS as l
-from utils import recommend_supplier, score_supplier, parse_price, parse_eta
+from utils import recommend_supplier, score_supplier
+from quotes import (
+    quotes_for_item,
+    record_supplier_message,
+    find_supplier_by_number,
+    pending_llm_count,
+    llm_extract_pending,
+    LLM_BATCH_SIZE,
+)
 SessionLocal = sessionmaker(bind=engine)
 STOCK_MONITOR_INTERVAL = j  # seconds
 DEFAULT_REORDER_THRESHOLD = k
 ALERT_SUPPRESSION_SECONDS = l
+# set to 0 on API workers when a dedicated `python daily.py` process runs the jobs
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+SCHEDULER_SHARDS = int(os.getenv("SCHEDULER_SHARDS", "4"))
 
 # LLM / RAG / WhatsApp helpers
 from langchain_agents import (
     get_llm,
-    make_retrieval_qa_chain,
     make_forecast_chain,
     make_pricing_chain,
     load_faiss,
     combine_docs,
+    make_answer_chain,
+    batch_similarity_search,
+    pack_context,
+    context_budget,
+    VSTORE_DIR,
 )
+from coalesce import SingleFlight, normalize_question
+import scheduler
+from replenishment import run_replenishment
+from webhook_queue import SenderOrderedPool
 from whatsapp import send_whatsapp, normalize_phone_number
 
 # Twilio imports for webhook/sending (twilio client created conditionally)
 from twilio.twiml.messaging_response import MessagingResponse
 from twilio.rest import Client as TwilioClient
+from twilio.request_validator import RequestValidator
 
 # Try to import testing Twilio values (optional)
 try:
@@ -114,104 +142,165 @@ def login(data: LoginRequest):
 # Helper: fetch supplier messages for an item name (simple DB search)
 # -----------------------
 def fetch_supplier_messages_for_item(db, item_name: str, k: int = 10):
-    msgs = db.query(SupplierMessage).filter(SupplierMessage.message_text.ilike(f"%{item_name}%")).all()
-    out = []
-    for m in msgs:
-        txt = (m.message_text or "").strip()
-        price = parse_price(txt)
-        eta = parse_eta(txt)
-        out.append({"supplier_id": m.supplier_id, "excerpt": txt, "parsed_price": price, "parsed_eta": eta})
-    return out
+    # quotes were extracted when the message arrived (quotes.py) — this is an indexed lookup
+    return quotes_for_item(db, item_name, limit=k)
 
 
 # -----------------------
-# Stock monitor (background task)
+# Helper: inbound supplier messages (quote extraction happens here, once)
 # -----------------------
-async def stock_monitor_loop():
-    print("Stock monitor starting — will send restock orders to suppliers when needed.")
-    while True:
-        try:
-            db = SessionLocal()
-            items = db.query(Item).all()
-            for it in items:
-                cur_stock = int(it.stock or 0)
-                reorder_thresh = getattr(it, "reorder_threshold", None) or DEFAULT_REORDER_THRESHOLD
-
-                if cur_stock <= reorder_thresh:
-                    # suppression check
-                    recent = (
-                        db.query(RestockAlertLog)
-                        .filter(RestockAlertLog.item_id == it.item_id)
-                        .order_by(RestockAlertLog.alert_sent_at.desc())
-                        .first()
-                    )
-                    already_alerted = False
-                    if recent and recent.alert_sent_at:
-                        elapsed = time.time() - recent.alert_sent_at.timestamp()
-                        if elapsed < ALERT_SUPPRESSION_SECONDS:
-                            already_alerted = True
-
-                    if already_alerted:
-                        continue
-
-                    # choose supplier candidates
-                    cand_rows = fetch_supplier_messages_for_item(db, it.name, k=10)
-                    if not cand_rows:
-                        sups = db.query(Supplier).all()
-                        cand_rows = [{"supplier_id": s.supplier_id, "excerpt": "", "parsed_price": None, "parsed_eta": None} for s in sups]
-
-                    best = recommend_supplier(cand_rows) if cand_rows else None
-                    chosen_supplier = None
-                    if best:
-                        chosen_supplier = db.query(Supplier).filter(Supplier.supplier_id == best["supplier_id"]).first()
-                    else:
-                        chosen_supplier = db.query(Supplier).first()
-
-                    if not chosen_supplier:
-                        print(f"No supplier found to order item {it.name} (id={it.item_id})")
-                        log = RestockAlertLog(item_id=it.item_id, supplier_id=None, qty=cur_stock, note="no_supplier_found")
-                        db.add(log)
-                        db.commit()
-                        continue
-
-                    order_qty = it.reorder_qty if getattr(it, "reorder_qty", None) is not None else max(it.lead_time_days * 10, reorder_thresh * 3)
-                    msg = (
-                        f"Hello {chosen_supplier.name},\n"
-                        f"This is an automated restock request for store item: {it.name}.\n"
-                        f"Needed qty: {order_qty}\n"
-                        f"Current stock: {cur_stock}\n"
-                        f"Please confirm availability, price and ETA.\n"
-                    )
+def handle_supplier_message(sender: str, text: str, on_pending_batch=None):
+    """
+    If `sender` is a known supplier, store the message with its extracted quotes and
+    return an acknowledgement; returns None for non-supplier senders.
+    on_pending_batch() is called once enough regex-unparsed messages wait for the LLM pass.
+    """
+    db = SessionLocal()
+    try:
+        supplier = find_supplier_by_number(db, sender)
+        if not supplier:
+            return None
+        msg, quotes = record_supplier_message(db, supplier.supplier_id, text)
+        if not quotes and on_pending_batch is not None and pending_llm_count(db) >= LLM_BATCH_SIZE:
+            on_pending_batch()
+        return f"Thanks {supplier.name}, noted {len(quotes)} quote(s)." if quotes else f"Thanks {supplier.name}, message received."
+    finally:
+        db.close()
 
-                    try:
-                        resp = send_whatsapp(chosen_supplier.whatsapp_number, msg)
-                        provider_sid = resp.get("sid") if isinstance(resp, dict) else None
-                        log = RestockAlertLog(item_id=it.item_id, supplier_id=chosen_supplier.supplier_id, qty=cur_stock, provider_sid=provider_sid, note=f"sent_to_supplier:{chosen_supplier.whatsapp_number}")
-                        db.add(log)
-                        db.commit()
-                        print(f"Sent restock order for {it.name} to supplier {chosen_supplier.name} ({chosen_supplier.whatsapp_number}), sid={provider_sid}")
-                    except Exception as e:
-                        db.rollback()
-                        print("Failed to send restock order:", e)
-                        log = RestockAlertLog(item_id=it.item_id, supplier_id=chosen_supplier.supplier_id if chosen_supplier else None, qty=cur_stock, provider_sid=None, note=f"send_failed:{str(e)}")
-                        db.add(log)
-                        db.commit()
 
-            db.close()
+# -----------------------
+# Reorder policy (stored per item by replenishment.py; legacy rule until first run)
+# -----------------------
+def reorder_point_of(it) -> int:
+    return it.reorder_point if it.reorder_point is not None else DEFAULT_REORDER_THRESHOLD
+
+
+def reorder_qty_of(it) -> int:
+    if it.reorder_qty is not None:
+        return it.reorder_qty
+    return max((it.lead_time_days or 1) * 10, reorder_point_of(it) * 3)
+
+
+def low_stock_items(db, shard=0, shards=1):
+    q = db.query(Item).filter(
+        func.coalesce(Item.stock, 0) <= func.coalesce(Item.reorder_point, DEFAULT_REORDER_THRESHOLD)
+    )
+    if shards > 1:
+        q = q.filter(Item.item_id % shards == shard)
+    return q.all()
+
+
+# -----------------------
+# Stock monitor (scheduled job, see scheduler.py)
+# -----------------------
+def run_stock_monitor_pass(shard=0, shards=1):
+    """One monitor pass over this shard's low-stock items (item_id % shards == shard)."""
+    sent = 0
+    db = SessionLocal()
+    try:
+        # reorder points are precomputed nightly (replenishment.py): one filtered query, no per-item math
+        items = low_stock_items(db, shard, shards)
+        for it in items:
+            cur_stock = int(it.stock or 0)
+            reorder_thresh = reorder_point_of(it)
+
+            if cur_stock <= reorder_thresh:
+                # suppression check
+                recent = (
+                    db.query(RestockAlertLog)
+                    .filter(RestockAlertLog.item_id == it.item_id)
+                    .order_by(RestockAlertLog.alert_sent_at.desc())
+                    .first()
+                )
+                already_alerted = False
+                if recent and recent.alert_sent_at:
+                    elapsed = time.time() - recent.alert_sent_at.timestamp()
+                    if elapsed < ALERT_SUPPRESSION_SECONDS:
+                        already_alerted = True
+
+                if already_alerted:
+                    continue
+
+                # choose supplier candidates
+                cand_rows = fetch_supplier_messages_for_item(db, it.name, k=10)
+                if not cand_rows:
+                    sups = db.query(Supplier).all()
+                    cand_rows = [{"supplier_id": s.supplier_id, "excerpt": "", "parsed_price": None, "parsed_eta": None} for s in sups]
+
+                best = recommend_supplier(cand_rows) if cand_rows else None
+                chosen_supplier = None
+                if best:
+                    chosen_supplier = db.query(Supplier).filter(Supplier.supplier_id == best["supplier_id"]).first()
+                else:
+                    chosen_supplier = db.query(Supplier).first()
+
+                if not chosen_supplier:
+                    print(f"No supplier found to order item {it.name} (id={it.item_id})")
+                    log = RestockAlertLog(item_id=it.item_id, supplier_id=None, qty=cur_stock, note="no_supplier_found")
+                    db.add(log)
+                    db.commit()
+                    continue
+
+                order_qty = reorder_qty_of(it)
+                msg = (
+                    f"Hello {chosen_supplier.name},\n"
+                    f"This is an automated restock request for store item: {it.name}.\n"
+                    f"Needed qty: {order_qty}\n"
+                    f"Current stock: {cur_stock}\n"
+                    f"Please confirm availability, price and ETA.\n"
+                )
+
+                try:
+                    resp = send_whatsapp(chosen_supplier.whatsapp_number, msg)
+                    provider_sid = resp.get("sid") if isinstance(resp, dict) else None
+                    log = RestockAlertLog(item_id=it.item_id, supplier_id=chosen_supplier.supplier_id, qty=cur_stock, provider_sid=provider_sid, note=f"sent_to_supplier:{chosen_supplier.whatsapp_number}")
+                    db.add(log)
+                    db.commit()
+                    sent += 1
+                    print(f"Sent restock order for {it.name} to supplier {chosen_supplier.name} ({chosen_supplier.whatsapp_number}), sid={provider_sid}")
+                except Exception as e:
+                    db.rollback()
+                    print("Failed to send restock order:", e)
+                    log = RestockAlertLog(item_id=it.item_id, supplier_id=chosen_supplier.supplier_id if chosen_supplier else None, qty=cur_stock, provider_sid=None, note=f"send_failed:{str(e)}")
+                    db.add(log)
+                    db.commit()
+
+        return {"low_stock": len(items), "sent": sent}
+    finally:
+        db.close()
+
+
+async def scheduler_loop():
+    print(f"Scheduler {scheduler.OWNER} starting — jobs: {sorted(scheduler.JOBS)}")
+    while True:
+        try:
+            await asyncio.to_thread(scheduler.tick)
         except Exception as e:
-            print("Stock monitor exception:", e)
-        await asyncio.sleep(STOCK_MONITOR_INTERVAL)
+            print("Scheduler tick failed:", e)
+        await asyncio.sleep(scheduler.TICK_SECONDS)
 
 
 @app.on_event("startup")
 async def startup_event():
-    # start background stock monitor
-    asyncio.create_task(stock_monitor_loop())
+    # creates tables added since the DB was seeded (inbound_messages, supplier_quotes)
+    Base.metadata.create_all(bind=engine)
+    # start inbound WhatsApp workers and pick up messages acked before a restart
+    inbound_pool.start()
+    requeued = requeue_unfinished_inbound()
+    if requeued:
+        print(f"Re-queued {requeued} unfinished inbound messages")
+    # stock monitor / nightly jobs: every worker ticks, job_leases decide who runs which shard
+    if SCHEDULER_ENABLED:
+        asyncio.create_task(scheduler_loop())
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     print("App shutting down...")
+    await inbound_pool.stop()
+    if SCHEDULER_ENABLED:
+        # hand our shards to the remaining workers now instead of after lease expiry
+        await asyncio.to_thread(scheduler.release_all)
 
 
 # -----------------------
@@ -267,10 +356,10 @@ def inventory_check():
 def trigger_monitor_check():
     db = SessionLocal()
     try:
-        items = db.query(Item).all()
+        items = low_stock_items(db)
         alerts = []
         for it in items:
-            reorder_thresh = getattr(it, "reorder_threshold", None) or DEFAULT_REORDER_THRESHOLD
+            reorder_thresh = reorder_point_of(it)
             cur_stock = int(it.stock or 0)
             if cur_stock <= reorder_thresh:
                 owner_num = getattr(it, "store_owner_whatsapp", None)
@@ -293,51 +382,77 @@ def get_items_public():
         if not items:
             # return 404 to match your UI expectations; change to [] if you prefer
             raise HTTPException(status_code=404, detail="No items found. Seed the DB or call /items endpoint.")
-        out = []
-        for it in items:
-            out.append({
-                "item_id": it.item_id,
-                "name": it.name,
-                "unit_price": float(it.unit_price) if it.unit_price is not None else None,
-                "stock": int(it.stock) if it.stock is not None else 0,
-                "lead_time_days": int(it.lead_time_days) if it.lead_time_days is not None else None,
-                "cost": float(it.cost) if it.cost is not None else None,
-                "min_margin": float(it.min_margin) if it.min_margin is not None else None,
-                "floor_price": float(it.floor_price) if it.floor_price is not None else None,
-                "store_owner_whatsapp": it.store_owner_whatsapp,
-            })
-        return out
+        return [item_to_dict(it) for it in items]
+    finally:
+        db.close()
+
+
+def item_to_dict(it):
+    return {
+        "item_id": it.item_id,
+        "name": it.name,
+        "unit_price": float(it.unit_price) if it.unit_price is not None else None,
+        "stock": int(it.stock) if it.stock is not None else 0,
+        "lead_time_days": int(it.lead_time_days) if it.lead_time_days is not None else None,
+        "cost": float(it.cost) if it.cost is not None else None,
+        "min_margin": float(it.min_margin) if it.min_margin is not None else None,
+        "floor_price": float(it.floor_price) if it.floor_price is not None else None,
+        "store_owner_whatsapp": it.store_owner_whatsapp,
+        "reorder_point": it.reorder_point,
+        "reorder_qty": it.reorder_qty,
+    }
+
+
+# >>> Dashboard snapshot: everything the owner dashboard renders, in one conditional GET
+@app.get("/dashboard/snapshot")
+def dashboard_snapshot(request: Request, threshold: Optional[int] = None):
+    """
+    Items + suppliers + low-stock item names (plus a supplier_quotes version) in one payload,
+    with an ETag so the dashboard can revalidate with If-None-Match and get an empty 304 when nothing changed.
+    """
+    thresh = DEFAULT_REORDER_THRESHOLD if threshold is None else threshold
+    db = SessionLocal()
+    try:
+        items = [item_to_dict(it) for it in db.query(Item).order_by(Item.item_id).all()]
+        suppliers = [{"supplier_id": s.supplier_id, "name": s.name, "whatsapp_number": s.whatsapp_number} for s in db.query(Supplier).all()]
+        # new supplier_quotes rows change the ETag, so the dashboard drops its cached /supplier_prices rows
+        quote_count, last_quote_id = db.query(func.count(SupplierQuote.id), func.max(SupplierQuote.id)).one()
     finally:
         db.close()
 
+    def point(it):
+        # an explicit ?threshold= overrides the stored per-item reorder points
+        return it["reorder_point"] if threshold is None and it["reorder_point"] is not None else thresh
+
+    payload = {
+        "items": items,
+        "suppliers": suppliers,
+        "low_stock": [it["name"] for it in items if it["stock"] <= point(it)],
+        "threshold": thresh,
+        "quotes_version": [quote_count, last_quote_id],
+    }
+    etag = '"' + hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest() + '"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(content=payload, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
 # >>> New helper endpoint: returns supplier-excerpt rows for a given item name
 @app.get("/supplier_prices")
-def supplier_prices_for_item(item: str, k: int = 10):
+def supplier_prices_for_item(item: str, k: Optional[int] = None):
     """
-    Returns a list of supplier rows for `item` by scanning SupplierMessage records
-    and mapping supplier names/numbers from suppliers table.
+    Returns a list of supplier quote rows for `item` from the supplier_quotes table
+    and maps supplier names/numbers from suppliers table. All rows unless `k` is given.
     """
     db = SessionLocal()
     try:
-        # fetch messages containing the item name (case-insensitive)
-        msgs = db.query(SupplierMessage).filter(SupplierMessage.message_text.ilike(f"%{item}%")).all()
-        rows = []
-        for m in msgs:
-            sup = db.query(Supplier).filter(Supplier.supplier_id == m.supplier_id).first()
-            excerpt = (m.message_text or "")[:400].replace("\n", " ")
-            parsed_price = parse_price(excerpt) if 'parse_price' in globals() else None
-            parsed_eta = parse_eta(excerpt) if 'parse_eta' in globals() else None
-            rows.append({
-                "supplier_id": m.supplier_id,
-                "supplier_name": sup.name if sup else None,
-                "whatsapp_number": sup.whatsapp_number if sup else None,
-                "excerpt": excerpt,
-                "parsed_price": parsed_price,
-                "parsed_eta": parsed_eta,
-                "message_id": m.id
-            })
-        # sort by parsed_price if present
-        rows = sorted(rows, key=lambda r: (r["parsed_price"] is None, r["parsed_price"] or 1e12))
+        # quotes extracted at webhook time, already ordered (comparable per-unit prices first)
+        rows = quotes_for_item(db, item, limit=k)
+        sup_ids = {r["supplier_id"] for r in rows}
+        sups = {s.supplier_id: s for s in db.query(Supplier).filter(Supplier.supplier_id.in_(sup_ids)).all()} if sup_ids else {}
+        for r in rows:
+            sup = sups.get(r["supplier_id"])
+            r["supplier_name"] = sup.name if sup else None
+            r["whatsapp_number"] = sup.whatsapp_number if sup else None
         return {"item": item, "rows": rows}
     finally:
         db.close()
@@ -425,24 +540,36 @@ def adjust_price(item_id: int):
 # -----------------------
 # SUPPLIER QUERY — RAG
 # -----------------------
-@app.post("/supplier/query")
-def supplier_query(body: QueryIn = Body(...)):
-    q = body.q
-    k = body.k
+SUPPLIER_QUERY_CONCURRENCY = int(os.getenv("SUPPLIER_QUERY_CONCURRENCY", "4"))
+SUPPLIER_BATCH_MAX = int(os.getenv("SUPPLIER_BATCH_MAX", "64"))
 
-    try:
-        qa = make_retrieval_qa_chain(llm_rag, persist_dir="langchain_faiss", k=k)
-    except Exception as e:
-        raise HTTPException(500, f"Error loading RAG chain: {e}")
+answer_chain = make_answer_chain(llm_rag)
+_llm_slots = asyncio.Semaphore(SUPPLIER_QUERY_CONCURRENCY)  # bounds concurrent LLM calls
+_supplier_flight = SingleFlight()  # concurrent identical questions share one computation
+_vs_cache = {"mtime": None, "vs": None}
+
+
+class BatchQueryIn(BaseModel):
+    questions: List[str]
+    k: int = 5
 
-    try:
-        vs = load_faiss("langchain_faiss")
-        if vs is None:
-            raise RuntimeError("Vectorstore not found. Run ingest.py first.")
-        docs = vs.similarity_search(q, k=k)
-    except Exception as e:
-        raise HTTPException(500, f"Error fetching docs from vectorstore: {e}")
 
+def get_vectorstore():
+    """Load FAISS once and reuse it; reload only when ingest.py rewrites the index."""
+    path = os.path.join(VSTORE_DIR, "index.faiss")
+    if not os.path.exists(path):
+        raise HTTPException(500, "Error fetching docs from vectorstore: Vectorstore not found. Run ingest.py first.")
+    mtime = os.path.getmtime(path)
+    if _vs_cache["vs"] is None or _vs_cache["mtime"] != mtime:
+        try:
+            _vs_cache["vs"] = load_faiss(VSTORE_DIR)
+            _vs_cache["mtime"] = mtime
+        except Exception as e:
+            raise HTTPException(500, f"Error loading RAG chain: {e}")
+    return _vs_cache["vs"]
+
+
+def build_sources(docs):
     sources = []
     for i, d in enumerate(docs, start=1):
         excerpt = d.page_content[:240].replace("\n", " ")
@@ -457,9 +584,16 @@ def supplier_query(body: QueryIn = Body(...)):
                 "excerpt": excerpt,
             }
         )
+    return sources
+
 
+def answer_from_docs(q: str, docs):
+    """Blocking: prompt the LLM with already-retrieved docs and shape the API response."""
+    # dedupe / merge / trim to the model's budget; sources are tagged from the packed docs
+    docs = pack_context(docs, context_budget(LLM_MODEL))
+    context = combine_docs(docs) if len(docs) > 0 else ""
     try:
-        answer = qa.invoke({"question": q})
+        answer = answer_chain.invoke({"question": q, "context": context})
         if isinstance(answer, (dict, list)):
             raw_llm = answer
             answer_text = json.dumps(answer)
@@ -475,15 +609,79 @@ def supplier_query(body: QueryIn = Body(...)):
         answer_text = parts[0].strip()
         sources_line = parts[1].strip()
 
-    response = {
+    return {
         "answer": answer_text,
-        "sources": sources,
+        "sources": build_sources(docs),
         "sources_line": sources_line,
-        "combined_context": combine_docs(docs) if len(docs) > 0 else "",
+        "combined_context": context,
         "raw_llm": raw_llm,
     }
 
-    return response
+
+async def answer_async(q: str, docs):
+    async with _llm_slots:
+        return await asyncio.to_thread(answer_from_docs, q, docs)
+
+
+@app.post("/supplier/query")
+async def supplier_query(body: QueryIn = Body(...)):
+    q = body.q
+    k = body.k
+    vs = get_vectorstore()
+
+    async def compute():
+        try:
+            docs = await asyncio.to_thread(vs.similarity_search, q, k=k)
+        except Exception as e:
+            raise HTTPException(500, f"Error fetching docs from vectorstore: {e}")
+        return await answer_async(q, docs)
+
+    return await _supplier_flight.do((normalize_question(q), k), compute)
+
+
+@app.post("/supplier/query_batch")
+async def supplier_query_batch(body: BatchQueryIn = Body(...)):
+    """
+    Answer many supplier questions at once: identical questions are answered once,
+    retrieval is one embedding batch + one faiss search, and LLM calls fan out with
+    at most SUPPLIER_QUERY_CONCURRENCY in flight.
+    """
+    if len(body.questions) > SUPPLIER_BATCH_MAX:
+        raise HTTPException(400, f"At most {SUPPLIER_BATCH_MAX} questions per batch")
+    k = body.k
+    vs = get_vectorstore()
+
+    # normalized key -> first original wording
+    unique = {}
+    for q in body.questions:
+        unique.setdefault(normalize_question(q), q)
+    keys = list(unique)
+
+    try:
+        docs_per_q = await asyncio.to_thread(batch_similarity_search, vs, [unique[key] for key in keys], k)
+    except Exception as e:
+        raise HTTPException(500, f"Error fetching docs from vectorstore: {e}")
+
+    def job(q, docs):
+        return lambda: answer_async(q, docs)
+
+    answers = await asyncio.gather(
+        *[_supplier_flight.do((key, k), job(unique[key], docs)) for key, docs in zip(keys, docs_per_q)],
+        return_exceptions=True,
+    )
+    by_key = {}
+    for key, a in zip(keys, answers):
+        if isinstance(a, HTTPException):
+            by_key[key] = {"error": a.detail}
+        elif isinstance(a, Exception):
+            by_key[key] = {"error": str(a)}
+        else:
+            by_key[key] = a
+
+    return {
+        "results": [{"question": q, **by_key[normalize_question(q)]} for q in body.questions],
+        "unique_questions": len(keys),
+    }
 
 
 # -----------------------
@@ -522,58 +720,6 @@ def order_api(supplier_id: int, item_id: int, qty: int, customer_phone: Optional
     finally:
         db.close()
 
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
-from twilio.rest import Client
-import re, requests
-from testing import TWILIO_AUTH_TOKEN as c, TWILIO_ACCOUNT_SID as d, TWILIO_WHATSAPP_FROM as e
-
-client = Client(d, c)
-API_BASE = "http://127.0.0.1:8000"  # For internal calls if needed
-
-@app.post("/webhook-endpoint")
-async def webhook(request: Request):
-    data = await request.form()
-    incoming_msg = data.get("Body", "").strip().lower()
-    sender = data.get("From")
-
-    print(f"Incoming message: {incoming_msg} from {sender}")
-
-    # Parse order
-    match = re.search(r"(\d+)\s*(kg|g|ltr|l|pcs|pieces|units)?\s*(?:of\s*)?(.*)", incoming_msg)
-    qty = int(match.group(1)) if match else 1
-    item_name = match.group(3).strip() if match else incoming_msg
-
-    # Lookup item
-    try:
-        items = requests.get(f"{API_BASE}/items").json()
-        item_id = next((it["item_id"] for it in items if it["name"].lower() == item_name), None)
-    except Exception:
-        item_id = None
-
-    if item_id:
-        try:
-            requests.post(f"{API_BASE}/order_to_supplier/{item_id}", json={"qty": qty})
-            reply_text = f"✅ Order placed: {qty} units of {item_name}."
-        except Exception as ex:
-            reply_text = f"❌ Failed to place order: {ex}"
-    else:
-        reply_text = f"⚠ Item '{item_name}' not found in inventory."
-
-    # Send reply via Twilio
-    try:
-        message = client.messages.create(
-            body=reply_text,
-            from_=e,  # Must be whatsapp:+14155238886
-            to=sender
-        )
-        print(f"Reply sent successfully! SID: {message.sid}")
-    except Exception as ex:
-        print(f"Error sending reply: {ex}")
-
-    return JSONResponse(content={"status": "processed", "reply": reply_text})
-
-
 # -----------------------
 # APPLY PRICING (owner-only)
 # -----------------------
@@ -768,6 +914,45 @@ def apply_pricing_all():
         db.close()
 
 
+# -----------------------
+# Scheduled jobs
+# -----------------------
+def run_daily_pricing(shard=0, shards=1):
+    db = SessionLocal()
+    try:
+        q = db.query(Item.item_id)
+        if shards > 1:
+            q = q.filter(Item.item_id % shards == shard)
+        item_ids = [iid for (iid,) in q.all()]
+    finally:
+        db.close()
+    applied = 0
+    for iid in item_ids:
+        r = apply_pricing_helper(iid)
+        applied += bool(r.get("applied"))
+    return {"items": len(item_ids), "applied": applied}
+
+
+scheduler.register("stock_monitor", run_stock_monitor_pass, every=STOCK_MONITOR_INTERVAL, shards=SCHEDULER_SHARDS)
+scheduler.register("replenishment", run_replenishment, daily_at=2)
+scheduler.register("nightly_pricing", run_daily_pricing, daily_at=3, shards=SCHEDULER_SHARDS, lease_seconds=3600)
+
+
+@app.get("/jobs")
+def jobs_status(job: Optional[str] = None, limit: int = 50, user=Depends(get_current_user)):
+    db = SessionLocal()
+    try:
+        return {
+            "owner": scheduler.OWNER,
+            "jobs": [spec.describe() for spec in scheduler.JOBS.values()],
+            "leases": scheduler.leases(db),
+            "stats": scheduler.job_stats(db),
+            "runs": scheduler.recent_runs(db, job, limit),
+        }
+    finally:
+        db.close()
+
+
 @app.get("/pricing_logs")
 def pricing_logs(limit: int = 50, user=Depends(get_current_user)):
     db = SessionLocal()
@@ -791,6 +976,19 @@ def pricing_logs(limit: int = 50, user=Depends(get_current_user)):
         db.close()
 
 
+@app.post("/supplier_quotes/extract_pending")
+def extract_pending_quotes(background_tasks: BackgroundTasks):
+    """Run the batched LLM extraction for supplier messages the regex parser missed."""
+    db = SessionLocal()
+    try:
+        pending = pending_llm_count(db)
+    finally:
+        db.close()
+    if pending:
+        background_tasks.add_task(llm_extract_pending)
+    return {"pending": pending, "scheduled": bool(pending)}
+
+
 @app.get("/suppliers")
 def get_suppliers():
     db = SessionLocal()
@@ -841,65 +1039,161 @@ def find_item_by_name(db_session, text_name: str, cutoff=0.5):
                 return i
     return None
 
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
-from twilio.rest import Client
-import os
-import re
-import requests
-from testing import TWILIO_AUTH_TOKEN as c
-from testing import TWILIO_ACCOUNT_SID as d
-from testing import TWILIO_WHATSAPP_FROM as e
 
+TWILIO_VALIDATE_SIGNATURE = os.getenv("TWILIO_VALIDATE_SIGNATURE", "0") == "1"
+INBOUND_WORKERS = int(os.getenv("INBOUND_WORKERS", "4"))
+# a 'processing' row claimed longer ago than this belongs to a worker that died mid-message
+INBOUND_CLAIM_TIMEOUT = int(os.getenv("INBOUND_CLAIM_TIMEOUT", "600"))
 
-client = Client(d, c)
-API_BASE = "http://127.0.0.1:8000"  # Your grocery backend API
 
-@app.post("/webhook-endpoint")
-async def webhook(request: Request):
-    data = await request.form()
-    incoming_msg = data.get("Body", "").strip().lower()
-    sender = data.get("From")
+def persist_inbound(message_sid: str, sender: str, body: str):
+    """Store the inbound message; returns its id, or None if this MessageSid was already seen."""
+    db = SessionLocal()
+    try:
+        msg = InboundMessage(message_sid=message_sid, sender=sender, body=body, status="queued")
+        db.add(msg)
+        db.commit()
+        return msg.id
+    except IntegrityError:
+        db.rollback()  # Twilio retry of a message we already have
+        return None
+    finally:
+        db.close()
 
-    print(f"Incoming message: {incoming_msg} from {sender}")
 
-    # Parse order command
-    match = re.search(r"(\d+)\s*(kg|g|ltr|l|pcs|pieces|units)?\s*(?:of\s*)?(.*)", incoming_msg)
-    if match:
-        qty = int(match.group(1))
-        item_name = match.group(3).strip()
-    else:
-        qty = 1
-        item_name = incoming_msg
+def handle_order_message(text: str) -> str:
+    qty, item_name = parse_order_text(text)
+    db = SessionLocal()
+    try:
+        item = find_item_by_name(db, item_name)
+    finally:
+        db.close()
+    if not item:
+        return f"⚠ Item '{item_name}' not found in inventory."
+    try:
+        order_to_supplier(item.item_id)
+        return f"✅ Order placed: {qty} units of {item.name}."
+    except HTTPException as ex:
+        return f"❌ Failed to place order: {ex.detail}"
+    except Exception as ex:
+        return f"❌ Failed to place order: {ex}"
+
 
-    # Lookup item in backend
+def process_inbound_message(inbound_id: int):
+    """Worker side of the webhook: parse, place order / store supplier quote, reply."""
+    db = SessionLocal()
     try:
-        items = requests.get(f"{API_BASE}/items").json()
-        item_id = next((it["item_id"] for it in items if it["name"].lower() == item_name), None)
-    except Exception:
-        item_id = None
+        # atomic claim: of all uvicorn workers that were handed this id, exactly one moves it
+        # from queued to processing; everyone else (already claimed / done) skips it
+        claimed = (
+            db.query(InboundMessage)
+            .filter(InboundMessage.id == inbound_id, InboundMessage.status == "queued")
+            .update(
+                {"status": "processing", "owner": scheduler.OWNER,
+                 "claimed_at": datetime.datetime.now(datetime.timezone.utc)},
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if claimed != 1:
+            return
+        msg = db.query(InboundMessage).filter(InboundMessage.id == inbound_id).first()
 
-    if item_id:
         try:
-            res = requests.post(f"{API_BASE}/order_to_supplier/{item_id}", json={"qty": qty})
-            reply_text = f"✅ Order placed: {qty} units of {item_name}."
+            body = (msg.body or "").strip()
+            reply_text = handle_supplier_message(msg.sender, body, on_pending_batch=lambda: _llm_executor.submit(llm_extract_pending))
+            if reply_text is None:
+                reply_text = handle_order_message(body)
+            resp = send_whatsapp(msg.sender, reply_text)
+            msg.reply = reply_text
+            msg.status = "failed" if resp.get("error") else "done"
+            msg.error = resp.get("error")
         except Exception as ex:
-            reply_text = f"❌ Failed to place order: {ex}"
-    else:
-        reply_text = f"⚠ Item '{item_name}' not found in inventory."
+            msg.status = "failed"
+            msg.error = str(ex)
+        msg.processed_at = datetime.datetime.now(datetime.timezone.utc)
+        db.commit()
+        print(f"Inbound {msg.message_sid} from {msg.sender}: {msg.status}")
+    finally:
+        db.close()
+
+
+inbound_pool = SenderOrderedPool(process_inbound_message, workers=INBOUND_WORKERS)
+_llm_executor = ThreadPoolExecutor(max_workers=1)  # one batched LLM quote extraction at a time
 
-    # ✅ Always send reply via Twilio
+
+def requeue_unfinished_inbound():
+    """
+    After a restart, put back 'processing' rows whose claim is older than INBOUND_CLAIM_TIMEOUT
+    (their worker died), then offer every queued row to the pool. Rows another live worker is
+    processing are left alone, and a queued row only runs where process_inbound_message claims it.
+    """
+    db = SessionLocal()
     try:
-        client.messages.create(
-            body=reply_text,
-            from_=e,
-            to=sender
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=INBOUND_CLAIM_TIMEOUT)
+        (
+            db.query(InboundMessage)
+            .filter(
+                InboundMessage.status == "processing",
+                or_(InboundMessage.claimed_at.is_(None), InboundMessage.claimed_at < cutoff),
+            )
+            .update({"status": "queued", "owner": None, "claimed_at": None}, synchronize_session=False)
         )
-        print("Reply sent successfully!")
-    except Exception as ex:
-        print(f"Error sending reply: {ex}")
+        db.commit()
+        rows = (
+            db.query(InboundMessage.id, InboundMessage.sender)
+            .filter(InboundMessage.status == "queued")
+            .order_by(InboundMessage.id)
+            .all()
+        )
+        for inbound_id, sender in rows:
+            inbound_pool.submit(sender, inbound_id)
+        return len(rows)
+    finally:
+        db.close()
+
+
+@app.post("/webhook-endpoint")
+async def webhook(request: Request):
+    """
+    Fast-ack Twilio webhook: validate, persist keyed by MessageSid, enqueue, return TwiML.
+    Parsing, ordering and the WhatsApp reply happen in inbound_pool, so Twilio never waits
+    on our pipeline and its retries (same MessageSid) are dropped here.
+    """
+    data = await request.form()
+    message_sid = data.get("MessageSid") or data.get("SmsMessageSid")
+    sender = data.get("From")
+    body = data.get("Body", "")
+    if not message_sid or not sender:
+        raise HTTPException(400, "Missing MessageSid or From")
+
+    if TWILIO_VALIDATE_SIGNATURE:
+        validator = RequestValidator(TWILIO_AUTH_TOKEN or "")
+        if not validator.validate(str(request.url), dict(data), request.headers.get("X-Twilio-Signature", "")):
+            raise HTTPException(403, "Invalid Twilio signature")
+
+    inbound_id = await asyncio.to_thread(persist_inbound, message_sid, sender, body)
+    if inbound_id is not None:
+        inbound_pool.submit(sender, inbound_id)
+    else:
+        print(f"Duplicate MessageSid {message_sid} from {sender} — ignored")
+
+    return Response(content=str(MessagingResponse()), media_type="application/xml")
+
+
+@app.get("/webhook/status")
+def webhook_status():
+    db = SessionLocal()
+    try:
+        counts = {
+            status: db.query(InboundMessage).filter(InboundMessage.status == status).count()
+            for status in ("queued", "processing", "done", "failed")
+        }
+    finally:
+        db.close()
+    return {"backlog": inbound_pool.backlog(), "counts": counts}
+
 
-    return JSONResponse(content={"status": "processed", "reply": reply_text})
 # -----------------------
 # Manual supplier order endpoint
 # -----------------------
@@ -921,7 +1215,7 @@ def order_to_supplier(item_id: int, supplier_id: Optional[int] = None):
         if not chosen:
             raise HTTPException(404, "No supplier available")
 
-        order_qty = max(it.lead_time_days * 10, DEFAULT_REORDER_THRESHOLD * 3)
+        order_qty = reorder_qty_of(it)
         msg = f"Order request: {it.name}\nQty: {order_qty}\nCurrent stock: {it.stock}\nPlease confirm price & ETA."
         resp = send_whatsapp(chosen.whatsapp_number, msg)
         provider_sid = resp.get("sid") if isinstance(resp, dict) else None
@@ -0,0 +1,117 @@
+# bench_faiss.py
+"""
+Recall / latency benchmark of the ANN index types in langchain_agents against the
+exact flat index, on the same corpus and the same queries.
+
+    python bench_faiss.py                      # supplier messages from inventory.db
+    python bench_faiss.py --synthetic 200000   # random vectors, no embedding model needed
+    python bench_faiss.py --json results.json
+
+Recall@k is the fraction of the flat index's top-k ids that the ANN index also returns.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from langchain_agents import make_faiss_index, train_faiss_index, set_search_params
+
+CONFIGS = [
+    {"index_type": "ivf_flat", "nprobe": 1},
+    {"index_type": "ivf_flat", "nprobe": 8},
+    {"index_type": "ivf_flat", "nprobe": 32},
+    {"index_type": "ivf_pq", "nprobe": 8},
+    {"index_type": "ivf_pq", "nprobe": 32},
+    {"index_type": "hnsw", "ef_search": 16},
+    {"index_type": "hnsw", "ef_search": 64},
+    {"index_type": "hnsw", "ef_search": 256},
+]
+
+
+def corpus_from_db():
+    from ingest import build_documents_from_db
+    from langchain_agents import get_embeddings
+
+    docs = build_documents_from_db()
+    if not docs:
+        raise SystemExit("No supplier messages in DB — seed it or use --synthetic N")
+    emb = get_embeddings()
+    return np.asarray(emb.embed_documents([d.page_content for d in docs]), dtype="float32")
+
+
+def synthetic_corpus(n, dim=384, n_clusters=64, seed=0):
+    # clustered data is closer to real embeddings than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim)).astype("float32")
+    x = centers[rng.integers(0, n_clusters, size=n)] + 0.3 * rng.normal(size=(n, dim)).astype("float32")
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def time_search(index, queries, k):
+    lat = []
+    ids = np.empty((len(queries), k), dtype="int64")
+    for i, q in enumerate(queries):
+        t0 = time.perf_counter()
+        _, I = index.search(q[None, :], k)
+        lat.append((time.perf_counter() - t0) * 1000)
+        ids[i] = I[0]
+    lat = np.asarray(lat)
+    return ids, {"p50_ms": float(np.percentile(lat, 50)), "p95_ms": float(np.percentile(lat, 95)), "mean_ms": float(lat.mean())}
+
+
+def recall_at_k(truth, found):
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / truth.size
+
+
+def run(vectors, n_queries=200, k=5, seed=0):
+    import faiss
+
+    rng = np.random.default_rng(seed)
+    n, dim = vectors.shape
+    # queries: perturbed corpus vectors so every query has close neighbours
+    q_idx = rng.choice(n, size=min(n_queries, n), replace=False)
+    queries = vectors[q_idx] + 0.05 * rng.normal(size=(len(q_idx), dim)).astype("float32")
+
+    flat = faiss.IndexFlatL2(dim)
+    flat.add(vectors)
+    truth, flat_lat = time_search(flat, queries, k)
+    results = [{"index_type": "flat", "build_s": 0.0, "recall": 1.0, **flat_lat}]
+
+    for cfg in CONFIGS:
+        t0 = time.perf_counter()
+        index, params = make_faiss_index(dim, n, cfg["index_type"])
+        train_faiss_index(index, vectors)
+        index.add(vectors)
+        build_s = time.perf_counter() - t0
+        set_search_params(index, nprobe=cfg.get("nprobe"), ef_search=cfg.get("ef_search"))
+        found, lat = time_search(index, queries, k)
+        results.append({**params, **cfg, "build_s": round(build_s, 3), "recall": round(recall_at_k(truth, found), 4), **lat})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=0, help="use N synthetic vectors instead of the DB")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--json", default=None, help="write results to this file")
+    args = parser.parse_args()
+
+    vectors = synthetic_corpus(args.synthetic) if args.synthetic else corpus_from_db()
+    results = run(vectors, n_queries=args.queries, k=args.k)
+
+    print(f"corpus={vectors.shape[0]} dim={vectors.shape[1]} k={args.k}")
+    print(f"{'index':<10} {'knob':<14} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'build s':>8}")
+    for r in results:
+        knob = f"nprobe={r['nprobe']}" if "nprobe" in r else (f"ef={r['ef_search']}" if "ef_search" in r else "-")
+        print(f"{r['index_type']:<10} {knob:<14} {r['recall']:>7.3f} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} {r['build_s']:>8.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"n_vectors": int(vectors.shape[0]), "k": args.k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# chunking.py
+"""
+Token counting + sentence-aware chunking with no LangChain / FAISS imports, shared by
+ingest.py (FAISS path) and rag_store.py (NumPy path) so both index the same chunks.
+"""
+import os
+import re
+from typing import Dict, List, Tuple
+
+try:
+    import tiktoken
+    _ENC = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken is optional; fall back to ~4 chars per token
+    _ENC = None
+
+SENTENCE_RE = re.compile(r"(?<=[.!?।])\s+|\n+")
+CHUNK_TOKENS = int(os.getenv("INGEST_CHUNK_TOKENS", "128"))
+
+
+def count_tokens(text: str) -> int:
+    if _ENC is not None:
+        return len(_ENC.encode(text))
+    return max(1, len(text) // 4)
+
+
+def chunk_text_sentences(text: str, max_tokens: int = 128, overlap_sentences: int = 1,
+                         prefix: str = "") -> List[str]:
+    """
+    Sentence-aware chunker: packs whole sentences up to max_tokens (prefix included) and
+    repeats the last `overlap_sentences` sentences in the next chunk. Sentences longer
+    than the budget are split on word boundaries, never mid-word.
+    """
+    budget = max(1, max_tokens - count_tokens(prefix)) if prefix else max_tokens
+    sentences: List[str] = []
+    for sent in SENTENCE_RE.split(text.strip()):
+        sent = sent.strip()
+        if not sent:
+            continue
+        if count_tokens(sent) <= budget:
+            sentences.append(sent)
+            continue
+        piece = ""
+        for word in sent.split():
+            if piece and count_tokens(piece + " " + word) > budget:
+                sentences.append(piece)
+                piece = word
+            else:
+                piece = (piece + " " + word).strip()
+        if piece:
+            sentences.append(piece)
+
+    out: List[str] = []
+    cur: List[str] = []
+    for sent in sentences:
+        if cur and count_tokens(" ".join(cur + [sent])) > budget:
+            out.append(prefix + " ".join(cur))
+            cur = cur[-overlap_sentences:] if overlap_sentences else []
+            # drop the overlap if it would not leave room for the new sentence
+            while cur and count_tokens(" ".join(cur + [sent])) > budget:
+                cur.pop(0)
+        cur.append(sent)
+    if cur:
+        out.append(prefix + " ".join(cur))
+    return out
+
+
+def supplier_message_chunks(db, max_tokens: int = CHUNK_TOKENS) -> List[Tuple[str, Dict]]:
+    """(text, metadata) chunks for every supplier message — the corpus both RAG stores index."""
+    from MODELS import SupplierMessage
+
+    out: List[Tuple[str, Dict]] = []
+    for msg in db.query(SupplierMessage).order_by(SupplierMessage.id).all():
+        # every chunk keeps the supplier tag so retrieval results stay attributable
+        chunks = chunk_text_sentences(
+            msg.message_text or "",
+            max_tokens=max_tokens,
+            overlap_sentences=1,
+            prefix=f"[supplier_id:{msg.supplier_id}] ",
+        )
+        for i, c in enumerate(chunks):
+            out.append((c, {"supplier_id": msg.supplier_id, "message_id": msg.id, "chunk_index": i}))
+    return out
@@ -0,0 +1,31 @@
+# coalesce.py
+import asyncio
+import re
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+def normalize_question(q: str) -> str:
+    """Key used to treat near-identical questions as the same ('Best rice price?' == 'best  rice price')."""
+    return re.sub(r"\s+", " ", (q or "").strip().lower()).rstrip("?.! ")
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one in-flight computation.
+    The entry is dropped as soon as the computation finishes, so this is not a cache.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(fn())
+            self._inflight[key] = fut
+            fut.add_done_callback(lambda _f: self._inflight.pop(key, None))
+        # shield: one caller disconnecting must not cancel the shared work
+        return await asyncio.shield(fut)
+
+    def inflight(self) -> int:
+        return len(self._inflight)
@@ -1,15 +1,68 @@
-from apscheduler.schedulers.background import BackgroundScheduler
-from db import SessionLocal
-from app import apply_pricing_helper
-from MODELS import Item, SalesHistory
-
-def run_daily_pricing():
-    db = SessionLocal()
-    items = db.query(Item).all()
-    for it in items:
-        # call apply_pricing logic programmatically (factor out into helper)
-        apply_pricing_helper(it.item_id)
-
-scheduler = BackgroundScheduler()
-scheduler.add_job(run_daily_pricing, 'cron', hour=3)
-scheduler.start()
+# daily.py
+"""
+Dedicated scheduler process and job CLI. Jobs are registered in app.py and coordinated
+through the job_leases table (scheduler.py), so running this next to several uvicorn
+workers never runs a shard twice. Set SCHEDULER_ENABLED=0 on the API workers to leave
+all scheduled work to this process.
+
+    python daily.py                                   # run scheduled jobs until stopped
+    python daily.py --list                            # registered jobs, leases, run stats
+    python daily.py --run nightly_pricing             # run every shard of a job once, now
+    python daily.py --run stock_monitor --shard 2     # one shard only
+    python daily.py --history [--job stock_monitor]   # recent runs with durations
+"""
+import argparse
+import time
+
+import app  # noqa: F401  (registers the jobs)
+import scheduler
+from db import SessionLocal, engine, Base
+
+
+def run_once(name, shard=None, shards=None):
+    """Benchmark helper: runs outside the lease, still recorded in job_runs."""
+    job = scheduler.JOBS[name]
+    shards = shards or job.shards
+    return [
+        scheduler.run_job(name, s, shards, owner=f"cli:{scheduler.OWNER}")
+        for s in ([shard] if shard is not None else range(shards))
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scheduled jobs: serve, run once, inspect history")
+    parser.add_argument("--run", metavar="JOB", help="run a job once and exit")
+    parser.add_argument("--shard", type=int, default=None)
+    parser.add_argument("--shards", type=int, default=None, help="override the job's shard count")
+    parser.add_argument("--list", action="store_true")
+    parser.add_argument("--history", action="store_true")
+    parser.add_argument("--job", default=None, help="filter --history by job")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+
+    if args.run:
+        if args.run not in scheduler.JOBS:
+            raise SystemExit(f"Unknown job {args.run!r}; known: {', '.join(sorted(scheduler.JOBS))}")
+        t0 = time.perf_counter()
+        for r in run_once(args.run, args.shard, args.shards):
+            print(f"{r['job']}[{r['shard']}/{r['shards']}] {r['status']} in {r['duration_ms']} ms  {r['result'] or r['error'] or ''}")
+        print(f"Total {time.perf_counter() - t0:.3f}s")
+    elif args.list or args.history:
+        db = SessionLocal()
+        try:
+            if args.list:
+                for spec in scheduler.JOBS.values():
+                    print(spec.describe())
+                for lease in scheduler.leases(db):
+                    print(lease)
+                for st in scheduler.job_stats(db):
+                    print(st)
+            if args.history:
+                for r in scheduler.recent_runs(db, args.job, args.limit):
+                    print(f"{r['started_at']}  {r['job']}[{r['shard']}/{r['shards']}]  {r['status']:7} {r['duration_ms']} ms  {r['owner']}")
+        finally:
+            db.close()
+    else:
+        scheduler.serve()
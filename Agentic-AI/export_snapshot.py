@@ -0,0 +1,199 @@
+# export_snapshot.py
+"""
+Incremental columnar export of inventory.db for analytics, so reporting runs against
+files instead of the live SQLite the API writes to.
+
+  - append-only tables are exported by id watermark: each run only reads rows with
+    id > last exported id, streamed in RowBatches of --batch-size (bounded memory)
+  - rows are partitioned by day:  exports/<table>/day=YYYY-MM-DD/part-<first_id>-<last_id>.parquet
+  - `items` has no history, so each run writes a full snapshot:  exports/items/day=.../items-HHMMSS.parquet
+  - watermarks live in exports/_watermarks.json and are updated after every file,
+    so an interrupted run resumes where it stopped
+
+    python export_snapshot.py                       # one run
+    python export_snapshot.py --every 900           # every 15 minutes
+    python export_snapshot.py --format arrow        # Arrow IPC (.arrow) instead of Parquet
+"""
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.ipc as ipc
+except ImportError:  # optional analytics dependency
+    pa = None
+
+DB = "inventory.db"
+EXPORT_DIR = "exports"
+BATCH_SIZE = 50_000
+
+# table -> timestamp column used for day partitioning
+INCREMENTAL_TABLES = {
+    "sales_history": "sold_at",
+    "price_change_log": "created_at",
+    "restock_alert_log": "alert_sent_at",
+    "supplier_messages": "created_at",
+}
+SNAPSHOT_TABLES = ["items"]
+
+
+def connect_readonly(path=DB):
+    # read-only URI: the exporter can never take a write lock on the production DB
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+
+def arrow_schema(con, table):
+    """Map SQLite declared column types to Arrow types."""
+    fields = []
+    for _, name, decl, *_ in con.execute(f"PRAGMA table_info({table})"):
+        decl = (decl or "").upper()
+        if "INT" in decl:
+            t = pa.int64()
+        elif any(x in decl for x in ("NUMERIC", "DECIMAL", "FLOAT", "REAL", "DOUBLE")):
+            t = pa.float64()
+        elif "DATE" in decl or "TIME" in decl:
+            t = pa.timestamp("us")
+        else:
+            t = pa.string()
+        fields.append(pa.field(name, t))
+    return pa.schema(fields)
+
+
+def _coerce(value, typ):
+    if value is None:
+        return None
+    if pa.types.is_timestamp(typ):
+        if isinstance(value, str):
+            return datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+        return value
+    if pa.types.is_floating(typ):
+        return float(value)
+    if pa.types.is_integer(typ):
+        return int(value)
+    return str(value)
+
+
+def to_record_batch(rows, schema):
+    columns = list(zip(*rows)) if rows else [[] for _ in schema]
+    arrays = [pa.array([_coerce(v, f.type) for v in col], type=f.type) for col, f in zip(columns, schema)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_file(batch, path, fmt):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    table = pa.Table.from_batches([batch])
+    if fmt == "parquet":
+        pq.write_table(table, tmp, compression="zstd")
+    else:
+        with ipc.new_file(tmp, batch.schema) as w:
+            w.write_table(table)
+    os.replace(tmp, path)  # readers never see half-written files
+
+
+def load_watermarks(out_dir):
+    path = os.path.join(out_dir, "_watermarks.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_watermarks(out_dir, marks):
+    path = os.path.join(out_dir, "_watermarks.json")
+    os.makedirs(out_dir, exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(marks, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def export_incremental(con, table, ts_col, out_dir, marks, fmt="parquet", batch_size=BATCH_SIZE):
+    schema = arrow_schema(con, table)
+    names = schema.names
+    id_pos, ts_pos = names.index("id"), names.index(ts_col)
+    ext = "parquet" if fmt == "parquet" else "arrow"
+    exported = 0
+
+    cur = con.execute(f"SELECT {', '.join(names)} FROM {table} WHERE id > ? ORDER BY id", (marks.get(table, 0),))
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            break
+        by_day = {}
+        for r in rows:
+            day = str(r[ts_pos])[:10] if r[ts_pos] else "unknown"
+            by_day.setdefault(day, []).append(r)
+        for day, day_rows in by_day.items():
+            path = os.path.join(out_dir, table, f"day={day}", f"part-{day_rows[0][id_pos]}-{day_rows[-1][id_pos]}.{ext}")
+            write_file(to_record_batch(day_rows, schema), path, fmt)
+        marks[table] = rows[-1][id_pos]
+        save_watermarks(out_dir, marks)
+        exported += len(rows)
+    return exported
+
+
+def export_snapshot(con, table, out_dir, fmt="parquet", batch_size=BATCH_SIZE):
+    schema = arrow_schema(con, table)
+    now = datetime.datetime.now()
+    ext = "parquet" if fmt == "parquet" else "arrow"
+    path = os.path.join(out_dir, table, f"day={now:%Y-%m-%d}", f"{table}-{now:%H%M%S}.{ext}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+
+    cur = con.execute(f"SELECT {', '.join(schema.names)} FROM {table}")
+    writer = pq.ParquetWriter(tmp, schema, compression="zstd") if fmt == "parquet" else ipc.new_file(tmp, schema)
+    n = 0
+    try:
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            batch = to_record_batch(rows, schema)
+            if fmt == "parquet":
+                writer.write_table(pa.Table.from_batches([batch]))
+            else:
+                writer.write_batch(batch)
+            n += len(rows)
+    finally:
+        writer.close()
+    os.replace(tmp, path)
+    return n
+
+
+def run_export(db=DB, out_dir=EXPORT_DIR, fmt="parquet", batch_size=BATCH_SIZE):
+    if pa is None:
+        raise SystemExit("pyarrow is required for snapshot export: pip install pyarrow")
+    con = connect_readonly(db)
+    try:
+        marks = load_watermarks(out_dir)
+        summary = {}
+        for table in SNAPSHOT_TABLES:
+            summary[table] = export_snapshot(con, table, out_dir, fmt, batch_size)
+        for table, ts_col in INCREMENTAL_TABLES.items():
+            summary[table] = export_incremental(con, table, ts_col, out_dir, marks, fmt, batch_size)
+        return summary
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export inventory.db tables to Parquet / Arrow IPC")
+    parser.add_argument("--db", default=DB)
+    parser.add_argument("--out", default=EXPORT_DIR)
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--every", type=int, default=0, help="repeat every N seconds (0 = run once)")
+    args = parser.parse_args()
+
+    while True:
+        t0 = time.time()
+        summary = run_export(args.db, args.out, args.format, args.batch_size)
+        print(f"Exported {summary} in {time.time() - t0:.2f}s → {args.out}")
+        if not args.every:
+            break
+        time.sleep(args.every)
@@ -1,50 +1,42 @@
 # ingest.py
-import os
 from sqlalchemy.orm import sessionmaker
 from db import engine
-from MODELS import SupplierMessage
 
-from langchain_agents import chunk_text, init_faiss_from_documents
+from chunking import supplier_message_chunks
+from langchain_agents import init_faiss_from_documents, INDEX_TYPE
 from langchain_core.documents import Document
 
 SessionLocal = sessionmaker(bind=engine)
 
 def build_documents_from_db():
     db = SessionLocal()
-    messages = db.query(SupplierMessage).all()
-    docs = []
+    try:
+        # sentence-aware chunks shared with rag_store.py
+        return [Document(page_content=text, metadata=meta) for text, meta in supplier_message_chunks(db)]
+    finally:
+        db.close()
 
-    for msg in messages:
-        # Build base text for embedding
-        base_text = f"[supplier_id:{msg.supplier_id}] {msg.message_text}"
 
-        # Chunk it for FAISS
-        chunks = chunk_text(base_text, chunk_size=500, overlap=50)
-
-        for c in chunks:
-            docs.append(
-                Document(
-                    page_content=c,
-                    metadata={
-                        "supplier_id": msg.supplier_id,
-                        "message_id": msg.id,
-                    }
-                )
-            )
-
-    db.close()
-    return docs
-
-
-def run_ingest(persist_dir="langchain_faiss"):
+def run_ingest(persist_dir="langchain_faiss", index_type=INDEX_TYPE, **index_kwargs):
     docs = build_documents_from_db()
     if not docs:
         print("⚠️ No supplier messages in DB — nothing to ingest.")
         return
 
-    init_faiss_from_documents(docs, persist_dir)
-    print(f"✅ Ingested {len(docs)} chunks into FAISS → {persist_dir}")
+    init_faiss_from_documents(docs, persist_dir, index_type=index_type, **index_kwargs)
+    print(f"✅ Ingested {len(docs)} chunks into FAISS ({index_type}) → {persist_dir}")
 
 
 if __name__ == "__main__":
-    run_ingest()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Embed supplier messages into a FAISS index")
+    parser.add_argument("--persist-dir", default="langchain_faiss")
+    parser.add_argument("--index-type", default=INDEX_TYPE, choices=["flat", "ivf_flat", "ivf_pq", "hnsw"])
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, default=None)
+    parser.add_argument("--ef-search", type=int, default=None)
+    args = parser.parse_args()
+
+    kwargs = {k: v for k, v in {"nlist": args.nlist, "nprobe": args.nprobe, "ef_search": args.ef_search}.items() if v is not None}
+    run_ingest(args.persist_dir, index_type=args.index_type, **kwargs)
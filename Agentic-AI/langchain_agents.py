@@ -1,5 +1,7 @@
 
 import os
+import re
+import logging
 import requests
 import json
 from typing import Optional, List, Mapping, Any
@@ -14,6 +16,9 @@ from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
 from langchain_core.prompts import PromptTemplate
 from langchain_core.language_models.llms import LLM
 
+# token counting / sentence splitting for context packing; the chunker itself lives in chunking.py
+from chunking import count_tokens, SENTENCE_RE
+
 OPENROUTER_API_KEY = a
 OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
 
@@ -70,28 +75,295 @@ def get_embeddings():
     return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
 
 
+# ---------- Context packing (token budget, dedupe, merge) ----------
+# tokens of retrieved context allowed in a RAG prompt, per model
+CONTEXT_TOKEN_BUDGETS = {
+    "openai/gpt-4o-mini": 3000,
+    "anthropic/claude-3.5-sonnet": 3000,
+}
+DEFAULT_CONTEXT_BUDGET = int(os.getenv("RAG_CONTEXT_TOKENS", "1500"))
+NEAR_DUP_THRESHOLD = 0.8  # share of word shingles in common above which two chunks count as the same
+
+def context_budget(model_name: Optional[str]) -> int:
+    return CONTEXT_TOKEN_BUDGETS.get(model_name or "", DEFAULT_CONTEXT_BUDGET)
+
+
+def _shingles(text: str, n: int = 3) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= n:
+        return {" ".join(words)}
+    return {" ".join(words[i : i + n]) for i in range(len(words) - n + 1)}
+
+
+def _overlap(a: set, b: set) -> float:
+    # containment rather than Jaccard: a short message repeated inside a longer one is a duplicate too
+    return len(a & b) / min(len(a), len(b)) if a and b else 0.0
+
+
+_TAG_RE = re.compile(r"^\[[^\]]*\]\s*")  # "[supplier_id:3] " prefix ingest puts on every chunk
+
+
+MIN_MERGE_OVERLAP = 20  # chars; shorter suffix/prefix matches must be whole sentences to count
+
+
+def _whole_sentences(left: str, right: str, size: int) -> bool:
+    """True if right[:size] (== left's tail) starts and ends on sentence boundaries on both sides."""
+    starts = size == len(left) or left[-size - 1].isspace()
+    ends = size == len(right) or (right[size].isspace() and right[size - 1] in ".!?।")
+    return starts and ends
+
+
+def _merge_overlap(left: str, right: str, adjacent: bool = True) -> str:
+    """
+    Join two chunks of one message, dropping the tag and the overlap the chunker repeated.
+    Only adjacent chunks (chunk_index n, n+1) can overlap, and a match only counts if it is at
+    least MIN_MERGE_OVERLAP chars or whole sentences, so a shared character or word is kept.
+    """
+    right = _TAG_RE.sub("", right)
+    if adjacent:
+        for size in range(min(len(left), len(right)), 0, -1):
+            if left.endswith(right[:size]) and (size >= MIN_MERGE_OVERLAP or _whole_sentences(left, right, size)):
+                return left + right[size:]
+    return left + " " + right
+
+
+def pack_context(docs: List[Document], max_tokens: Optional[int] = None,
+                 dup_threshold: float = NEAR_DUP_THRESHOLD) -> List[Document]:
+    """
+    Turn retrieved docs into the smallest equivalent context:
+      1) chunks of the same message_id are merged in chunk order (overlaps removed)
+      2) near-duplicates (shingle overlap >= dup_threshold) are dropped, keeping the best-ranked
+      3) docs are added in rank order while they fit in max_tokens
+    """
+    max_tokens = max_tokens or DEFAULT_CONTEXT_BUDGET
+
+    # 1) merge per message, positioned at the message's best rank
+    groups: dict = {}
+    order: List = []
+    for rank, d in enumerate(docs):
+        key = (d.metadata or {}).get("message_id")
+        key = key if key is not None else ("_rank", rank)
+        if key not in groups:
+            groups[key] = []
+            order.append(key)
+        groups[key].append(d)
+    merged: List[Document] = []
+    for key in order:
+        parts = sorted(groups[key], key=lambda d: (d.metadata or {}).get("chunk_index", 0))
+        text = parts[0].page_content
+        for prev, p in zip(parts, parts[1:]):
+            i, j = (prev.metadata or {}).get("chunk_index"), (p.metadata or {}).get("chunk_index")
+            text = _merge_overlap(text, p.page_content, adjacent=i is not None and j == i + 1)
+        merged.append(Document(page_content=text, metadata=dict(parts[0].metadata or {})))
+
+    # 2) near-duplicate removal + 3) budget
+    packed: List[Document] = []
+    kept_shingles: List[set] = []
+    used = 0
+    for d in merged:
+        sh = _shingles(d.page_content)
+        if any(_overlap(sh, k) >= dup_threshold for k in kept_shingles):
+            continue
+        cost = count_tokens(d.page_content)
+        if used + cost > max_tokens:
+            if packed:
+                continue
+            # a single oversized doc: keep whole sentences up to the budget
+            text = ""
+            for sent in SENTENCE_RE.split(d.page_content):
+                if count_tokens(text + " " + sent) > max_tokens:
+                    break
+                text = (text + " " + sent).strip()
+            d = Document(page_content=text or d.page_content[: max_tokens * 4], metadata=d.metadata)
+            cost = count_tokens(d.page_content)
+        packed.append(d)
+        kept_shingles.append(sh)
+        used += cost
+    return packed
+
+
 # top-level helper: used by other modules too
-def combine_docs(docs: List[Document]) -> str:
-    texts: List[str] = []
+def combine_docs(docs: List[Document], max_tokens: Optional[int] = None) -> str:
+    """Join doc texts for a prompt; with max_tokens the docs are packed first (see pack_context)."""
     for d in docs:
         if not hasattr(d, "page_content"):
             raise RuntimeError(f"Invalid doc object passed to combine_docs: {type(d)}")
-        texts.append(d.page_content)
-    return "\n\n".join(texts)
+    if max_tokens is not None:
+        docs = pack_context(docs, max_tokens)
+    return "\n\n".join(d.page_content for d in docs)
+
+
+# ---------- ANN index options ----------
+# flat     -> exact search (LangChain default, IndexFlatL2)
+# ivf_flat -> inverted lists over full vectors, probes `nprobe` lists per query
+# ivf_pq   -> inverted lists over product-quantized vectors (much smaller on disk / in RAM)
+# hnsw     -> graph index, no training needed, tuned with `ef_search`
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "8"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+FAISS_TRAIN_SIZE = int(os.getenv("FAISS_TRAIN_SIZE", "20000"))
+FAISS_MMAP = os.getenv("FAISS_MMAP", "0") == "1"
+INDEX_META_FILE = "index_meta.json"
 
 
-def init_faiss_from_documents(documents: List[Document], persist_dir: str = VSTORE_DIR):
+def default_nlist(n_vectors: int) -> int:
+    # rule of thumb: ~4*sqrt(N) lists, never more lists than vectors
+    return max(1, min(n_vectors, int(4 * (n_vectors ** 0.5))))
+
+
+def make_faiss_index(dim: int, n_vectors: int, index_type: str = "flat", nlist: Optional[int] = None,
+                     pq_m: int = 16, pq_nbits: int = 8, hnsw_m: int = 32):
+    """
+    Build an empty (untrained) faiss index of the requested type via index_factory.
+    Returns (index, params) where params records what was actually built.
+    """
+    import faiss
+
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index_type {index_type!r}, expected one of {INDEX_TYPES}")
+
+    params = {"index_type": index_type, "dim": dim}
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dim), params
+
+    if index_type == "hnsw":
+        params["hnsw_m"] = hnsw_m
+        return faiss.index_factory(dim, f"HNSW{hnsw_m}", faiss.METRIC_L2), params
+
+    nlist = nlist or default_nlist(n_vectors)
+    nlist = max(1, min(nlist, n_vectors))
+    params["nlist"] = nlist
+    if index_type == "ivf_flat":
+        return faiss.index_factory(dim, f"IVF{nlist},Flat", faiss.METRIC_L2), params
+
+    # ivf_pq: sub-quantizer count must divide dim, and PQ training needs >= 2**nbits points
+    while pq_m > 1 and dim % pq_m != 0:
+        pq_m -= 1
+    while pq_nbits > 1 and (1 << pq_nbits) > n_vectors:
+        pq_nbits -= 1
+    params.update({"pq_m": pq_m, "pq_nbits": pq_nbits})
+    return faiss.index_factory(dim, f"IVF{nlist},PQ{pq_m}x{pq_nbits}", faiss.METRIC_L2), params
+
+
+def train_faiss_index(index, vectors, train_size: int = FAISS_TRAIN_SIZE, seed: int = 0):
+    """Train IVF/PQ indexes on a random sample of the corpus (no-op for flat/hnsw)."""
+    import numpy as np
+
+    if index.is_trained:
+        return index
+    n = vectors.shape[0]
+    if n > train_size:
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(n, size=train_size, replace=False)]
+    else:
+        sample = vectors
+    index.train(np.ascontiguousarray(sample, dtype="float32"))
+    return index
+
+
+def search_params_for(index_type: Optional[str], nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> dict:
+    """The query-time knobs that apply to `index_type`: nprobe for IVF, ef_search for HNSW, none for flat."""
+    if index_type in ("ivf_flat", "ivf_pq"):
+        return {"nprobe": nprobe} if nprobe is not None else {}
+    if index_type == "hnsw":
+        return {"ef_search": ef_search} if ef_search is not None else {}
+    return {}
+
+
+def set_search_params(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """Apply query-time knobs: nprobe for IVF indexes, efSearch for HNSW."""
+    import faiss
+
+    if nprobe is not None:
+        try:
+            faiss.extract_index_ivf(index).nprobe = int(nprobe)
+        except RuntimeError as e:
+            # faiss raises RuntimeError when the index has no IVF layer
+            logging.warning(f"nprobe={nprobe} ignored for {type(index).__name__}: {e}")
+    if ef_search is not None:
+        if hasattr(index, "hnsw"):
+            index.hnsw.efSearch = int(ef_search)
+        else:
+            logging.warning(f"ef_search={ef_search} ignored: {type(index).__name__} is not an HNSW index")
+    return index
+
+
+def _write_index_meta(persist_dir: str, meta: dict):
+    with open(os.path.join(persist_dir, INDEX_META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def _read_index_meta(persist_dir: str) -> dict:
+    path = os.path.join(persist_dir, INDEX_META_FILE)
+    if not os.path.exists(path):
+        return {"index_type": "flat"}
+    with open(path) as f:
+        return json.load(f)
+
+
+def init_faiss_from_documents(documents: List[Document], persist_dir: str = VSTORE_DIR,
+                              index_type: str = INDEX_TYPE, nlist: Optional[int] = None,
+                              nprobe: int = FAISS_NPROBE, ef_search: int = FAISS_EF_SEARCH,
+                              train_size: int = FAISS_TRAIN_SIZE, **index_kwargs):
     embeddings = get_embeddings()
-    vs = FAISS.from_documents(documents, embeddings)
+    if index_type == "flat":
+        vs = FAISS.from_documents(documents, embeddings)
+        vs.save_local(persist_dir)
+        _write_index_meta(persist_dir, {"index_type": "flat", "n_vectors": len(documents)})
+        return vs
+
+    import numpy as np
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+
+    texts = [d.page_content for d in documents]
+    metadatas = [d.metadata for d in documents]
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype="float32")
+
+    index, params = make_faiss_index(vectors.shape[1], vectors.shape[0], index_type, nlist=nlist, **index_kwargs)
+    train_faiss_index(index, vectors, train_size=train_size)
+    search_params = search_params_for(index_type, nprobe, ef_search)
+    set_search_params(index, **search_params)
+
+    vs = FAISS(embedding_function=embeddings, index=index, docstore=InMemoryDocstore(), index_to_docstore_id={})
+    vs.add_embeddings(zip(texts, vectors.tolist()), metadatas=metadatas)
     vs.save_local(persist_dir)
+
+    params.update({"n_vectors": int(vectors.shape[0]), **search_params})
+    _write_index_meta(persist_dir, params)
     return vs
 
 
-def load_faiss(persist_dir: str = VSTORE_DIR):
+def load_faiss(persist_dir: str = VSTORE_DIR, mmap: bool = FAISS_MMAP,
+               nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """
+    Load the persisted vectorstore. With mmap=True the faiss index is memory-mapped
+    from disk instead of read fully into RAM (works best for IVF indexes).
+    nprobe / ef_search override the values recorded at build time.
+    """
     embeddings = get_embeddings()
     if not os.path.exists(persist_dir):
         return None
-    return FAISS.load_local(persist_dir, embeddings, allow_dangerous_deserialization=True)
+    meta = _read_index_meta(persist_dir)
+    # recorded values only for the knob the stored index type has (older meta files kept both);
+    # an explicit override for the wrong type still reaches set_search_params and warns
+    recorded = search_params_for(meta.get("index_type"), meta.get("nprobe"), meta.get("ef_search"))
+    nprobe = nprobe if nprobe is not None else recorded.get("nprobe")
+    ef_search = ef_search if ef_search is not None else recorded.get("ef_search")
+
+    if not mmap:
+        vs = FAISS.load_local(persist_dir, embeddings, allow_dangerous_deserialization=True)
+        set_search_params(vs.index, nprobe=nprobe, ef_search=ef_search)
+        return vs
+
+    import pickle
+    import faiss
+
+    index = faiss.read_index(os.path.join(persist_dir, "index.faiss"), faiss.IO_FLAG_MMAP)
+    set_search_params(index, nprobe=nprobe, ef_search=ef_search)
+    with open(os.path.join(persist_dir, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embedding_function=embeddings, index=index, docstore=docstore, index_to_docstore_id=index_to_docstore_id)
 
 
 # small debug helper (safe)
@@ -110,6 +382,55 @@ def debug_inputs(inp):
     return inp
 
 
+RAG_PROMPT = PromptTemplate(
+    input_variables=["context", "question"],
+    template="""
+You are a supplier-analytics assistant. Use the supplier context to answer concisely.
+Cite only the chunks you used with tags like [S1], [S2] which correspond to the top retrieved documents.
+
+Context:
+{context}
+
+Question: {question}
+
+Answer briefly (1–2 sentences). At the end include a "Sources:" line listing the tags and the supplier ids, e.g.:
+Sources: [S1] supplier_id=1, [S2] supplier_id=2
+""",
+)
+
+
+def make_answer_chain(llm):
+    """
+    RAG prompt -> LLM -> string, for callers that already retrieved the docs.
+    Input: {"context": str, "question": str}
+    """
+    return RAG_PROMPT | llm | StrOutputParser()
+
+
+def batch_similarity_search(vs, questions: List[str], k: int = 5) -> List[List[Document]]:
+    """
+    Retrieve top-k docs for many questions with one embedding batch and one faiss search
+    (vs.similarity_search embeds and searches one query at a time).
+    """
+    import numpy as np
+
+    if not questions:
+        return []
+    vectors = np.asarray(vs.embeddings.embed_documents(list(questions)), dtype="float32")
+    _, ids = vs.index.search(vectors, k)
+    out: List[List[Document]] = []
+    for row in ids:
+        docs = []
+        for i in row:
+            if i == -1:
+                continue
+            doc = vs.docstore.search(vs.index_to_docstore_id[int(i)])
+            if isinstance(doc, Document):
+                docs.append(doc)
+        out.append(docs)
+    return out
+
+
 def make_retrieval_qa_chain(llm, persist_dir: str = VSTORE_DIR, k: int = 5):
     """
     Build a Runnable-based RAG pipeline that:
@@ -131,29 +452,15 @@ def make_retrieval_qa_chain(llm, persist_dir: str = VSTORE_DIR, k: int = 5):
             raise RuntimeError(f"FAISS returned non-list object: {docs}")
         return docs
 
-    prompt = PromptTemplate(
-        input_variables=["context", "question"],
-        template="""
-You are a supplier-analytics assistant. Use the supplier context to answer concisely.
-Cite only the chunks you used with tags like [S1], [S2] which correspond to the top retrieved documents.
-
-Context:
-{context}
-
-Question: {question}
-
-Answer briefly (1–2 sentences). At the end include a "Sources:" line listing the tags and the supplier ids, e.g.:
-Sources: [S1] supplier_id=1, [S2] supplier_id=2
-""",
-    )
-
+    prompt = RAG_PROMPT
     parser = StrOutputParser()
 
     rag_chain = (
         RunnableParallel(
             {
                 "question": RunnableLambda(lambda x: x["question"]),
-                "context": RunnableLambda(fetch_docs) | RunnableLambda(combine_docs),
+                "context": RunnableLambda(fetch_docs)
+                | RunnableLambda(lambda docs: combine_docs(docs, context_budget(getattr(llm, "model", None)))),
             }
         )
         | RunnableLambda(debug_inputs)
@@ -196,18 +503,6 @@ def make_pricing_chain(llm):
     return chain
 
 
-# ---------- Utility: create Document chunks from raw text ----------
-def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
-    out: List[str] = []
-    i = 0
-    n = len(text)
-    while i < n:
-        chunk = text[i : i + chunk_size]
-        out.append(chunk)
-        i += chunk_size - overlap
-    return out
-
-
 # ---------- Public convenience functions ----------
 def get_llm(model_name: str = "openai/gpt-4o-mini", temperature: float = 0.0, max_tokens: int = 512):
     llm = OpenRouterLLM()
@@ -25,6 +25,10 @@ if not has_column("items", "floor_price"):
     to_add.append(("floor_price", "NUMERIC DEFAULT 0.0"))
 if not has_column("items", "store_owner_whatsapp"):
     to_add.append(("store_owner_whatsapp", "TEXT"))
+if not has_column("items", "reorder_point"):
+    to_add.append(("reorder_point", "INTEGER"))
+if not has_column("items", "reorder_qty"):
+    to_add.append(("reorder_qty", "INTEGER"))
 
 if not to_add:
     print("No missing columns detected in items table.")
@@ -56,5 +60,73 @@ if not cur.fetchone():
     con.commit()
     print("price_change_log created.")
 
+if not has_column("supplier_messages", "parse_status"):
+    print("Adding supplier_messages.parse_status")
+    cur.execute("ALTER TABLE supplier_messages ADD COLUMN parse_status TEXT;")
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_supplier_messages_parse_status ON supplier_messages (parse_status);")
+    con.commit()
+
+cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='supplier_quotes';")
+if not cur.fetchone():
+    print("supplier_quotes table missing — creating it. Run `python quotes.py --backfill` to fill it.")
+    cur.execute("""
+    CREATE TABLE supplier_quotes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        message_id INTEGER,
+        supplier_id INTEGER,
+        item_key TEXT,
+        price NUMERIC,
+        price_max NUMERIC,
+        unit TEXT,
+        min_qty INTEGER,
+        eta_days INTEGER,
+        source TEXT DEFAULT 'regex',
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+    cur.execute("CREATE INDEX ix_supplier_quotes_message_id ON supplier_quotes (message_id);")
+    cur.execute("CREATE INDEX ix_supplier_quotes_supplier_id ON supplier_quotes (supplier_id);")
+    cur.execute("CREATE INDEX ix_supplier_quotes_item_price ON supplier_quotes (item_key, price);")
+    con.commit()
+    print("supplier_quotes created.")
+
+cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='job_runs';")
+if not cur.fetchone():
+    print("Scheduler tables missing — creating job_leases / job_runs.")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS job_leases (
+        name TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires_at DATETIME NOT NULL
+    );
+    """)
+    cur.execute("""
+    CREATE TABLE job_runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_name TEXT NOT NULL,
+        shard INTEGER DEFAULT 0,
+        shards INTEGER DEFAULT 1,
+        owner TEXT,
+        scheduled_for DATETIME,
+        started_at DATETIME,
+        finished_at DATETIME,
+        duration_ms FLOAT,
+        status TEXT DEFAULT 'running',
+        result TEXT,
+        error TEXT
+    );
+    """)
+    cur.execute("CREATE INDEX ix_job_runs_job_shard_slot ON job_runs (job_name, shard, scheduled_for);")
+    con.commit()
+    print("job_leases / job_runs created.")
+
+cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='inbound_messages';")
+if cur.fetchone():
+    for col, coltype in (("owner", "TEXT"), ("claimed_at", "DATETIME")):
+        if not has_column("inbound_messages", col):
+            print(f"Adding inbound_messages.{col}")
+            cur.execute(f"ALTER TABLE inbound_messages ADD COLUMN {col} {coltype};")
+    con.commit()
+
 con.close()
 print("Migration script finished. Now re-run seed.py")
@@ -0,0 +1,225 @@
+# quotes.py
+"""
+Supplier quote extraction stage — runs once when a supplier message arrives instead of
+re-parsing message text on every read.
+
+  1) utils.extract_quotes (compiled regexes: units, ranges, bulk tiers, Hindi/English ETA words)
+  2) messages the regexes could not read are marked `pending_llm` and extracted later in
+     batches by the LLM (one prompt per LLM_BATCH_SIZE messages)
+  3) results land in the indexed supplier_quotes table; readers use quotes_for_item()
+
+    python quotes.py --backfill      # regex pass over messages already in the DB
+    python quotes.py --llm-pending   # batched LLM pass over messages the regexes missed
+"""
+import json
+import re
+
+from db import SessionLocal
+from MODELS import Item, Supplier, SupplierMessage, SupplierQuote
+from utils import extract_quotes, item_key
+
+LLM_BATCH_SIZE = 20
+
+# parse_status values on SupplierMessage
+STATUS_REGEX = "regex"
+STATUS_LLM = "llm"
+STATUS_PENDING_LLM = "pending_llm"
+STATUS_UNPARSED = "unparsed"
+
+LLM_PROMPT = """Extract supplier price quotes from the numbered WhatsApp messages below.
+Known store items: {items}
+
+Return ONLY a JSON list with one object per quote:
+{{"idx": <message number>, "item": <known item name or null>, "price": <number>, "price_max": <number or null>,
+  "unit": <"kg" | "litre" | "loaf" | "piece" | "dozen" | "packet" | null>, "min_qty": <bulk tier minimum or null>,
+  "eta_days": <delivery days or null>}}
+Messages without any price produce no objects. Return [] if nothing is found.
+
+{messages}"""
+
+
+def item_names(db):
+    return [name for (name,) in db.query(Item.name).all()]
+
+
+def _store(db, msg, quotes, source):
+    for q in quotes:
+        db.add(SupplierQuote(
+            message_id=msg.id,
+            supplier_id=msg.supplier_id,
+            item_key=q.get("item_key"),
+            price=q.get("price"),
+            price_max=q.get("price_max"),
+            unit=q.get("unit"),
+            min_qty=q.get("min_qty"),
+            eta_days=q.get("eta_days"),
+            source=source,
+        ))
+
+
+def extract_message(db, msg, names=None):
+    """Regex pass for one stored message. Caller commits."""
+    names = names if names is not None else item_names(db)
+    quotes = extract_quotes(msg.message_text or "", names)
+    _store(db, msg, quotes, STATUS_REGEX)
+    msg.parse_status = STATUS_REGEX if quotes else STATUS_PENDING_LLM
+    return quotes
+
+
+def record_supplier_message(db, supplier_id, text, names=None):
+    """Persist an inbound supplier message and its extracted quotes in one transaction."""
+    msg = SupplierMessage(supplier_id=supplier_id, message_text=text)
+    db.add(msg)
+    db.flush()  # assigns msg.id
+    quotes = extract_message(db, msg, names)
+    db.commit()
+    return msg, quotes
+
+
+def find_supplier_by_number(db, number):
+    digits = re.sub(r"\D", "", number or "")[-10:]
+    if not digits:
+        return None
+    for s in db.query(Supplier).all():
+        if re.sub(r"\D", "", s.whatsapp_number or "").endswith(digits):
+            return s
+    return None
+
+
+def pending_llm_count(db):
+    return db.query(SupplierMessage).filter(SupplierMessage.parse_status == STATUS_PENDING_LLM).count()
+
+
+def backfill(batch_size=500):
+    """Regex-extract every message that has never been processed."""
+    db = SessionLocal()
+    try:
+        names = item_names(db)
+        total = 0
+        while True:
+            batch = (
+                db.query(SupplierMessage)
+                .filter(SupplierMessage.parse_status.is_(None))
+                .order_by(SupplierMessage.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            for msg in batch:
+                extract_message(db, msg, names)
+            db.commit()
+            total += len(batch)
+        return total
+    finally:
+        db.close()
+
+
+def _parse_llm_json(raw):
+    raw = str(raw).strip()
+    raw = re.sub(r"^```(?:json)?|```$", "", raw, flags=re.M).strip()
+    data = json.loads(raw)
+    return data if isinstance(data, list) else []
+
+
+def _num(v, cast=float):
+    try:
+        return cast(v) if v is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def llm_extract_pending(llm=None, batch_size=LLM_BATCH_SIZE):
+    """Batched LLM extraction for messages the regex parser could not read."""
+    if llm is None:
+        from langchain_agents import get_llm  # deferred: pulls in LangChain
+        llm = get_llm(max_tokens=1024)
+
+    db = SessionLocal()
+    done = 0
+    try:
+        names = item_names(db)
+        pending = (
+            db.query(SupplierMessage)
+            .filter(SupplierMessage.parse_status == STATUS_PENDING_LLM)
+            .order_by(SupplierMessage.id)
+            .all()
+        )
+        for i in range(0, len(pending), batch_size):
+            batch = pending[i : i + batch_size]
+            listing = "\n".join(f"{n}. {(m.message_text or '').strip()}" for n, m in enumerate(batch, start=1))
+            try:
+                rows = _parse_llm_json(llm.invoke(LLM_PROMPT.format(items=", ".join(names), messages=listing)))
+            except Exception as e:
+                print("LLM quote extraction failed for batch:", e)
+                continue
+
+            by_idx = {}
+            for r in rows:
+                if isinstance(r, dict) and _num(r.get("price")) is not None:
+                    by_idx.setdefault(_num(r.get("idx"), int), []).append(r)
+
+            for n, msg in enumerate(batch, start=1):
+                quotes = [
+                    {
+                        "item_key": item_key(r.get("item")) or None,
+                        "price": _num(r.get("price")),
+                        "price_max": _num(r.get("price_max")),
+                        "unit": r.get("unit"),
+                        "min_qty": _num(r.get("min_qty"), int),
+                        "eta_days": _num(r.get("eta_days"), int),
+                    }
+                    for r in by_idx.get(n, [])
+                ]
+                _store(db, msg, quotes, STATUS_LLM)
+                msg.parse_status = STATUS_LLM if quotes else STATUS_UNPARSED
+            db.commit()
+            done += len(batch)
+        return done
+    finally:
+        db.close()
+
+
+def quotes_for_item(db, name, limit=None):
+    """
+    Indexed lookup of extracted quotes for an item, cheapest first. Only per-unit quotes
+    (a unit and no bulk tier) are ranked by price; unit-less and tier quotes follow them.
+    """
+    q = (
+        db.query(SupplierQuote, SupplierMessage.message_text)
+        .join(SupplierMessage, SupplierMessage.id == SupplierQuote.message_id)
+        .filter(SupplierQuote.item_key == item_key(name))
+        .order_by(SupplierQuote.unit.is_(None), SupplierQuote.min_qty.isnot(None), SupplierQuote.price)
+    )
+    if limit:
+        q = q.limit(limit)
+    out = []
+    for quote, text in q.all():
+        out.append({
+            "supplier_id": quote.supplier_id,
+            "message_id": quote.message_id,
+            "excerpt": (text or "")[:400].replace("\n", " "),
+            "parsed_price": float(quote.price) if quote.price is not None else None,
+            "price_max": float(quote.price_max) if quote.price_max is not None else None,
+            "unit": quote.unit,
+            "min_qty": quote.min_qty,
+            "parsed_eta": quote.eta_days,
+            "source": quote.source,
+        })
+    return out
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extract structured supplier quotes")
+    parser.add_argument("--backfill", action="store_true", help="regex pass over unprocessed messages")
+    parser.add_argument("--llm-pending", action="store_true", help="LLM pass over messages the regexes missed")
+    args = parser.parse_args()
+
+    if args.backfill:
+        print(f"Regex-extracted {backfill()} messages.")
+    if args.llm_pending:
+        print(f"LLM-extracted {llm_extract_pending()} messages.")
+    if not (args.backfill or args.llm_pending):
+        parser.print_help()
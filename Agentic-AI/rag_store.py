@@ -0,0 +1,215 @@
+# rag_store.py
+"""
+Dependency-light vector store used by agents.py: a normalized float32 (or int8) NumPy
+matrix searched by dot product. No LangChain / FAISS import, and the persisted file is
+memory-mapped, so opening a store takes milliseconds regardless of its size.
+
+File layout (single file):
+    b"RAGSTORE" | uint64 header length | JSON header | padding to 64 bytes | matrix | [int8 row scales]
+
+    python rag_store.py --build           # embed supplier chunks from inventory.db (same as ingest.py)
+    python rag_store.py --build --int8    # 4x smaller matrix, ~1% score error
+    python rag_store.py --query "cheapest rice supplier"
+"""
+import json
+import os
+import struct
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+MAGIC = b"RAGSTORE"
+ALIGN = 64
+DEFAULT_PATH = os.getenv("RAG_STORE_PATH", "rag_store.bin")
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+_default_model = None
+
+
+def default_embed(texts: List[str]) -> np.ndarray:
+    """sentence-transformers, imported on first use so opening a store stays cheap."""
+    global _default_model
+    if _default_model is None:
+        from sentence_transformers import SentenceTransformer
+        _default_model = SentenceTransformer(EMBEDDING_MODEL)
+    return _default_model.encode(list(texts), normalize_embeddings=True, convert_to_numpy=True)
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    if x.ndim == 1:
+        x = x[None, :]
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def _quantize(x: np.ndarray):
+    """Symmetric per-row int8: x ~= q * scale."""
+    scale = np.abs(x).max(axis=1) / 127.0
+    scale = np.where(scale > 0, scale, 1.0).astype(np.float32)
+    q = np.clip(np.rint(x / scale[:, None]), -127, 127).astype(np.int8)
+    return q, scale
+
+
+class RAGStore:
+    def __init__(self, path: Optional[str] = DEFAULT_PATH, embed_fn: Optional[Callable] = None,
+                 quantize: bool = False):
+        self.path = path
+        self.embed_fn = embed_fn or default_embed
+        self.quantize = quantize
+        self.texts: List[str] = []
+        self.metadatas: List[Dict] = []
+        self._mat: Optional[np.ndarray] = None      # float32 (n, d) or int8 (n, d)
+        self._scale: Optional[np.ndarray] = None    # (n,) for int8
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self.texts)
+
+    @property
+    def dim(self) -> Optional[int]:
+        return None if self._mat is None else self._mat.shape[1]
+
+    # ---------- build ----------
+    def add(self, texts: Sequence[str], metadatas: Optional[Sequence[Dict]] = None, vectors=None):
+        texts = list(texts)
+        if not texts:
+            return
+        vecs = _normalize(vectors if vectors is not None else self.embed_fn(texts))
+        if self._mat is not None:
+            existing = self._mat.astype(np.float32) * (self._scale[:, None] if self._scale is not None else 1.0)
+            vecs = np.vstack([existing, vecs])
+        if self.quantize:
+            self._mat, self._scale = _quantize(vecs)
+        else:
+            self._mat, self._scale = np.ascontiguousarray(vecs, dtype=np.float32), None
+        self.texts.extend(texts)
+        self.metadatas.extend(list(metadatas) if metadatas is not None else [{} for _ in texts])
+
+    @classmethod
+    def build_from_db(cls, path: Optional[str] = DEFAULT_PATH, quantize: bool = False,
+                      embed_fn: Optional[Callable] = None, batch_size: int = 256):
+        """Index the same supplier chunks ingest.py feeds to FAISS."""
+        from db import SessionLocal
+        from chunking import supplier_message_chunks
+
+        db = SessionLocal()
+        try:
+            chunks = supplier_message_chunks(db)
+        finally:
+            db.close()
+        store = cls(path=None, embed_fn=embed_fn, quantize=quantize)
+        store.path = path
+        texts = [t for t, _ in chunks]
+        vecs = [store.embed_fn(texts[i : i + batch_size]) for i in range(0, len(texts), batch_size)]
+        if texts:
+            store.add(texts, [m for _, m in chunks], vectors=np.vstack(vecs))
+        return store
+
+    # ---------- search ----------
+    def search_vectors(self, queries: np.ndarray, k: int = 5):
+        """(scores, ids), each (n_queries, k'), best first. Cosine similarity."""
+        if self._mat is None or len(self) == 0:
+            n = 1 if np.ndim(queries) == 1 else len(queries)
+            return np.empty((n, 0), dtype=np.float32), np.empty((n, 0), dtype=np.int64)
+        q = _normalize(queries)
+        scores = self._mat @ q.T if self._scale is None else (self._mat @ q.T) * self._scale[:, None]
+        scores = np.asarray(scores, dtype=np.float32).T  # (n_queries, n_docs)
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top_scores, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+    def search(self, query: Union[str, Sequence[str]], k: int = 5):
+        """
+        search("rice price") -> [{"text", "score", "metadata"}, ...]
+        search(["q1", "q2"]) -> one such list per query (embedded + scored as one batch)
+        """
+        single = isinstance(query, str)
+        queries = [query] if single else list(query)
+        if not queries:
+            return []
+        scores, ids = self.search_vectors(self.embed_fn(queries), k)
+        results = [
+            [{"text": self.texts[i], "score": float(s), "metadata": self.metadatas[i]} for s, i in zip(srow, irow)]
+            for srow, irow in zip(scores, ids)
+        ]
+        return results[0] if single else results
+
+    # ---------- persistence ----------
+    def save(self, path: Optional[str] = None):
+        path = path or self.path
+        if not path:
+            raise ValueError("No path to save RAGStore to")
+        mat = self._mat if self._mat is not None else np.zeros((0, 0), dtype=np.float32)
+        header = json.dumps({
+            "dtype": str(mat.dtype),
+            "shape": list(mat.shape),
+            "quantized": self._scale is not None,
+            "texts": self.texts,
+            "metadatas": self.metadatas,
+        }).encode()
+        head_len = len(MAGIC) + 8 + len(header)
+        pad = (-head_len) % ALIGN
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            f.write(b"\0" * pad)
+            f.write(np.ascontiguousarray(mat).tobytes())
+            if self._scale is not None:
+                f.write(self._scale.astype(np.float32).tobytes())
+        os.replace(tmp, path)
+        self.path = path
+
+    def load(self, path: str):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a RAGStore file")
+            (hlen,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(hlen))
+        offset = len(MAGIC) + 8 + hlen
+        offset += (-offset) % ALIGN
+        shape = tuple(header["shape"])
+        dtype = np.dtype(header["dtype"])
+        self.texts, self.metadatas = header["texts"], header["metadatas"]
+        self.quantize = header["quantized"]
+        if not shape or shape[0] == 0:
+            self._mat, self._scale = None, None
+            return self
+        self._mat = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+        self._scale = None
+        if self.quantize:
+            s_off = offset + int(np.prod(shape)) * dtype.itemsize
+            self._scale = np.memmap(path, dtype=np.float32, mode="r", offset=s_off, shape=(shape[0],))
+        self.path = path
+        return self
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="NumPy RAG store for supplier messages")
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--build", action="store_true", help="rebuild from inventory.db")
+    parser.add_argument("--int8", action="store_true", help="store int8-quantized vectors")
+    parser.add_argument("--query", default=None)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.build:
+        t0 = time.perf_counter()
+        store = RAGStore.build_from_db(args.path, quantize=args.int8)
+        store.save()
+        print(f"Built {len(store)} chunks in {time.perf_counter() - t0:.2f}s → {args.path}")
+    if args.query:
+        t0 = time.perf_counter()
+        store = RAGStore(args.path)
+        t1 = time.perf_counter()
+        for r in store.search(args.query, k=args.k):
+            print(f"{r['score']:.3f}  {r['text'][:120]}")
+        print(f"open {1000 * (t1 - t0):.1f} ms, search {1000 * (time.perf_counter() - t1):.1f} ms (incl. embedding)")
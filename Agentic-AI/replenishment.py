@@ -0,0 +1,150 @@
+# replenishment.py
+"""
+Nightly replenishment optimizer: recomputes items.reorder_point / items.reorder_qty for the
+whole catalogue in one vectorized pass, so the stock monitor only compares stock against a
+stored number.
+
+  daily demand      d[i, t]   = units sold of item i on day t (last WINDOW_DAYS, zero-filled)
+  lead-time demand  mu_L      = mean(d) * L          sigma_L = std(d) * sqrt(L)
+  safety stock      SS        = z(service_level) * sigma_L
+  reorder point     ROP       = ceil(mu_L + SS)
+  EOQ               Q*        = sqrt(2 * annual_demand * ORDER_COST / (HOLDING_RATE * unit_cost))
+
+unit_cost is the cheapest extracted supplier quote for the item, else items.cost, else unit_price.
+Items with no sales in the window keep the legacy rule (threshold / max(lead*10, threshold*3)).
+
+    python replenishment.py                 # recompute and store
+    python replenishment.py --dry-run       # print without writing
+"""
+import datetime
+import os
+from statistics import NormalDist
+
+import numpy as np
+from sqlalchemy import text
+
+from db import SessionLocal
+from MODELS import Item
+from utils import item_key
+from testing import DEFAULT_REORDER_THRESHOLD
+
+WINDOW_DAYS = int(os.getenv("REPLENISH_WINDOW_DAYS", "60"))
+SERVICE_LEVEL = float(os.getenv("REPLENISH_SERVICE_LEVEL", "0.95"))
+ORDER_COST = float(os.getenv("REPLENISH_ORDER_COST", "50"))        # ₹ per purchase order
+HOLDING_RATE = float(os.getenv("REPLENISH_HOLDING_RATE", "0.25"))  # share of unit cost per year
+
+
+def demand_matrix(db, item_ids, window_days=WINDOW_DAYS, today=None):
+    """items x days matrix of units sold, built from one GROUP BY query."""
+    today = today or datetime.date.today()
+    start = today - datetime.timedelta(days=window_days)
+    rows = db.execute(
+        text(
+            "SELECT item_id, date(sold_at) AS day, SUM(qty) FROM sales_history "
+            "WHERE sold_at >= :start GROUP BY item_id, day"
+        ),
+        {"start": start.isoformat()},
+    ).fetchall()
+
+    pos = {iid: i for i, iid in enumerate(item_ids)}
+    d = np.zeros((len(item_ids), window_days), dtype=np.float64)
+    r_idx, c_idx, vals = [], [], []
+    for iid, day, qty in rows:
+        if iid not in pos or day is None:
+            continue
+        col = (datetime.date.fromisoformat(str(day)) - start).days
+        if 0 <= col < window_days:
+            r_idx.append(pos[iid])
+            c_idx.append(col)
+            vals.append(float(qty or 0))
+    np.add.at(d, (np.asarray(r_idx, dtype=int), np.asarray(c_idx, dtype=int)), np.asarray(vals))
+    return d
+
+
+def best_quote_prices(db):
+    """item_key -> cheapest quoted unit price (per-unit quotes only: no unit-less or bulk-tier prices)."""
+    rows = db.execute(
+        text(
+            "SELECT item_key, MIN(price) FROM supplier_quotes "
+            "WHERE price IS NOT NULL AND unit IS NOT NULL AND min_qty IS NULL GROUP BY item_key"
+        )
+    ).fetchall()
+    return {k: float(p) for k, p in rows if k}
+
+
+def compute_policy(demand, lead_days, unit_cost, service_level=SERVICE_LEVEL,
+                   order_cost=ORDER_COST, holding_rate=HOLDING_RATE,
+                   default_threshold=DEFAULT_REORDER_THRESHOLD):
+    """
+    Vectorized over items. demand: (n, days); lead_days, unit_cost: (n,).
+    Returns (reorder_point, reorder_qty) as int arrays.
+    """
+    lead = np.maximum(np.asarray(lead_days, dtype=np.float64), 1.0)
+    cost = np.asarray(unit_cost, dtype=np.float64)
+
+    mean_d = demand.mean(axis=1)
+    std_d = demand.std(axis=1, ddof=1) if demand.shape[1] > 1 else np.zeros(len(mean_d))
+    z = NormalDist().inv_cdf(service_level)
+
+    mu_l = mean_d * lead
+    safety = z * std_d * np.sqrt(lead)
+    rop = np.ceil(mu_l + safety)
+
+    holding = holding_rate * np.where(cost > 0, cost, np.nan)
+    eoq = np.sqrt(2.0 * mean_d * 365.0 * order_cost / holding)
+    # never order less than one lead time of demand; unknown cost -> lead-time demand
+    qty = np.ceil(np.fmax(np.nan_to_num(eoq, nan=0.0), mu_l))
+
+    no_sales = mean_d <= 0
+    legacy_qty = np.maximum(lead * 10, default_threshold * 3)
+    rop = np.where(no_sales, default_threshold, rop)
+    qty = np.where(no_sales, legacy_qty, np.maximum(qty, 1))
+    return rop.astype(int), qty.astype(int)
+
+
+def run_replenishment(service_level=SERVICE_LEVEL, dry_run=False):
+    db = SessionLocal()
+    try:
+        items = db.query(Item.item_id, Item.name, Item.lead_time_days, Item.cost, Item.unit_price).all()
+        if not items:
+            return []
+        ids = [it.item_id for it in items]
+        quotes = best_quote_prices(db)
+        unit_cost = [
+            quotes.get(item_key(it.name))
+            or (float(it.cost) if it.cost is not None else None)
+            or float(it.unit_price or 0.0)
+            for it in items
+        ]
+        rop, qty = compute_policy(
+            demand_matrix(db, ids),
+            [it.lead_time_days or 1 for it in items],
+            unit_cost,
+            service_level=service_level,
+        )
+        updates = [
+            {"item_id": iid, "reorder_point": int(r), "reorder_qty": int(q)}
+            for iid, r, q in zip(ids, rop, qty)
+        ]
+        if not dry_run:
+            db.bulk_update_mappings(Item, updates)
+            db.commit()
+        return updates
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Recompute reorder points / quantities for all items")
+    parser.add_argument("--service-level", type=float, default=SERVICE_LEVEL)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    t0 = time.time()
+    updates = run_replenishment(args.service_level, args.dry_run)
+    for u in updates:
+        print(u)
+    print(f"{'Computed' if args.dry_run else 'Updated'} {len(updates)} items in {time.time() - t0:.3f}s")
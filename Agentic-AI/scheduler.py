@@ -0,0 +1,293 @@
+# scheduler.py
+"""
+Lease-based job scheduler shared by every uvicorn worker (app.py) and `python daily.py`.
+
+Any number of processes may call tick(); the database decides who runs what:
+
+  - every job is split into `shards` (items are assigned by item_id % shards); shard s of job J
+    may only run in the process holding the row job_leases["J:s"]. Single-shard jobs
+    (replenishment) therefore have exactly one leader at a time.
+  - leases are taken with one conditional UPDATE (free, expired, or already ours) or an INSERT
+    that loses on the primary key, so two workers can never both win. A dead worker's shards
+    move to the others once its leases expire.
+  - each process keeps a heartbeat lease "worker:<owner>"; a worker holds at most
+    ceil(shards / live_workers) shards of a job and hands back the rest, so load spreads
+    when a new worker joins.
+  - interval jobs run when `every` seconds have passed since the shard's last run; daily jobs
+    run once per `daily_at` slot. A slot missed while nothing was running is caught up by
+    one run on the next tick (not one run per missed day). A daily job with no runs yet only
+    starts within FIRST_RUN_GRACE seconds after its slot, so a first deploy at noon does not
+    fire the 03:00 job immediately.
+  - every run is recorded in job_runs with its shard, owner, slot and duration.
+"""
+import datetime
+import math
+import os
+import socket
+import time
+import uuid
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import case, func, or_
+from sqlalchemy.exc import IntegrityError
+
+from db import SessionLocal
+from MODELS import JobLease, JobRun
+
+TICK_SECONDS = int(os.getenv("SCHEDULER_TICK_SECONDS", "15"))
+LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", "300"))
+# a daily job that has never run is not caught up if its slot is older than this
+FIRST_RUN_GRACE = int(os.getenv("SCHEDULER_FIRST_RUN_GRACE", "3600"))
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+STATUS_RUNNING = "running"
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+
+
+def _now():
+    # naive local time, like the cron hours APScheduler used
+    return datetime.datetime.now()
+
+
+class Job:
+    def __init__(self, name: str, fn: Callable, every: Optional[int] = None, daily_at: Optional[int] = None,
+                 shards: int = 1, lease_seconds: int = LEASE_SECONDS):
+        if (every is None) == (daily_at is None):
+            raise ValueError(f"job {name}: give exactly one of every= or daily_at=")
+        self.name = name
+        self.fn = fn
+        self.every = every
+        self.daily_at = daily_at
+        self.shards = max(1, shards)
+        self.lease_seconds = lease_seconds
+
+    def latest_slot(self, now):
+        slot = now.replace(hour=self.daily_at, minute=0, second=0, microsecond=0)
+        return slot if slot <= now else slot - datetime.timedelta(days=1)
+
+    def describe(self):
+        when = f"every {self.every}s" if self.every else f"daily at {self.daily_at:02d}:00"
+        return {"name": self.name, "schedule": when, "shards": self.shards, "lease_seconds": self.lease_seconds}
+
+
+JOBS: Dict[str, Job] = {}
+
+
+def register(name, fn, every=None, daily_at=None, shards=1, lease_seconds=LEASE_SECONDS):
+    """
+    fn(shard, shards) for sharded jobs, fn() otherwise. Re-registering a name replaces it.
+    """
+    JOBS[name] = Job(name, fn, every=every, daily_at=daily_at, shards=shards, lease_seconds=lease_seconds)
+    return JOBS[name]
+
+
+# -----------------------
+# Leases
+# -----------------------
+def acquire_lease(db, name, owner=OWNER, ttl=LEASE_SECONDS):
+    """Take or renew a lease. True if `owner` holds it for the next `ttl` seconds."""
+    now = _now()
+    expires = now + datetime.timedelta(seconds=ttl)
+    updated = (
+        db.query(JobLease)
+        .filter(JobLease.name == name, or_(JobLease.owner == owner, JobLease.expires_at < now))
+        .update({"owner": owner, "expires_at": expires}, synchronize_session=False)
+    )
+    if updated:
+        db.commit()
+        return True
+    try:
+        db.add(JobLease(name=name, owner=owner, expires_at=expires))
+        db.commit()
+        return True
+    except IntegrityError:
+        # row exists and is held by someone else
+        db.rollback()
+        return False
+
+
+def release_lease(db, name, owner=OWNER):
+    n = db.query(JobLease).filter(JobLease.name == name, JobLease.owner == owner).delete(synchronize_session=False)
+    db.commit()
+    return bool(n)
+
+
+def release_all(owner=OWNER):
+    """Drop every lease this process holds so other workers take over immediately (shutdown)."""
+    db = SessionLocal()
+    try:
+        n = db.query(JobLease).filter(JobLease.owner == owner).delete(synchronize_session=False)
+        db.commit()
+        return n
+    finally:
+        db.close()
+
+
+def live_workers(db):
+    return (
+        db.query(func.count(JobLease.name))
+        .filter(JobLease.name.like("worker:%"), JobLease.expires_at >= _now())
+        .scalar()
+        or 1
+    )
+
+
+def leases(db):
+    now = _now()
+    return [
+        {"name": l.name, "owner": l.owner, "expires_in": round((l.expires_at - now).total_seconds(), 1)}
+        for l in db.query(JobLease).order_by(JobLease.name).all()
+    ]
+
+
+# -----------------------
+# Runs
+# -----------------------
+def due_slot(db, job, shard, now=None):
+    """Slot this shard should run for now, or None if it is up to date."""
+    now = now or _now()
+    last = (
+        db.query(func.max(JobRun.scheduled_for))
+        .filter(JobRun.job_name == job.name, JobRun.shard == shard)
+        .scalar()
+    )
+    if job.every:
+        if last is None or (now - last).total_seconds() >= job.every:
+            return now
+        return None
+    slot = job.latest_slot(now)
+    if last is None:
+        # no history (first deploy / new job): wait for the next slot instead of treating this one as missed
+        return slot if (now - slot).total_seconds() <= FIRST_RUN_GRACE else None
+    return slot if last < slot else None
+
+
+def run_to_dict(r):
+    return {
+        "id": r.id,
+        "job": r.job_name,
+        "shard": r.shard,
+        "shards": r.shards,
+        "owner": r.owner,
+        "scheduled_for": r.scheduled_for.isoformat() if r.scheduled_for else None,
+        "started_at": r.started_at.isoformat() if r.started_at else None,
+        "duration_ms": r.duration_ms,
+        "status": r.status,
+        "result": r.result,
+        "error": r.error,
+    }
+
+
+def run_job(name, shard=0, shards=None, scheduled_for=None, owner=OWNER):
+    """Run one shard of a job now and record it in job_runs. Does not take the lease."""
+    job = JOBS[name]
+    shards = shards or job.shards
+    db = SessionLocal()
+    try:
+        started = _now()
+        run = JobRun(
+            job_name=name, shard=shard, shards=shards, owner=owner,
+            scheduled_for=scheduled_for or started, started_at=started, status=STATUS_RUNNING,
+        )
+        db.add(run)
+        db.commit()
+
+        t0 = time.perf_counter()
+        try:
+            result = job.fn(shard, shards) if shards > 1 else job.fn()
+            run.status = STATUS_OK
+            run.result = str(result)[:1000] if result is not None else None
+        except Exception as e:
+            run.status = STATUS_ERROR
+            run.error = f"{type(e).__name__}: {e}"[:1000]
+            print(f"Job {name} shard {shard}/{shards} failed:", e)
+        run.duration_ms = round((time.perf_counter() - t0) * 1000, 1)
+        run.finished_at = _now()
+        db.commit()
+        return run_to_dict(run)
+    finally:
+        db.close()
+
+
+def tick(owner=OWNER, now=None):
+    """
+    One scheduling pass: heartbeat, rebalance shard leases, run whatever is due on the
+    shards we hold. Blocking; returns the runs it made.
+    """
+    db = SessionLocal()
+    runs = []
+    try:
+        acquire_lease(db, f"worker:{owner}", owner, ttl=3 * TICK_SECONDS)
+        workers = live_workers(db)
+        for job in list(JOBS.values()):
+            share = math.ceil(job.shards / workers)
+            held = 0
+            for shard in range(job.shards):
+                lease = f"{job.name}:{shard}"
+                if held >= share:
+                    release_lease(db, lease, owner)
+                    continue
+                if not acquire_lease(db, lease, owner, ttl=job.lease_seconds):
+                    continue
+                held += 1
+                slot = due_slot(db, job, shard, now)
+                if slot is not None:
+                    runs.append(run_job(job.name, shard, job.shards, scheduled_for=slot, owner=owner))
+                    # the run may have been long: renew before moving on
+                    acquire_lease(db, lease, owner, ttl=job.lease_seconds)
+        return runs
+    finally:
+        db.close()
+
+
+def serve(owner=OWNER, tick_seconds=TICK_SECONDS):
+    """Blocking loop for a dedicated scheduler process."""
+    print(f"Scheduler {owner} running {sorted(JOBS)} (tick {tick_seconds}s)")
+    try:
+        while True:
+            try:
+                for r in tick(owner):
+                    print(f"{r['job']}[{r['shard']}/{r['shards']}] {r['status']} in {r['duration_ms']} ms")
+            except Exception as e:
+                print("Scheduler tick failed:", e)
+            time.sleep(tick_seconds)
+    finally:
+        release_all(owner)
+
+
+# -----------------------
+# History
+# -----------------------
+def recent_runs(db, job_name=None, limit=50):
+    q = db.query(JobRun)
+    if job_name:
+        q = q.filter(JobRun.job_name == job_name)
+    return [run_to_dict(r) for r in q.order_by(JobRun.id.desc()).limit(limit).all()]
+
+
+def job_stats(db):
+    """Per-job run counts and durations over the whole history."""
+    rows = (
+        db.query(
+            JobRun.job_name,
+            func.count(JobRun.id),
+            func.sum(case((JobRun.status == STATUS_ERROR, 1), else_=0)),
+            func.avg(JobRun.duration_ms),
+            func.max(JobRun.duration_ms),
+            func.max(JobRun.started_at),
+        )
+        .group_by(JobRun.job_name)
+        .all()
+    )
+    return [
+        {
+            "job": name,
+            "runs": int(n),
+            "errors": int(errors or 0),
+            "avg_ms": round(float(avg), 1) if avg is not None else None,
+            "max_ms": max_ms,
+            "last_started_at": last.isoformat() if last else None,
+        }
+        for name, n, errors, avg, max_ms, last in rows
+    ]
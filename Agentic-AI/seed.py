@@ -117,6 +117,10 @@ def seed():
                 db.add(sm)
         db.commit()
 
+        # extract structured quotes once, as the webhook does for live messages
+        from quotes import backfill
+        backfill()
+
         # Add some sales history rows for forecasts
         now = datetime.datetime.utcnow()
         # Basic sales patterns
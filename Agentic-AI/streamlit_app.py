@@ -5,6 +5,7 @@ import requests
 import streamlit as st
 import pandas as pd
 import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 # -------------------------
 from testing import OWNER_USERNAME as y
@@ -93,6 +94,82 @@ def safe_api(action, *args, **kwargs):
         st.error(f"API error: {e}")
         return None
 
+
+# -------------------------
+# dashboard data client: one conditional GET per rerun, supplier rows cached locally
+# -------------------------
+SNAPSHOT_TTL = int(os.getenv("DASHBOARD_SNAPSHOT_TTL", "15"))  # seconds between revalidations
+PREFETCH_WORKERS = 4
+
+
+@st.cache_resource
+def _snapshot_store():
+    # process-wide: last ETag + payload per auth token, shared by reruns of the same token
+    return {}
+
+
+def _headers_for(token):
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+
+def _auth_headers():
+    return _headers_for(st.session_state.get("auth_token"))
+
+
+@st.cache_data(ttl=SNAPSHOT_TTL, show_spinner=False)
+def _load_snapshot(headers_key: str, headers: dict):
+    """
+    Revalidate /dashboard/snapshot with If-None-Match; a 304 reuses the stored payload.
+    `headers_key` (the auth token, "" when logged out) keys both this cache and the ETag
+    store, so sessions never share a snapshot fetched with another token.
+    """
+    store = _snapshot_store().setdefault(headers_key, {"etag": None, "data": None})
+    headers = dict(headers)
+    if store["etag"]:
+        headers["If-None-Match"] = store["etag"]
+    r = session.get(f"{API_BASE}/dashboard/snapshot", timeout=20, headers=headers)
+    if r.status_code == 304 and store["data"] is not None:
+        return store["etag"], store["data"]
+    r.raise_for_status()
+    store["etag"], store["data"] = r.headers.get("ETag"), r.json()
+    return store["etag"], store["data"]
+
+
+def get_snapshot():
+    token = st.session_state.get("auth_token") or ""
+    return _load_snapshot(token, _headers_for(token))
+
+
+def _get_supplier_rows(item_name: str, headers: dict):
+    # runs in worker threads: plain requests, no st.* calls
+    r = requests.get(f"{API_BASE}/supplier_prices", params={"item": item_name}, timeout=20, headers=headers)
+    r.raise_for_status()
+    return r.json()
+
+
+def supplier_rows_cache(etag: str) -> dict:
+    """item name -> /supplier_prices payload, dropped whenever the snapshot ETag (items, suppliers, quotes) changes."""
+    cache = st.session_state.get("supplier_rows_cache")
+    if not cache or cache.get("etag") != etag:
+        cache = {"etag": etag, "rows": {}}
+        st.session_state["supplier_rows_cache"] = cache
+    return cache["rows"]
+
+
+def prefetch_supplier_rows(etag: str, item_names):
+    rows = supplier_rows_cache(etag)
+    missing = [n for n in item_names if n not in rows]
+    if not missing:
+        return
+    headers = _auth_headers()
+    with ThreadPoolExecutor(max_workers=PREFETCH_WORKERS) as pool:
+        futures = {name: pool.submit(_get_supplier_rows, name, headers) for name in missing}
+    for name, fut in futures.items():
+        try:
+            rows[name] = fut.result()
+        except Exception as e:
+            st.error(f"Supplier fetch failed for {name}: {e}")
+
 # -------------------------
 # login sidebar (owner only)
 # -------------------------
@@ -194,7 +271,10 @@ st.write("You are logged in as the store owner. Use the actions on the sidebar t
 # Inventory Section (Full Width)
 # -------------------------
 st.markdown("<div class='section-header'>Inventory</div>", unsafe_allow_html=True)
-items = safe_api(api_get, "/items") or []
+snapshot_etag, snapshot = safe_api(get_snapshot) or (None, {})
+items = snapshot.get("items", [])
+# warm supplier rows for low-stock items in parallel; selectbox changes then render from local state
+prefetch_supplier_rows(snapshot_etag, snapshot.get("low_stock", []))
 
 if items:
     df = pd.DataFrame(items)
@@ -229,6 +309,7 @@ if st.sidebar.button("Trigger stock monitor now"):
 
 if st.sidebar.button("Run dynamic pricing on all items"):
     res = safe_api(api_post, "/apply_pricing_all")
+    _load_snapshot.clear()  # prices changed: revalidate on the next rerun
     if res is not None:
         st.sidebar.success("Pricing run completed")
         st.sidebar.json(res)
@@ -247,13 +328,8 @@ products = []
 sel_name = None
 sel_item = None
 
-# Try to fetch products (defensive)
-try:
-    products = api_get("/items") or []
-except Exception as e:
-    # Log the error to the Streamlit UI but don't crash the app
-    st.error(f"Failed to fetch products: {e}")
-    products = []
+# Products come from the same snapshot as the inventory table (no second /items call)
+products = items
 
 # Build product selector UI safely
 if not products:
@@ -288,11 +364,14 @@ else:
 st.markdown("<div class='section-header'>Suppliers</div>", unsafe_allow_html=True)
 # call backend for supplier rows (replace older call)
 def fetch_supplier_rows(item_name):
-    try:
-        return api_get(f"/supplier_prices", params={"item": item_name})
-    except Exception as e:
-        st.error(f"Supplier fetch failed: {e}")
-        return {"rows": []}
+    rows = supplier_rows_cache(snapshot_etag)
+    if item_name not in rows:
+        try:
+            rows[item_name] = api_get(f"/supplier_prices", params={"item": item_name})
+        except Exception as e:
+            st.error(f"Supplier fetch failed: {e}")
+            return {"rows": []}
+    return rows[item_name]
 
 # usage
 if sel_item:
@@ -1,24 +1,172 @@
 # utils.py (ensure these exist)
 import re
+from functools import lru_cache
+
+# -----------------------
+# Supplier quote parsing (compiled once at import)
+# -----------------------
+_NUM = r"\d+(?:\.\d+)?"
+_CUR = r"(?:₹|rs\.?|inr)"
+
+# "₹42", "Rs 40-45", "₹40 to ₹45", "42 Rs", "40-45 rupees"
+PRICE_RE = re.compile(
+    rf"{_CUR}\s*(?P<lo>{_NUM})(?:\s*(?:-|–|to)\s*{_CUR}?\s*(?P<hi>{_NUM}))?"
+    rf"|(?P<lo2>{_NUM})(?:\s*(?:-|–|to)\s*(?P<hi2>{_NUM}))?\s*(?:rs\b|inr\b|rupees?\b|/-)",
+    re.I,
+)
+
+UNITS = {
+    "kg": "kg", "kgs": "kg", "kilo": "kg", "kilos": "kg", "kilogram": "kg", "kilograms": "kg",
+    "g": "g", "gm": "g", "gms": "g", "gram": "g", "grams": "g",
+    "l": "litre", "ltr": "litre", "ltrs": "litre", "litre": "litre", "litres": "litre", "liter": "litre", "liters": "litre",
+    "loaf": "loaf", "loaves": "loaf",
+    "pc": "piece", "pcs": "piece", "piece": "piece", "pieces": "piece",
+    "dozen": "dozen", "packet": "packet", "packets": "packet", "pkt": "packet",
+    "bag": "bag", "bags": "bag", "unit": "unit", "units": "unit",
+}
+_UNIT_ALT = "|".join(sorted(UNITS, key=len, reverse=True))
+
+# unit right after a price: "/kg", "per kg", "a litre", "each loaf"
+UNIT_AFTER_PRICE_RE = re.compile(rf"\s*(?:/|per|a|an|each|for\s+1|for\s+one)?\s*(?P<unit>{_UNIT_ALT})\b", re.I)
+
+# pack price right after a price: "per 25 kg bag", "for 15 litre tin", "/ 500 g pack"
+PACK_AFTER_PRICE_RE = re.compile(
+    rf"\s*(?:/|per|for|a|an|each)?\s*(?:a\s+)?(?P<size>{_NUM})\s*(?P<unit>{_UNIT_ALT})\b", re.I
+)
+# pack units are priced per base unit: 1200 per 25 kg bag -> 48/kg, 30 per 500 g -> 60/kg
+BASE_UNITS = {"g": ("kg", 0.001)}
+
+# bulk tiers: "for orders > 100 kg", "above 50 kg", "min 20 loaves", "100+ kg"
+TIER_RE = re.compile(
+    rf"(?:(?:>=?|above|over|more\s+than|min(?:imum)?|at\s+least)\s*(?P<qty>\d+)|(?P<qty2>\d+)\s*\+)\s*(?P<unit>{_UNIT_ALT})?\b",
+    re.I,
+)
+
+# ETA: numeric days ("2 days", "3-4 din", "1d") and English/Hindi day words
+ETA_DAYS_RE = re.compile(r"(?P<lo>\d+)(?:\s*(?:-|–|to)\s*(?P<hi>\d+))?\s*(?:days?|din|d)\b", re.I)
+ETA_WORDS = {
+    "day after tomorrow": 2, "parso": 2, "parson": 2, "परसों": 2,
+    "same-day": 0, "same day": 0, "today": 0, "tonight": 0, "aaj": 0, "आज": 0,
+    "next-day": 1, "next day": 1, "tomorrow": 1, "kal": 1, "कल": 1,
+    "next week": 7, "a week": 7, "hafta": 7, "hafte": 7,
+}
+ETA_WORDS_RE = re.compile(
+    r"(?<!\w)(" + "|".join(re.escape(w) for w in sorted(ETA_WORDS, key=len, reverse=True)) + r")(?!\w)",
+    re.I,
+)
+
+
+def item_key(name):
+    """'Rice (1kg)' -> 'rice', 'Toor Dal' -> 'toor dal' — the key quotes are stored under."""
+    if not name:
+        return ""
+    name = re.sub(r"\(.*?\)", " ", str(name).lower())
+    return " ".join(re.sub(r"[^a-z\s]", " ", name).split())
+
+
+@lru_cache(maxsize=32)
+def _item_pattern(keys):
+    alts = "|".join(re.escape(k) for k in sorted(keys, key=len, reverse=True))
+    return re.compile(rf"\b({alts})(?:e?s)?\b", re.I)
+
+
+def _prices(text):
+    out = []
+    for m in PRICE_RE.finditer(text):
+        lo = m.group("lo") or m.group("lo2")
+        hi = m.group("hi") or m.group("hi2")
+        price, price_max = float(lo), float(hi) if hi else None
+        u = UNIT_AFTER_PRICE_RE.match(text, m.end())
+        pack = None if u else PACK_AFTER_PRICE_RE.match(text, m.end())
+        if pack and float(pack.group("size")) > 0:
+            unit, scale = UNITS[pack.group("unit").lower()], 1.0
+            unit, scale = BASE_UNITS.get(unit, (unit, scale))
+            size = float(pack.group("size")) * scale
+            price = round(price / size, 2)
+            price_max = round(price_max / size, 2) if price_max else None
+            u = pack
+        else:
+            unit = UNITS[u.group("unit").lower()] if u else None
+        out.append({
+            "pos": m.start(),
+            "end": u.end() if u else m.end(),
+            "price": price,
+            "price_max": price_max,
+            "unit": unit,
+        })
+    return out
+
+
+def _span(text, pos, end, seps):
+    """Bounds of the segment around text[pos:end], delimited by any of `seps`."""
+    starts = [i + len(sep) for sep, i in ((sep, text.rfind(sep, 0, pos)) for sep in seps) if i != -1]
+    start = max(starts) if starts else 0
+    stops = [i for i in (text.find(sep, end) for sep in seps) if i != -1]
+    return start, min(stops) if stops else len(text)
+
+
 def parse_price(text):
     if not text: return None
-    m = re.search(r"₹\s*([0-9]+(?:\.[0-9]+)?)", text)
-    if m: return float(m.group(1))
-    m2 = re.search(r"(\d+)\s*(?:Rs|INR)", text)
-    if m2: return float(m2.group(1))
-    return None
+    prices = _prices(text)
+    return prices[0]["price"] if prices else None
+
 
 def parse_eta(text):
     if not text: return None
-    m = re.search(r"(\d+)\s*(?:day|days|d)\b", text)
+    m = ETA_DAYS_RE.search(text)
     if m: return int(m.group(1))
-    if re.search(r"\btomorrow\b", text, re.I): return 1
-    if re.search(r"\btoday\b", text, re.I): return 0
+    m = ETA_WORDS_RE.search(text)
+    if m: return ETA_WORDS[m.group(1).lower()]
     return None
 
+
+def parse_tier(text):
+    """Minimum order quantity of a bulk tier ('orders > 100 kg' -> 100), else None."""
+    if not text: return None
+    m = TIER_RE.search(text)
+    if not m: return None
+    return int(m.group("qty") or m.group("qty2"))
+
+
+def extract_quotes(text, item_names=()):
+    """
+    Turn one supplier message into structured quotes:
+      [{"item_key", "price", "price_max", "unit", "min_qty", "eta_days"}, ...]
+    Each price is attributed to the closest item mentioned before it (or the first
+    item in the message). Tier and ETA are read from the sentence holding the price.
+    Returns [] when no price is found — those messages go to the LLM fallback.
+    """
+    if not text:
+        return []
+    keys = tuple(sorted({k for k in (item_key(n) for n in item_names) if k}))
+    mentions = [(m.start(), m.group(1).lower()) for m in _item_pattern(keys).finditer(text)] if keys else []
+    msg_eta = parse_eta(text)
+
+    quotes = []
+    for p in _prices(text):
+        before = [k for pos, k in mentions if pos <= p["pos"]]
+        key = before[-1] if before else (mentions[0][1] if mentions else None)
+        # tier is read from the clause holding the price, ETA from the rest of its sentence
+        c_start, c_stop = _span(text, p["pos"], p["end"], (". ", "\n", ",", ";"))
+        _, s_stop = _span(text, p["pos"], p["end"], (". ", "\n"))
+        eta = parse_eta(text[p["end"]:s_stop])
+        quotes.append({
+            "item_key": key,
+            "price": p["price"],
+            "price_max": p["price_max"],
+            "unit": p["unit"],
+            "min_qty": parse_tier(text[c_start:c_stop]),
+            "eta_days": eta if eta is not None else msg_eta,
+        })
+    return quotes
+
+
 def score_supplier(row):
     # row must have parsed_price and parsed_eta
     price = row.get("parsed_price") or 1e9
+    # unit-less / bulk-tier quotes aren't comparable per-unit prices (quote rows carry "unit")
+    if "unit" in row and (row["unit"] is None or row.get("min_qty") is not None):
+        price = 1e9
     eta = row.get("parsed_eta") if row.get("parsed_eta") is not None else 7
     # lower is better — weight price more
     return price * 0.7 + eta * 0.3 * 10
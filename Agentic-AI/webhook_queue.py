@@ -0,0 +1,48 @@
+# webhook_queue.py
+import asyncio
+import zlib
+from typing import Callable, List, Optional
+
+
+class SenderOrderedPool:
+    """
+    Fixed pool of asyncio workers, one queue each. Work for the same sender always lands on
+    the same queue, so one sender's messages are handled strictly in arrival order while
+    different senders are processed concurrently. `handler` is blocking and runs in a thread.
+    """
+
+    def __init__(self, handler: Callable[[int], None], workers: int = 4):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        if self._tasks:
+            return
+        self._queues = [asyncio.Queue() for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._run(q)) for q in self._queues]
+
+    async def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, sender: Optional[str], job_id: int):
+        # crc32 is stable across processes, unlike hash() on str
+        shard = zlib.crc32((sender or "").encode()) % self.workers
+        self._queues[shard].put_nowait(job_id)
+
+    def backlog(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    async def _run(self, q: asyncio.Queue):
+        while True:
+            job_id = await q.get()
+            try:
+                await asyncio.to_thread(self.handler, job_id)
+            except Exception as e:
+                print(f"Inbound worker failed on job {job_id}:", e)
+            finally:
+                q.task_done()
@@ -1,71 +1,84 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
 import os
-from datetime import datetime
-from tools.data_tools import DataTools
+from tools.data_tools import make_data_tools
+from tools.supplier_router import SupplierRouter, _item_key
 from tools.whatsapp_tool import WhatsAppTool
-from utils.forecast import simple_forecast
+from utils.forecast import DemandForecaster, forecast_demand
+from utils.simulate import RISK_THRESHOLD, SIM_PATHS, simulate_stock
 
 SUPPLIER_PHONE = os.getenv('SUPPLIER_PHONE', 'whatsapp:+918582945056')
 
 
+def _avg_daily(df):
+    avg = df['avg_daily_sales'].to_numpy(dtype=float) if 'avg_daily_sales' in df else np.full(len(df), np.nan)
+    return np.where(np.isnan(avg), 1.0, avg)
+
+
+def build_order_list(df_low: pd.DataFrame, days_ahead=3, demand=None):
+    """
+    Column-wise order lines for low-stock rows: forecast demand over days_ahead minus current
+    quantity. `demand` (one value per row) defaults to ceil(avg_daily_sales * days_ahead) with
+    missing averages counted as 1/day, i.e. the old per-row loop.
+    """
+    if df_low.empty:
+        return []
+    if demand is None:
+        demand = forecast_demand(_avg_daily(df_low), days_ahead)
+    qty_needed = demand - np.trunc(df_low['quantity'].to_numpy(dtype=float)).astype(np.int64)
+
+    keep = np.flatnonzero(qty_needed > 0)
+    items = df_low['item'].to_numpy(dtype=object)[keep]
+    units = df_low['unit'].to_numpy(dtype=object)[keep] if 'unit' in df_low else [''] * len(keep)
+    return [
+        {'item': item, 'qty': qty, 'unit': unit}
+        for item, qty, unit in zip(items.tolist(), qty_needed[keep].tolist(), list(units))
+    ]
+
+
 class InventoryAgent:
     def __init__(self, data_path='data/inventory.csv', orders_path='data/orders.csv'):
-        self.dt = DataTools(inventory_path=data_path)
+        self.dt = make_data_tools(inventory_path=data_path, orders_path=orders_path,
+                                  purchases_path=os.path.join(os.path.dirname(data_path), 'purchases.csv'))
         self.whatsapp = WhatsAppTool()
         self.orders_path = orders_path
-        self._ensure_orders_file()
-
-    def _ensure_orders_file(self):
-        """Create orders file if it doesn't exist"""
-        if not os.path.exists(self.orders_path):
-            os.makedirs(os.path.dirname(self.orders_path), exist_ok=True)
-            df = pd.DataFrame(columns=['order_id', 'timestamp', 'item', 'qty', 'unit', 'status', 'supplier_phone'])
-            df.to_csv(self.orders_path, index=False)
+        self.router = SupplierRouter(purchases_path=str(self.dt.purchases_path), default_phone=SUPPLIER_PHONE)
+        self.order_log = self.dt.order_log(orders_path)
+        # learns per-item daily demand from the order log (or data/sales.csv when present)
+        self.demand = DemandForecaster(
+            history_path=orders_path,
+            sales_path=os.path.join(os.path.dirname(orders_path), 'sales.csv'),
+            history=self.order_log,
+        )
 
     def _save_order(self, orders, supplier_phone, status='sent'):
-        """Save order to CSV"""
+        """Append order rows to the order log"""
         try:
-            order_id = datetime.now().strftime('%Y%m%d%H%M%S')
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-            records = []
-            for order in orders:
-                records.append({
-                    'order_id': order_id,
-                    'timestamp': timestamp,
-                    'item': order['item'],
-                    'qty': order['qty'],
-                    'unit': order.get('unit', ''),
-                    'status': status,
-                    'supplier_phone': supplier_phone
-                })
-
-            df_new = pd.DataFrame(records)
-
-            # Append to existing orders
-            if os.path.exists(self.orders_path):
-                df_existing = pd.read_csv(self.orders_path)
-                df_combined = pd.concat([df_existing, df_new], ignore_index=True)
-            else:
-                df_combined = df_new
-
-            df_combined.to_csv(self.orders_path, index=False)
-            return order_id
+            return self.order_log.append(orders, supplier_phone, status=status)
         except Exception as e:
             print(f"Error saving order: {e}")
             return None
 
     def get_order_history(self, limit=50):
-        """Retrieve recent order history"""
+        """Retrieve recent order history (reads only the end of the log)"""
         try:
-            if os.path.exists(self.orders_path):
-                df = pd.read_csv(self.orders_path)
-                return df.tail(limit).to_dict('records')
-            return []
+            return self.order_log.tail(limit)
         except Exception as e:
             print(f"Error loading order history: {e}")
             return []
 
+    def get_order_summary(self, offset=0, limit=20):
+        """One row per order (newest first) plus totals over the whole log, for paging in the UI"""
+        return self.order_log.summary(offset=offset, limit=limit)
+
+    def get_order_detail(self, order_id):
+        return self.order_log.lines(order_id)
+
+    def iter_order_csv(self):
+        return self.order_log.iter_csv()
+
     def identify_low_stock(self, df: pd.DataFrame):
         # If reorder_level column exists, use it. Else threshold 20% of max
         if 'reorder_level' in df.columns:
@@ -75,14 +88,10 @@ class InventoryAgent:
             return df[df['quantity'] <= 0.2 * max_qty]
 
     def create_order_list(self, df_low: pd.DataFrame, days_ahead=3):
-        orders = []
-        for _, r in df_low.iterrows():
-            avg = r.get('avg_daily_sales', None)
-            demand = simple_forecast(avg if pd.notna(avg) else 1, days_ahead)
-            qty_needed = max(demand - int(r['quantity']), 0)
-            if qty_needed > 0:
-                orders.append({'item': r['item'], 'qty': qty_needed, 'unit': r.get('unit', '')})
-        return orders
+        if df_low.empty:
+            return []
+        demand = self.demand.forecast(df_low['item'].to_numpy(dtype=object), days_ahead, fallback_avg=_avg_daily(df_low))
+        return build_order_list(df_low, days_ahead, demand=demand)
 
     def build_message(self, orders, store_name='My Store'):
         if not orders:
@@ -124,6 +133,138 @@ class InventoryAgent:
             'whatsapp_response': resp
         }
 
+    async def asend_confirmed_order(self, orders, store_name='My Store', supplier_phone=SUPPLIER_PHONE):
+        """send_confirmed_order for async callers: awaits the WhatsApp send, file append runs in a thread"""
+        if not orders:
+            return {'status': 'error', 'message': 'No orders to send'}
+
+        msg = self.build_message(orders, store_name)
+        resp = await self.whatsapp.asend(supplier_phone, msg)
+        order_id = await asyncio.to_thread(self._save_order, orders, supplier_phone, 'sent')
+
+        return {
+            'status': 'sent',
+            'message': 'Order sent successfully',
+            'orders': orders,
+            'order_id': order_id,
+            'whatsapp_response': resp
+        }
+
+    def simulate_order(self, days_ahead=3, orders=None, paths=SIM_PATHS, top=50, seed=None):
+        """
+        Stockout risk and leftover stock for the whole catalogue if `orders` (default: the preview's
+        order list) is placed now. Per-item daily demand is the forecast used for ordering; lead
+        times come from suppliers.csv via the router (SIM_LEAD_DAYS otherwise).
+        Returns totals over all items and the `top` riskiest items.
+        """
+        df = self.dt.load_inventory()
+        if df.empty:
+            return {'days_ahead': days_ahead, 'paths': paths, 'summary': {'items': 0}, 'items': []}
+        if orders is None:
+            low = self.identify_low_stock(df)
+            orders = self.create_order_list(low, days_ahead) if not low.empty else []
+
+        items = df['item'].astype(str).to_numpy(dtype=object)
+        daily = self.demand.forecast(items, days_ahead, fallback_avg=_avg_daily(df)) / max(days_ahead, 1)
+        ordered = {}
+        for o in orders:
+            ordered[str(o['item'])] = ordered.get(str(o['item']), 0) + float(o['qty'])
+        order_qty = np.array([ordered.get(i, 0.0) for i in items])
+        try:
+            lead = self.router.ranking()['lead_days']
+            keys = [_item_key(i) for i in items]
+            lead_days = np.array([lead.get(k, np.nan) for k in keys], dtype=float)
+        except Exception:
+            lead_days = None
+
+        sim = simulate_stock(
+            df['quantity'].to_numpy(dtype=float), daily, order_qty, lead_days,
+            df['price'].to_numpy(dtype=float) if 'price' in df else None,
+            days=days_ahead, paths=paths, seed=seed,
+        )
+        risk = np.argsort(-sim['stockout_prob'], kind='stable')[:max(top, 0)]
+        return {
+            'days_ahead': days_ahead,
+            'paths': paths,
+            'summary': {
+                'items': len(items),
+                'ordered_items': int((order_qty > 0).sum()),
+                'at_risk': int((sim['stockout_prob'] >= RISK_THRESHOLD).sum()),
+                'expected_lost_units': round(float(sim['expected_lost'].sum()), 2),
+                'expected_leftover_units': round(float(sim['expected_leftover'].sum()), 2),
+                'holding_cost': round(float(sim['holding_cost'].sum()), 2),
+            },
+            'items': [
+                {
+                    'item': items[i],
+                    'on_hand': float(df['quantity'].iat[i]),
+                    'order_qty': float(order_qty[i]),
+                    'daily_demand': round(float(daily[i]), 2),
+                    'lead_days': None if lead_days is None or np.isnan(lead_days[i]) else int(lead_days[i]),
+                    **{k: round(float(v[i]), 3 if k == 'stockout_prob' else 2) for k, v in sim.items()},
+                }
+                for i in risk.tolist()
+            ],
+        }
+
+    # ---------- per-supplier dispatch ----------
+    def split_order(self, orders, supplier_phone=SUPPLIER_PHONE):
+        """Group order lines by the supplier chosen from purchase history (one group if unknown)."""
+        try:
+            return self.router.split(orders, default_phone=supplier_phone)
+        except Exception as e:
+            print(f"Supplier routing unavailable, sending to {supplier_phone}: {e}")
+            return [{'supplier': 'default', 'phone': supplier_phone, 'orders': list(orders)}]
+
+    @staticmethod
+    def _dispatch_summary(orders, results):
+        sent = sum(r['status'] == 'sent' for r in results)
+        return {
+            'status': 'sent' if sent == len(results) else ('partial' if sent else 'failed'),
+            'message': f'Order sent to {sent} of {len(results)} supplier(s)',
+            'orders': orders,
+            'order_id': results[0]['order_id'] if len(results) == 1 else [r['order_id'] for r in results],
+            'dispatches': results,
+        }
+
+    def _dispatch_result(self, group, resp, error):
+        status = 'failed' if error else 'sent'
+        order_id = self._save_order(group['orders'], group['phone'], status=status)
+        return {**group, 'status': status, 'order_id': order_id, 'whatsapp_response': resp, 'error': error}
+
+    def send_split_order(self, orders, store_name='My Store', supplier_phone=SUPPLIER_PHONE):
+        """One message per supplier, sent in parallel threads; each is logged with its own status."""
+        if not orders:
+            return {'status': 'error', 'message': 'No orders to send'}
+        groups = self.split_order(orders, supplier_phone)
+
+        def dispatch(group):
+            try:
+                resp, error = self.whatsapp.send(group['phone'], self.build_message(group['orders'], store_name)), None
+            except Exception as e:
+                resp, error = None, str(e)
+            return self._dispatch_result(group, resp, error)
+
+        with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+            results = list(pool.map(dispatch, groups))
+        return self._dispatch_summary(orders, results)
+
+    async def asend_split_order(self, orders, store_name='My Store', supplier_phone=SUPPLIER_PHONE):
+        """send_split_order for async callers: all supplier messages are awaited together."""
+        if not orders:
+            return {'status': 'error', 'message': 'No orders to send'}
+        groups = await asyncio.to_thread(self.split_order, orders, supplier_phone)
+
+        async def dispatch(group):
+            try:
+                resp, error = await self.whatsapp.asend(group['phone'], self.build_message(group['orders'], store_name)), None
+            except Exception as e:
+                resp, error = None, str(e)
+            return await asyncio.to_thread(self._dispatch_result, group, resp, error)
+
+        results = await asyncio.gather(*(dispatch(g) for g in groups))
+        return self._dispatch_summary(orders, list(results))
+
     def create_and_send_order(self, days_ahead=3, store_name='My Store', supplier_phone=SUPPLIER_PHONE):
         """Legacy method - generates and sends immediately"""
         df = self.dt.load_inventory()
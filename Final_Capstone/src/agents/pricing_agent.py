@@ -1,37 +1,65 @@
-from tools.data_tools import DataTools
+from tools.data_tools import make_data_tools
+import numpy as np
 import pandas as pd
 
 
+def _column(df, name, default):
+    return df[name].to_numpy(dtype=float, copy=True) if name in df.columns else np.broadcast_to(default, len(df)).astype(float)
+
+
+def apply_pricing_rules(df: pd.DataFrame):
+    """
+    Overstock (quantity > 2x reorder_level) -> 10% discount, low stock (quantity <= reorder_level)
+    -> 5% markup, computed on whole columns. Returns (df with updated prices, changes in row order).
+    """
+    if df.empty:
+        return df, []
+    qty = _column(df, 'quantity', 0.0)
+    base = _column(df, 'price', 0.0)
+    reorder = _column(df, 'reorder_level', np.where(base != 0, 0.0, 10.0))
+
+    over = qty > reorder * 2
+    low = ~over & (qty <= reorder)
+    cand = np.flatnonzero(over | low)
+    raw = base[cand] * np.where(over[cand], 0.9, 1.05)
+    new = np.round(raw, 2)
+    # np.round scales by 100 first and can land on the other side of a half-cent tie than
+    # builtin round(); redo only the near-ties with round() so prices match the old loop exactly
+    ties = np.flatnonzero(np.abs(np.abs(raw * 100) % 1 - 0.5) < 1e-6)
+    new[ties] = [round(v, 2) for v in raw[ties].tolist()]
+
+    changed = new != base[cand]
+    idx, new = cand[changed], new[changed]
+    if idx.size:
+        df.iloc[idx, df.columns.get_loc('price')] = new
+
+    reasons = np.where(over[idx], 'overstock_discount', 'low_stock_markup')
+    changes = [
+        {'item': item, 'old': old, 'new': price, 'reason': reason}
+        for item, old, price, reason in zip(
+            df['item'].to_numpy(dtype=object)[idx].tolist(), base[idx].tolist(), new.tolist(), reasons.tolist()
+        )
+    ]
+    return df, changes
+
+
 class PricingAgent:
     def __init__(self, data_path='data/inventory.csv'):
-        self.dt = DataTools(inventory_path=data_path)
+        self.dt = make_data_tools(inventory_path=data_path)
 
 
     def run_pricing_rules(self):
         df = self.dt.load_inventory()
-        changes = []
-        for idx, row in df.iterrows():
-            qty = float(row.get('quantity', 0))
-            base = float(row.get('price', 0.0))
-            reorder = float(row.get('reorder_level', base*0 if base else 10))
-        # Overstock -> discount
-            if qty > reorder * 2:
-                new = round(base * 0.9, 2)
-                if new != base:
-                    changes.append({'item': row['item'], 'old': base, 'new': new, 'reason': 'overstock_discount'})
-                    df.at[idx, 'price'] = new
-            elif qty <= reorder:
-                new = round(base * 1.05, 2)
-                if new != base:
-                    changes.append({'item': row['item'], 'old': base, 'new': new, 'reason': 'low_stock_markup'})
-                    df.at[idx, 'price'] = new
+        df, changes = apply_pricing_rules(df)
         if changes:
-            self.dt.save_inventory(df)
+            # only the repriced rows are written (one UPDATE each on the sqlite backend)
+            self.dt.update_prices(changes)
         return changes
 
 
-    def generate_offer_message(self, offers):
-        lines = ['🔥 Today\'s Offers:']
+    @staticmethod
+    def generate_offer_message(offers, header=None):
+        lines = [header or '🔥 Today\'s Offers:']
         for o in offers:
             lines.append(f"{o['item']}: ₹{o['new']} (was ₹{o['old']})")
-        return ''.join(lines)
\ No newline at end of file
+        return '\n'.join(lines)
\ No newline at end of file
@@ -1,50 +1,253 @@
+import asyncio
+import csv
+import hashlib
+import io
+import json
 import os
+import threading
+from pathlib import Path
 import pandas as pd
 from langchain.embeddings import SentenceTransformerEmbeddings
 from langchain.vectorstores import FAISS
-from langchain.schema import Document
-from langchain.chains import ConversationalRetrievalChain
+from langchain.callbacks import AsyncIteratorCallbackHandler
+from langchain.chains import LLMChain
 from langchain.chat_models import ChatOpenAI
+from langchain.prompts import PromptTemplate
 from dotenv import load_dotenv
-from litellm import max_tokens
+from tools.data_tools import add_purchase_listener
+from tools.purchase_analytics import PurchaseAnalytics
+from utils.semantic_cache import SemanticCache
 
 # Load environment variables from .env file
 load_dotenv()
 
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+INDEX_META = 'meta.json'
+LLM_MODEL = os.getenv('SUPPLIER_LLM_MODEL', 'anthropic/claude-3.5-sonnet')  # or any OpenRouter model
+RETRIEVE_K = 5
+# questions this close (cosine) to an already answered one reuse its answer
+ANSWER_CACHE_THRESHOLD = float(os.getenv('SUPPLIER_CACHE_THRESHOLD', '0.95'))
+ANSWER_CACHE_TTL = int(os.getenv('SUPPLIER_CACHE_TTL', '3600'))
+
+# same prompt ConversationalRetrievalChain used for a one-shot question
+QA_PROMPT = PromptTemplate.from_template(
+    "Use the following pieces of context to answer the question at the end. If you don't know the answer, "
+    "just say that you don't know, don't try to make up an answer.\n\n"
+    "{context}\n\nQuestion: {question}\nHelpful Answer:"
+)
+
+
+def purchase_text(r):
+    return f"Date: {r['date']} | Supplier: {r['supplier']} | Item: {r['item']} | Qty: {r['qty']} | Price: {r['price']}"
+
+
+def _load_faiss(path, emb):
+    try:
+        # our own files, written by _save_index
+        return FAISS.load_local(str(path), emb, allow_dangerous_deserialization=True)
+    except TypeError:  # older langchain without the flag
+        return FAISS.load_local(str(path), emb)
+
 
 class SupplierHub:
-    def __init__(self, purchases_path='data/purchases.csv'):
-        self.purchases_path = purchases_path
-        self._build_index()
-
-    def _build_index(self):
-        df = pd.read_csv(self.purchases_path)
-        docs = []
-        for _, r in df.iterrows():
-            txt = f"Date: {r['date']} | Supplier: {r['supplier']} | Item: {r['item']} | Qty: {r['qty']} | Price: {r['price']}"
-            docs.append(
-                Document(page_content=txt, metadata={"supplier": r['supplier'], 'item': r['item'], 'date': r['date']}))
-        if docs:
-            emb = SentenceTransformerEmbeddings(model_name='all-MiniLM-L6-v2')
-            self.vs = FAISS.from_documents(docs, emb)
-        else:
-            self.vs = None
+    """
+    RAG over purchases.csv. The FAISS index is persisted next to the CSV (data/purchases_faiss/)
+    together with meta.json = {bytes, rows, hash} describing how much of the CSV it covers.
+    On start the saved index is loaded and only rows appended after `bytes` are embedded; if the
+    covered prefix no longer hashes the same (file edited/rewritten) the index is rebuilt.
+    """
+
+    def __init__(self, purchases_path='data/purchases.csv', index_dir=None):
+        self.purchases_path = Path(purchases_path)
+        self.index_dir = Path(index_dir) if index_dir else self.purchases_path.with_name(f'{self.purchases_path.stem}_faiss')
+        self.emb = SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL)
+        self.vs = None
+        self._meta = {'bytes': 0, 'rows': 0, 'hash': None, 'model': EMBEDDING_MODEL}
+        self._index_lock = threading.RLock()     # guards self.vs between search and add
+        self._refresh_lock = threading.Lock()    # one refresh at a time
+        self._worker_lock = threading.Lock()
+        self._worker = None
+        self._pending = False
+        self._qa_chain = None
+        self._chain_lock = threading.Lock()
+        self.cache = SemanticCache(threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL)
+        self.analytics = PurchaseAnalytics(purchases_path)
+        self._load_index()
+        # catch up on rows appended while the app was down without delaying startup
+        self.refresh_in_background()
+        add_purchase_listener(self._on_purchase_appended)
+
+    # ---------- index persistence ----------
+    def _load_index(self):
+        meta_path = self.index_dir / INDEX_META
+        if not meta_path.exists():
+            return
+        try:
+            meta = json.loads(meta_path.read_text())
+            if meta.get('model') != EMBEDDING_MODEL or not meta.get('rows'):
+                return
+            vs = _load_faiss(self.index_dir, self.emb)
+        except Exception as e:
+            print(f'Ignoring saved supplier index: {e}')
+            return
+        # meta.json is written last; a count mismatch means the previous save was interrupted
+        if vs.index.ntotal == meta['rows']:
+            self.vs, self._meta = vs, meta
+
+    def _save_index(self):
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        if self.vs is not None:
+            self.vs.save_local(str(self.index_dir))
+        tmp = self.index_dir / (INDEX_META + '.tmp')
+        tmp.write_text(json.dumps(self._meta))
+        os.replace(tmp, self.index_dir / INDEX_META)
+
+    # ---------- incremental refresh ----------
+    def refresh(self):
+        """Embed rows appended since the last build (full rebuild if the CSV was rewritten)."""
+        with self._refresh_lock:
+            if not self.purchases_path.exists():
+                return 0
+            data = self.purchases_path.read_bytes()
+            end = data.rfind(b'\n') + 1           # ignore a half-written last line
+            header_end = data.find(b'\n') + 1
+            start = self._meta['bytes']
+            if (self.vs is None or start > end or start < header_end
+                    or hashlib.sha1(data[:start]).hexdigest() != self._meta['hash']):
+                start = 0
+            if start == end and start:
+                return 0
+
+            columns = next(csv.reader([data[:header_end].decode('utf-8')])) if header_end else []
+            body = data[max(start, header_end):end]
+            df = pd.read_csv(io.BytesIO(body), header=None, names=columns) if body.strip() else pd.DataFrame(columns=columns)
+            records = df.to_dict('records')
+            texts = [purchase_text(r) for r in records]
+            metas = [{'supplier': r['supplier'], 'item': r['item'], 'date': r['date']} for r in records]
+            vectors = self.emb.embed_documents(texts) if texts else []
+
+            with self._index_lock:
+                if start == 0:
+                    self.vs = FAISS.from_embeddings(list(zip(texts, vectors)), self.emb, metadatas=metas) if texts else None
+                    rows = len(texts)
+                else:
+                    self.vs.add_embeddings(list(zip(texts, vectors)), metadatas=metas)
+                    rows = self._meta['rows'] + len(texts)
+                self._meta = {'bytes': end, 'rows': rows, 'hash': hashlib.sha1(data[:end]).hexdigest(),
+                              'model': EMBEDDING_MODEL}
+                self._save_index()
+            return len(texts)
+
+    def refresh_in_background(self):
+        """Coalescing background refresh: bursts of appends trigger at most one extra pass."""
+        with self._worker_lock:
+            self._pending = True
+            if self._worker is not None:
+                return
+            self._worker = threading.Thread(target=self._refresh_worker, name='supplier-index', daemon=True)
+            self._worker.start()
+
+    def _refresh_worker(self):
+        while True:
+            with self._worker_lock:
+                if not self._pending:
+                    self._worker = None
+                    return
+                self._pending = False
+            try:
+                added = self.refresh()
+                if added:
+                    print(f'Supplier index: embedded {added} purchase rows')
+            except Exception as e:
+                print(f'Supplier index refresh failed: {e}')
+
+    def _on_purchase_appended(self, path):
+        if Path(path).resolve() == self.purchases_path.resolve():
+            self.refresh_in_background()
+
+    # ---------- answering ----------
+    @property
+    def qa_chain(self):
+        """LLM client + prompt, built on first use and shared by every request."""
+        if self._qa_chain is None:
+            with self._chain_lock:
+                if self._qa_chain is None:
+                    # Configure OpenRouter; streaming=True only matters when a callback consumes tokens
+                    llm = ChatOpenAI(
+                        model=LLM_MODEL,
+                        openai_api_key=os.getenv("OPENROUTER_API_KEY"),
+                        openai_api_base="https://openrouter.ai/api/v1",
+                        temperature=0,
+                        max_tokens=1500,
+                        streaming=True,
+                    )
+                    self._qa_chain = LLMChain(llm=llm, prompt=QA_PROMPT)
+        return self._qa_chain
+
+    def _prepare(self, query_text):
+        """
+        Aggregate questions (averages, best supplier, totals, listings) are answered exactly by
+        PurchaseAnalytics without embeddings or the LLM. Otherwise embed the question once, for
+        both the cache lookup and retrieval.
+        Returns (final answer, None) or (None, (qvec, context, version)) for the LLM step.
+        """
+        try:
+            exact = self.analytics.answer(query_text)
+        except Exception as e:
+            print(f'Purchase analytics failed, using RAG: {e}')
+            exact = None
+        if exact is not None:
+            return exact, None
+
+        with self._index_lock:
+            if not self.vs:
+                if self._worker is not None:
+                    return 'Purchase history is still being indexed, please try again shortly.', None
+                return 'No purchase history available.', None
+            version = self._meta['bytes']
+            qvec = self.emb.embed_query(query_text)
+            cached = self.cache.get(qvec, version)
+            if cached is not None:
+                return cached, None
+            docs = self.vs.similarity_search_by_vector(qvec, k=RETRIEVE_K)
+        context = '\n\n'.join(d.page_content for d in docs)
+        return None, (qvec, context, version)
 
     def answer(self, query_text: str):
-        if not self.vs:
-            return 'No purchase history available.'
-        retriever = self.vs.as_retriever(search_kwargs={'k': 5})
-
-        # Configure OpenRouter
-        llm = ChatOpenAI(
-            model="anthropic/claude-3.5-sonnet",  # or any OpenRouter model
-            openai_api_key=os.getenv("OPENROUTER_API_KEY"),
-            openai_api_base="https://openrouter.ai/api/v1",
-            temperature=0,
-            max_tokens=1500
-        )
+        done, prep = self._prepare(query_text)
+        if done is not None:
+            return done
+        qvec, context, version = prep
+        answer = self.qa_chain.predict(context=context, question=query_text)
+        self.cache.put(qvec, answer, version)
+        return answer
 
-        chain = ConversationalRetrievalChain.from_llm(llm, retriever)
-        # one-shot (no memory) run
-        result = chain({"question": query_text, "chat_history": []})
-        return result['answer']
\ No newline at end of file
+    async def aanswer(self, query_text: str):
+        # embedding + FAISS search are CPU-bound; keep them off the event loop
+        done, prep = await asyncio.to_thread(self._prepare, query_text)
+        if done is not None:
+            return done
+        qvec, context, version = prep
+        answer = await self.qa_chain.apredict(context=context, question=query_text)
+        self.cache.put(qvec, answer, version)
+        return answer
+
+    async def astream(self, query_text: str):
+        """Yields answer tokens as the LLM produces them (a cached answer arrives as one chunk)."""
+        done, prep = await asyncio.to_thread(self._prepare, query_text)
+        if done is not None:
+            yield done
+            return
+        qvec, context, version = prep
+        handler = AsyncIteratorCallbackHandler()
+        task = asyncio.create_task(
+            self.qa_chain.apredict(context=context, question=query_text, callbacks=[handler])
+        )
+        try:
+            async for token in handler.aiter():
+                yield token
+            answer = await task
+        finally:
+            if not task.done():
+                task.cancel()
+        self.cache.put(qvec, answer, version)
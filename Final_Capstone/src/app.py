@@ -1,16 +1,23 @@
+import asyncio
+import functools
+import os
 import sys
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Add the src directory to Python path
 src_path = Path(__file__).parent
 sys.path.insert(0, str(src_path))
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import uvicorn
 from agents.inventory_agent import InventoryAgent
 from agents.pricing_agent import PricingAgent
 from agents.supplier_hub import SupplierHub
+from tools.offer_broadcast import OfferBroadcaster, load_segments, offers_from_changes
 
 
 app = FastAPI(title="Agentic Grocery OS")
@@ -19,6 +26,30 @@ app = FastAPI(title="Agentic Grocery OS")
 inventory_agent = InventoryAgent(data_path="data/inventory.csv", orders_path="data/orders.csv")
 pricing_agent = PricingAgent(data_path="data/inventory.csv")
 supplier_hub = SupplierHub(purchases_path="data/purchases.csv")
+# offer broadcasts share the WhatsApp HTTP session; customers.csv: phone[,segment]
+broadcaster = OfferBroadcaster(inventory_agent.whatsapp)
+CUSTOMERS_PATH = os.getenv('CUSTOMERS_PATH', 'data/customers.csv')
+SEGMENTS_PATH = os.getenv('SEGMENTS_PATH', 'data/segments.json')
+_broadcast_tasks = {}  # run_id -> asyncio.Task of the running broadcast
+
+# blocking work (pandas/CSV I/O, sync Twilio, LLM) runs here, never on the event loop;
+# bounded so a burst of requests cannot spawn unbounded threads
+WORKER_THREADS = int(os.getenv('API_WORKER_THREADS', '8'))
+_pool = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix='api-worker')
+
+
+async def run_blocking(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool, functools.partial(fn, *args, **kwargs))
+
+
+@app.on_event('shutdown')
+async def shutdown():
+    # interrupted broadcasts resume from their checkpoint via POST /pricing/broadcast {run_id}
+    for task in _broadcast_tasks.values():
+        task.cancel()
+    await inventory_agent.whatsapp.aclose()
+    _pool.shutdown(wait=False)
 
 
 class OrderRequest(BaseModel):
@@ -28,6 +59,8 @@ class OrderRequest(BaseModel):
 class ConfirmOrderRequest(BaseModel):
     orders: List[Dict[str, Any]]
     store_name: str = "My Store"
+    # one message per supplier picked from purchase history, sent concurrently
+    split_by_supplier: bool = False
 
 
 @app.get('/health')
@@ -39,7 +72,7 @@ async def health():
 async def preview_order(req: OrderRequest):
     """Preview order without sending to WhatsApp"""
     try:
-        result = inventory_agent.preview_order(days_ahead=req.days_ahead)
+        result = await run_blocking(inventory_agent.preview_order, days_ahead=req.days_ahead)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -49,44 +82,142 @@ async def preview_order(req: OrderRequest):
 async def confirm_order(req: ConfirmOrderRequest):
     """Send confirmed order via WhatsApp"""
     try:
-        result = inventory_agent.send_confirmed_order(
-            orders=req.orders,
-            store_name=req.store_name
-        )
+        send = inventory_agent.asend_split_order if req.split_by_supplier else inventory_agent.asend_confirmed_order
+        result = await send(orders=req.orders, store_name=req.store_name)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post('/order/split')
+async def split_order(req: ConfirmOrderRequest):
+    """Which supplier each line would go to with split_by_supplier, without sending"""
+    try:
+        groups = await run_blocking(inventory_agent.split_order, req.orders)
+        return {'dispatches': groups}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+class SimulateRequest(BaseModel):
+    days_ahead: int = 3
+    orders: Optional[List[Dict[str, Any]]] = None  # default: the current preview's order list
+    paths: int = 1000
+    top: int = 50
+    seed: Optional[int] = None
+
+
+@app.post('/order/simulate')
+async def simulate_order(req: SimulateRequest):
+    """Monte-Carlo stockout probability, lost sales and leftover stock if the order is placed"""
+    try:
+        return await run_blocking(inventory_agent.simulate_order, days_ahead=req.days_ahead, orders=req.orders,
+                                  paths=min(max(req.paths, 1), 10000), top=req.top, seed=req.seed)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get('/order/history')
 async def get_order_history(limit: int = 50):
     """Get order history"""
     try:
-        history = inventory_agent.get_order_history(limit=limit)
+        history = await run_blocking(inventory_agent.get_order_history, limit=limit)
         return {'orders': history}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get('/order/summary')
+async def get_order_summary(offset: int = 0, limit: int = 20):
+    """One row per order (newest first), paginated, with totals over the whole history"""
+    try:
+        return await run_blocking(inventory_agent.get_order_summary, offset=offset, limit=min(limit, 500))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get('/order/export')
+async def export_orders():
+    """Full order history as a streamed CSV download"""
+    filename = f"order_history_{datetime.now().strftime('%Y%m%d')}.csv"
+    # a sync iterator: Starlette pulls each chunk in its threadpool, off the event loop
+    return StreamingResponse(
+        inventory_agent.iter_order_csv(),
+        media_type='text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+
 @app.post('/order/auto')
 async def auto_order(req: OrderRequest):
     """Legacy endpoint - generates and sends order immediately"""
     try:
-        message, order_list = inventory_agent.create_and_send_order(days_ahead=req.days_ahead)
+        message, order_list = await run_blocking(inventory_agent.create_and_send_order, days_ahead=req.days_ahead)
         return {'message': message, 'order': order_list}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get('/order/{order_id}')
+async def get_order_detail(order_id: int):
+    """Item lines of a single order (registered after the fixed /order/... routes)"""
+    lines = await run_blocking(inventory_agent.get_order_detail, order_id)
+    if not lines:
+        raise HTTPException(status_code=404, detail=f'Order {order_id} not found')
+    return {'order_id': order_id, 'lines': lines}
+
+
 @app.post('/pricing/adjust')
 async def adjust_pricing():
     try:
-        changes = pricing_agent.run_pricing_rules()
+        changes = await run_blocking(pricing_agent.run_pricing_rules)
         return {'changes': changes}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class BroadcastRequest(BaseModel):
+    changes: List[Dict[str, Any]] = []  # output of /pricing/adjust; only price drops are sent
+    run_id: Optional[str] = None        # resume an existing broadcast instead
+
+
+@app.post('/pricing/broadcast')
+async def broadcast_offers(req: BroadcastRequest):
+    """Start (or resume) sending offers to every customer; poll GET /pricing/broadcast/{run_id}"""
+    if req.run_id:
+        run_id = req.run_id
+        if await run_blocking(broadcaster.status, run_id) is None:
+            raise HTTPException(status_code=404, detail=f'Broadcast {run_id} not found')
+    else:
+        offers = offers_from_changes(req.changes)
+        if not offers:
+            raise HTTPException(status_code=400, detail='No price drops to advertise')
+        if not os.path.exists(CUSTOMERS_PATH):
+            raise HTTPException(status_code=400, detail=f'Customer list {CUSTOMERS_PATH} not found')
+        try:
+            run_id = await run_blocking(broadcaster.create, offers, CUSTOMERS_PATH,
+                                        pricing_agent.generate_offer_message, load_segments(SEGMENTS_PATH))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    task = _broadcast_tasks.get(run_id)
+    if task is None or task.done():
+        _broadcast_tasks[run_id] = asyncio.create_task(broadcaster.run(run_id))
+    return {**await run_blocking(broadcaster.status, run_id), 'running': True}
+
+
+@app.get('/pricing/broadcast/{run_id}')
+async def broadcast_status(run_id: str, failed: bool = False):
+    status = await run_blocking(broadcaster.status, run_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f'Broadcast {run_id} not found')
+    task = _broadcast_tasks.get(run_id)
+    status['running'] = task is not None and not task.done()
+    if failed:
+        status['failed_recipients'] = await run_blocking(broadcaster.recipients, run_id, status='failed')
+    return status
+
+
 class QueryRequest(BaseModel):
     query: str
 
@@ -94,11 +225,17 @@ class QueryRequest(BaseModel):
 @app.post('/supplier/query')
 async def supplier_query(req: QueryRequest):
     try:
-        answer = supplier_hub.answer(req.query)
+        answer = await supplier_hub.aanswer(req.query)
         return {'answer': answer}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post('/supplier/query/stream')
+async def supplier_query_stream(req: QueryRequest):
+    """Same answer as /supplier/query, sent as plain-text chunks while the LLM generates it"""
+    return StreamingResponse(supplier_hub.astream(req.query), media_type='text/plain; charset=utf-8')
+
+
 if __name__ == '__main__':
     uvicorn.run('src.app:app', host='0.0.0.0', port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,149 @@
+"""
+Offer broadcast throughput against a local stub provider (no Twilio traffic).
+
+    python src/bench_broadcast.py --recipients 5000 --latency 0.2 --fail-rate 0.02
+    python src/bench_broadcast.py --recipients 5000 --interrupt 2     # cancel mid-run, then resume
+    python src/bench_broadcast.py --recipients 5000 --kill 2          # SIGKILL mid-run, then resume
+
+Runs the same recipient list through a one-at-a-time loop (how a naive script would send) and
+through OfferBroadcaster with --workers concurrent senders behind a --rate limit. The stub sleeps
+--latency seconds per message and fails --fail-rate of the attempts. With --interrupt the
+broadcast is cancelled after that many seconds and resumed from its checkpoint; --kill instead
+runs the first part in a child process and hard-kills it (no finally blocks, nothing flushed on
+the way out), the way an OOM kill or container restart would. The report shows how many
+recipients were messaged twice.
+"""
+import argparse
+import asyncio
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent))
+from agents.pricing_agent import PricingAgent
+from tools.offer_broadcast import OfferBroadcaster
+
+
+class StubProvider:
+    """WhatsAppTool.asend stand-in: fixed latency, random failures, counts deliveries per phone."""
+
+    def __init__(self, latency, fail_rate, seed=0, log_path=None):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.delivered = Counter()
+        self.rng = random.Random(seed)
+        # --kill: deliveries are logged unbuffered so they survive the killed process
+        self.log = None
+        if log_path:
+            path = Path(log_path)
+            if path.exists():
+                self.delivered.update(path.read_text().split())
+            self.log = open(path, 'a', buffering=1)
+
+    async def asend(self, to_number, body):
+        await asyncio.sleep(self.latency)
+        if self.rng.random() < self.fail_rate:
+            raise RuntimeError('stub provider: 503')
+        self.delivered[to_number] += 1
+        if self.log:
+            self.log.write(to_number + '\n')
+        return {'sid': f'SM{sum(self.delivered.values()):08d}'}
+
+
+def customers(n):
+    segments = ['all', 'regular', 'vip']
+    return pd.DataFrame({'phone': [f'whatsapp:+9190000{i:05d}' for i in range(n)],
+                         'segment': [segments[i % 3] for i in range(n)]})
+
+
+OFFERS = [{'item': 'Atta', 'old': 21.53, 'new': 19.38, 'reason': 'overstock_discount'},
+          {'item': 'Rice', 'old': 60.0, 'new': 54.0, 'reason': 'overstock_discount'}]
+SEGMENTS = {'vip': {'header': '⭐ Early offers for our regulars:'}, 'regular': {'items': ['Rice']}}
+
+
+async def sequential(n, latency, fail_rate):
+    provider = StubProvider(latency, fail_rate)
+    body = PricingAgent.generate_offer_message(OFFERS)
+    t0 = time.perf_counter()
+    for phone in customers(n)['phone']:
+        try:
+            await provider.asend(phone, body)
+        except RuntimeError:
+            pass
+    return n / (time.perf_counter() - t0)
+
+
+def killed_run(args, out_dir, run_id, log_path):
+    """Start the broadcast in a child process and SIGKILL it after --kill seconds."""
+    child = subprocess.Popen([sys.executable, __file__, '--child', out_dir, run_id, str(log_path),
+                              '--latency', str(args.latency), '--fail-rate', str(args.fail_rate),
+                              '--workers', str(args.workers), '--rate', str(args.rate)])
+    time.sleep(args.kill)
+    child.kill()
+    child.wait()
+
+
+async def child_run(args):
+    out_dir, run_id, log_path = args.child
+    provider = StubProvider(args.latency, args.fail_rate, log_path=log_path)
+    await OfferBroadcaster(provider, out_dir=out_dir, workers=args.workers, rate=args.rate).run(run_id)
+
+
+async def pipeline(args, out_dir):
+    log_path = Path(out_dir) / 'delivered.log' if args.kill else None
+    b = OfferBroadcaster(None, out_dir=out_dir, workers=args.workers, rate=args.rate)
+    run_id = b.create(OFFERS, customers(args.recipients), PricingAgent.generate_offer_message, SEGMENTS)
+    t0 = time.perf_counter()
+    if args.kill:
+        await asyncio.to_thread(killed_run, args, out_dir, run_id, log_path)
+        print(f"killed after {args.kill}s: {b.status(run_id)}")
+    # after --kill the provider starts from what the dead process already delivered
+    provider = StubProvider(args.latency, args.fail_rate, seed=1, log_path=log_path)
+    b.whatsapp = provider
+    if args.interrupt:
+        task = asyncio.create_task(b.run(run_id))
+        await asyncio.sleep(args.interrupt)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        print(f"interrupted after {args.interrupt}s: {b.status(run_id)}")
+    status = await b.run(run_id)
+    elapsed = time.perf_counter() - t0
+    dupes = sum(1 for c in provider.delivered.values() if c > 1)
+    return status, args.recipients / elapsed, dupes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offer broadcast throughput against a stub provider')
+    parser.add_argument('--recipients', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.2, help='stub seconds per message')
+    parser.add_argument('--fail-rate', type=float, default=0.02)
+    parser.add_argument('--workers', type=int, default=64)
+    parser.add_argument('--rate', type=float, default=0, help='messages/s limit (0 = unlimited)')
+    parser.add_argument('--interrupt', type=float, default=0, help='cancel after N seconds, then resume')
+    parser.add_argument('--kill', type=float, default=0, help='SIGKILL a child run after N seconds, then resume')
+    parser.add_argument('--skip-sequential', action='store_true')
+    parser.add_argument('--child', nargs=3, metavar=('OUT_DIR', 'RUN_ID', 'LOG'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(child_run(args))
+        sys.exit(0)
+
+    if not args.skip_sequential:
+        # the loop is capped at 1/latency msg/s, a few hundred messages are enough to measure it
+        n = min(args.recipients, max(20, int(5 / max(args.latency, 1e-3))))
+        print(f"sequential: {asyncio.run(sequential(n, args.latency, args.fail_rate)):8.1f} msg/s ({n} sends)")
+    with tempfile.TemporaryDirectory() as tmp:
+        status, rate, dupes = asyncio.run(pipeline(args, tmp))
+    print(f"pipeline:   {rate:8.1f} msg/s ({args.workers} workers, rate limit {args.rate or 'none'})")
+    print(f"status: {status}")
+    print(f"recipients messaged more than once: {dupes}")
@@ -0,0 +1,147 @@
+"""
+Concurrency benchmark for /order/preview while WhatsApp sends are in flight.
+
+    python src/bench_concurrency.py                          # blocking vs worker-pool routes, in-process
+    python src/bench_concurrency.py --url http://localhost:8000 --senders 0
+
+Compare mode serves the same InventoryAgent twice: once with the old route bodies (blocking calls
+inside `async def`) and once the way app.py now does it (run_in_executor on a bounded pool +
+awaited WhatsAppTool.asend). `--senders` clients keep posting /order/confirm against the stub
+sender, which sleeps WHATSAPP_STUB_DELAY seconds per message like a slow provider would; the
+remaining clients measure /order/preview throughput and latency. Data is copied to a temp dir.
+"""
+import argparse
+import asyncio
+import functools
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+os.environ.setdefault('WHATSAPP_STUB_DELAY', '0.5')
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from pydantic import BaseModel
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent))
+from agents.inventory_agent import InventoryAgent
+
+DATA_DIR = Path(__file__).parent.parent / 'data'
+
+
+class OrderRequest(BaseModel):
+    days_ahead: int = 3
+
+
+class ConfirmOrderRequest(BaseModel):
+    orders: List[Dict[str, Any]]
+    store_name: str = "My Store"
+
+
+def make_app(agent, mode, workers):
+    api = FastAPI()
+    if mode == 'blocking':
+        @api.post('/order/preview')
+        async def preview(req: OrderRequest):
+            return agent.preview_order(days_ahead=req.days_ahead)
+
+        @api.post('/order/confirm')
+        async def confirm(req: ConfirmOrderRequest):
+            return agent.send_confirmed_order(orders=req.orders, store_name=req.store_name)
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+
+        async def run_blocking(fn, *args, **kwargs):
+            return await asyncio.get_running_loop().run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+
+        @api.post('/order/preview')
+        async def preview(req: OrderRequest):
+            return await run_blocking(agent.preview_order, days_ahead=req.days_ahead)
+
+        @api.post('/order/confirm')
+        async def confirm(req: ConfirmOrderRequest):
+            return await agent.asend_confirmed_order(orders=req.orders, store_name=req.store_name)
+    return api
+
+
+def serve(api, port):
+    server = uvicorn.Server(uvicorn.Config(api, host='127.0.0.1', port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def load(url, clients, senders, duration):
+    latencies, sent = [], 0
+    deadline = time.perf_counter() + duration
+    order = {'orders': [{'item': 'Rice', 'qty': 1, 'unit': 'kg'}]}
+
+    async def previewer(client):
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            r = await client.post('/order/preview', json={'days_ahead': 3})
+            r.raise_for_status()
+            latencies.append(time.perf_counter() - t0)
+
+    async def sender(client):
+        nonlocal sent
+        while time.perf_counter() < deadline:
+            (await client.post('/order/confirm', json=order)).raise_for_status()
+            sent += 1
+
+    limits = httpx.Limits(max_connections=clients + senders + 4)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+        t0 = time.perf_counter()
+        await asyncio.gather(*[previewer(client) for _ in range(clients)], *[sender(client) for _ in range(senders)])
+        elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        'previews': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': 1000 * statistics.median(latencies) if latencies else None,
+        'p95_ms': 1000 * latencies[int(0.95 * (len(latencies) - 1))] if latencies else None,
+        'sends': sent,
+    }
+
+
+def report(label, r):
+    p50 = f"{r['p50_ms']:8.1f}" if r['p50_ms'] is not None else f"{'-':>8}"
+    p95 = f"{r['p95_ms']:8.1f}" if r['p95_ms'] is not None else f"{'-':>8}"
+    print(f"{label:10} {r['previews']:>9} {r['rps']:>8.1f} {p50} {p95} {r['sends']:>7}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Throughput of /order/preview under parallel load')
+    parser.add_argument('--url', default=None, help='benchmark a running server instead of comparing in-process')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--senders', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"stub send delay {os.environ['WHATSAPP_STUB_DELAY']}s, {args.clients} preview clients, {args.senders} senders")
+    print(f"{'mode':10} {'previews':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'sends':>7}")
+    if args.url:
+        report('server', asyncio.run(load(args.url, args.clients, args.senders, args.duration)))
+    else:
+        tmp = Path(tempfile.mkdtemp())
+        try:
+            shutil.copy(DATA_DIR / 'inventory.csv', tmp / 'inventory.csv')
+            agent = InventoryAgent(data_path=str(tmp / 'inventory.csv'), orders_path=str(tmp / 'orders.csv'))
+            for port, mode in ((8765, 'blocking'), (8766, 'pool')):
+                server = serve(make_app(agent, mode, args.workers), port)
+                try:
+                    report(mode, asyncio.run(load(f'http://127.0.0.1:{port}', args.clients, args.senders, args.duration)))
+                finally:
+                    server.should_exit = True
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
@@ -0,0 +1,277 @@
+"""
+Scaling / regression benchmarks for the capstone agents on synthetic data.
+
+    python src/bench_suite.py                                   # 1k, 10k, 100k rows, csv backend
+    python src/bench_suite.py --sizes 1000 1000000 --backends csv sqlite --out bench.json
+    python src/bench_suite.py --compare bench.json              # exit 1 on regressions
+
+For every size N a temp data dir gets N inventory rows, N purchases and an order log of N
+lines (written directly, not through the agents). Each benchmark is timed --repeat times
+(min and median are reported), then run once more under tracemalloc for peak Python/NumPy
+memory, so tracing overhead never skews the timings. SupplierHub uses deterministic hashed
+embeddings and a canned LLM unless --real-embeddings is given, so no model download or API
+call is needed; it is capped at --rag-max purchases and skipped if langchain is missing.
+
+Results are JSON ({'meta', 'results'}) on stdout or --out. --compare flags every benchmark whose
+median grew by more than --threshold (default 1.25x) against an earlier file.
+For the loop-vs-vectorized and event-loop comparisons see bench_vectorized.py and
+bench_concurrency.py.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from bench_vectorized import synthetic_inventory
+from tools.order_log import COLUMNS as ORDER_COLUMNS
+
+ORDER_LINES = 20          # lines in the order saved by the _save_order benchmark
+ORDER_ITEM_POOL = 10_000  # distinct items in the synthetic order log / purchases
+
+
+# ---------- synthetic data ----------
+def write_dataset(data_dir, n, seed=0):
+    rng = np.random.default_rng(seed)
+    inv = synthetic_inventory(n, seed)
+    inv.to_csv(data_dir / 'inventory.csv', index=False)
+
+    pool = inv['item'].astype(str).to_numpy()[:min(n, ORDER_ITEM_POOL)]
+    today = pd.Timestamp.today().normalize()
+    suppliers = np.array([f'Supplier {i:03d}' for i in range(max(2, min(n // 100, 500)))])
+    qty = rng.integers(1, 100, n)
+    pd.DataFrame({
+        'date': (today - pd.to_timedelta(rng.integers(1, 365, n), unit='D')).strftime('%Y-%m-%d'),
+        'supplier': rng.choice(suppliers, n),
+        'item': rng.choice(pool, n),
+        'qty': qty,
+        'price': (qty * rng.uniform(10, 300, n)).round(2),
+    }).to_csv(data_dir / 'purchases.csv', index=False)
+
+    # ~5 lines per order, ids increasing like OrderLog's
+    order_no = np.sort(rng.integers(0, max(n // 5, 1), n))
+    stamps = today - pd.to_timedelta(120, unit='D') + pd.to_timedelta(order_no * (120 * 86400 // max(n // 5, 1)), unit='s')
+    pd.DataFrame({
+        'order_id': 20000101000000 + order_no,
+        'timestamp': stamps.strftime('%Y-%m-%d %H:%M:%S'),
+        'item': rng.choice(pool, n),
+        'qty': rng.integers(1, 50, n),
+        'unit': 'kg',
+        'status': 'sent',
+        'supplier_phone': 'whatsapp:+910000000000',
+    })[ORDER_COLUMNS].to_csv(data_dir / 'orders.csv', index=False)
+
+
+# ---------- stubs for SupplierHub ----------
+def hashed_embeddings(dim=384):
+    from langchain.embeddings.base import Embeddings
+
+    class HashedEmbeddings(Embeddings):
+        """Bag-of-words hashed into `dim` buckets: deterministic, no model download."""
+
+        def _embed(self, text):
+            v = np.zeros(dim, dtype=np.float32)
+            for tok in text.lower().split():
+                v[zlib.crc32(tok.encode()) % dim] += 1.0
+            n = np.linalg.norm(v)
+            return (v / n if n else v).tolist()
+
+        def embed_documents(self, texts):
+            return [self._embed(t) for t in texts]
+
+        def embed_query(self, text):
+            return self._embed(text)
+
+    return HashedEmbeddings()
+
+
+class CannedChain:
+    """LLMChain stand-in: returns immediately with a fixed answer."""
+
+    def predict(self, **kwargs):
+        return 'stub answer'
+
+    async def apredict(self, **kwargs):
+        return 'stub answer'
+
+
+# ---------- measurement ----------
+def measure(fn, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'min_ms': round(min(times) * 1000, 3), 'median_ms': round(statistics.median(times) * 1000, 3),
+            'peak_mb': round(peak / 2 ** 20, 2)}
+
+
+def run_size(n, backend, args):
+    import tools.data_tools as data_tools
+    from agents.inventory_agent import InventoryAgent
+    from agents.pricing_agent import PricingAgent
+    data_tools.STORAGE_BACKEND = backend  # read by make_data_tools when the agents are built
+
+    tmp = Path(tempfile.mkdtemp(prefix=f'bench{n}_'))
+    results = []
+    # run inside the temp dir so every default relative path ('data/purchases.csv', the
+    # sqlite file, ...) an agent falls back to lands there and not in the working tree
+    cwd = os.getcwd()
+    os.chdir(tmp)
+
+    def record(name, stats, **extra):
+        row = {'bench': name, 'rows': n, 'backend': backend, **stats, **extra}
+        results.append(row)
+        print(f"{name:24} {backend:6} {n:>9} {stats['min_ms']:>11.1f} {stats['median_ms']:>11.1f} "
+              f"{stats['peak_mb']:>9.1f}", file=sys.stderr)
+
+    try:
+        write_dataset(tmp, n)
+        t0 = time.perf_counter()
+        agent = InventoryAgent(data_path=str(tmp / 'inventory.csv'), orders_path=str(tmp / 'orders.csv'))
+        pricing = PricingAgent(data_path=str(tmp / 'inventory.csv'))
+        init = round((time.perf_counter() - t0) * 1000, 3)  # includes the CSV import on sqlite
+        record('agent_init', {'min_ms': init, 'median_ms': init, 'peak_mb': 0.0})
+
+        # first preview pays for parsing and the demand-model fit, later ones hit the caches
+        t0 = time.perf_counter()
+        agent.preview_order(days_ahead=3)
+        cold = round((time.perf_counter() - t0) * 1000, 3)
+        record('preview_order_cold', {'min_ms': cold, 'median_ms': cold, 'peak_mb': 0.0})
+        record('preview_order', measure(lambda: agent.preview_order(days_ahead=3), args.repeat))
+        record('load_inventory', measure(agent.dt.load_inventory, args.repeat))
+        record('run_pricing_rules', measure(pricing.run_pricing_rules, args.repeat))
+
+        order = [{'item': f'SKU{i:07d}', 'qty': 5, 'unit': 'kg'} for i in range(ORDER_LINES)]
+        record('_save_order', measure(lambda: agent._save_order(order, 'whatsapp:+910000000000'), args.repeat))
+        record('get_order_history', measure(lambda: agent.get_order_history(limit=50), args.repeat))
+        record('get_order_summary', measure(lambda: agent.get_order_summary(limit=20), args.repeat))
+
+        if not args.skip_rag and n <= args.rag_max:
+            run_supplier_hub(tmp, args, record)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp, ignore_errors=True)
+    return results
+
+
+def run_supplier_hub(tmp, args, record):
+    try:
+        import agents.supplier_hub as hub_module
+    except ImportError as e:
+        print(f'SupplierHub skipped: {e}', file=sys.stderr)
+        return
+    if not args.real_embeddings:
+        hub_module.SentenceTransformerEmbeddings = lambda model_name: hashed_embeddings()
+
+    index_dir = tmp / 'purchases_faiss'
+
+    def reset():
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+    def build():
+        hub = hub_module.SupplierHub(purchases_path=str(tmp / 'purchases.csv'), index_dir=str(index_dir))
+        hub.refresh()
+        return hub
+
+    record('supplier_index_build', measure(build, max(1, args.repeat // 2), setup=reset))
+    hub = build()
+    hub._qa_chain = CannedChain()
+    hub.analytics.answer = lambda question, today=None: None  # force the RAG path
+    questions = [f'When did we last buy SKU{i:07d} and from whom?' for i in range(50)]
+    it = iter(range(10 ** 9))
+
+    def query():
+        hub.cache.clear()
+        asyncio.run(hub.aanswer(questions[next(it) % len(questions)]))
+
+    record('supplier_query', measure(query, args.repeat))
+
+
+# ---------- output ----------
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    base = {(r['bench'], r['rows'], r['backend']): r for r in json.loads(Path(baseline_path).read_text())['results']}
+    regressions = []
+    for r in results:
+        old = base.get((r['bench'], r['rows'], r['backend']))
+        if old and old['median_ms'] > 0 and r['median_ms'] / old['median_ms'] > threshold:
+            regressions.append({**r, 'baseline_ms': old['median_ms'], 'ratio': round(r['median_ms'] / old['median_ms'], 2)})
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--backends', nargs='+', default=['csv'], choices=['csv', 'sqlite'])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--rag-max', type=int, default=100_000, help='largest size that builds a FAISS index')
+    parser.add_argument('--skip-rag', action='store_true')
+    parser.add_argument('--real-embeddings', action='store_true')
+    parser.add_argument('--out', help='write JSON here instead of stdout')
+    parser.add_argument('--compare', help='earlier JSON output to check for regressions')
+    parser.add_argument('--threshold', type=float, default=1.25)
+    args = parser.parse_args()
+
+    print(f"{'bench':24} {'store':6} {'rows':>9} {'min ms':>11} {'median ms':>11} {'peak MB':>9}", file=sys.stderr)
+    results = []
+    for backend in args.backends:
+        for n in args.sizes:
+            results.extend(run_size(n, backend, args))
+
+    out = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    text = json.dumps(out, indent=2)
+    if args.out:
+        Path(args.out).write_text(text)
+    else:
+        print(text)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['bench']} {r['backend']} {r['rows']}: {r['baseline_ms']} -> {r['median_ms']} ms "
+                  f"({r['ratio']}x)", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,111 @@
+"""
+Micro-benchmark: per-row (iterrows) vs column-wise order list and pricing rules.
+
+    python src/bench_vectorized.py                       # 1k / 100k / 1M rows
+    python src/bench_vectorized.py --sizes 1000 50000 --legacy-max 50000
+
+The legacy paths are the old loops, kept here verbatim for comparison; above --legacy-max rows
+they are skipped (iterrows over 1M rows takes minutes). Outputs of both paths are checked equal.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent))
+from agents.inventory_agent import build_order_list
+from agents.pricing_agent import apply_pricing_rules
+from tools.data_tools import _with_dtypes
+from utils.forecast import simple_forecast
+
+
+def synthetic_inventory(n, seed=0):
+    rng = np.random.default_rng(seed)
+    avg = rng.gamma(2.0, 4.0, n).round(1)
+    avg[rng.random(n) < 0.05] = np.nan
+    return _with_dtypes(pd.DataFrame({
+        'item': [f'SKU{i:07d}' for i in range(n)],
+        'quantity': rng.integers(0, 200, n),
+        'reorder_level': rng.integers(5, 60, n),
+        'price': rng.integers(500, 50000, n) / 100,
+        'unit': rng.choice(['kg', 'litre', 'piece', 'packet'], n),
+        'avg_daily_sales': avg,
+    }))
+
+
+def legacy_create_order_list(df_low, days_ahead=3):
+    orders = []
+    for _, r in df_low.iterrows():
+        avg = r.get('avg_daily_sales', None)
+        demand = simple_forecast(avg if pd.notna(avg) else 1, days_ahead)
+        qty_needed = max(demand - int(r['quantity']), 0)
+        if qty_needed > 0:
+            orders.append({'item': r['item'], 'qty': qty_needed, 'unit': r.get('unit', '')})
+    return orders
+
+
+def legacy_pricing_rules(df):
+    changes = []
+    for idx, row in df.iterrows():
+        qty = float(row.get('quantity', 0))
+        base = float(row.get('price', 0.0))
+        reorder = float(row.get('reorder_level', base*0 if base else 10))
+        if qty > reorder * 2:
+            new = round(base * 0.9, 2)
+            if new != base:
+                changes.append({'item': row['item'], 'old': base, 'new': new, 'reason': 'overstock_discount'})
+                df.at[idx, 'price'] = new
+        elif qty <= reorder:
+            new = round(base * 1.05, 2)
+            if new != base:
+                changes.append({'item': row['item'], 'old': base, 'new': new, 'reason': 'low_stock_markup'})
+                df.at[idx, 'price'] = new
+    return df, changes
+
+
+def best_of(fn, repeat):
+    best, out = float('inf'), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def bench(n, repeat, legacy_max):
+    df = synthetic_inventory(n)
+    low = df[df['quantity'] <= df['reorder_level']]
+    rows = []
+
+    t_new, orders = best_of(lambda: build_order_list(low, 3), repeat)
+    t_old = None
+    if n <= legacy_max:
+        t_old, legacy_orders = best_of(lambda: legacy_create_order_list(low, 3), 1)
+        assert orders == legacy_orders, 'order lists differ'
+    rows.append(('create_order_list', n, t_old, t_new))
+
+    t_new, (_, changes) = best_of(lambda: apply_pricing_rules(df.copy()), repeat)
+    t_old = None
+    if n <= legacy_max:
+        t_old, (_, legacy_changes) = best_of(lambda: legacy_pricing_rules(df.copy()), 1)
+        assert changes == legacy_changes, 'pricing changes differ'
+    rows.append(('run_pricing_rules', n, t_old, t_new))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--legacy-max', type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"{'path':20} {'rows':>9} {'iterrows':>11} {'vectorized':>11} {'speedup':>9}")
+    for n in args.sizes:
+        for name, rows, t_old, t_new in bench(n, args.repeat, args.legacy_max):
+            old = f'{t_old * 1000:9.1f}ms' if t_old is not None else f"{'-':>11}"
+            speedup = f'{t_old / t_new:8.0f}x' if t_old is not None else f"{'-':>9}"
+            print(f'{name:20} {rows:>9} {old} {t_new * 1000:9.1f}ms {speedup}')
@@ -1,33 +1,240 @@
+import csv
+import io
+import json
+import os
+import threading
 from pathlib import Path
 import pandas as pd
 
+from tools.order_log import OrderLog, file_lock
+
+INVENTORY_COLUMNS = ['item', 'quantity', 'reorder_level', 'price', 'unit', 'avg_daily_sales']
+INVENTORY_DTYPES = {
+    'item': 'category',
+    'quantity': 'float64',
+    'reorder_level': 'float64',
+    'price': 'float64',
+    'unit': 'category',
+    'avg_daily_sales': 'float64',
+}
+# header written to a missing or empty purchases.csv
+PURCHASE_COLUMNS = ['date', 'supplier', 'item', 'qty', 'price']
+# written back without a trailing ".0" when every value is whole
+INTEGER_LIKE = ['quantity', 'reorder_level']
+
+# '' (off), 'parquet' or 'feather'; both need pyarrow
+SIDECAR_FORMAT = os.getenv('INVENTORY_SIDECAR', '')
+
+# 'csv' (files under data/) or 'sqlite' (tools.sqlite_store, one database file next to the CSVs)
+STORAGE_BACKEND = os.getenv('DATA_BACKEND', 'csv')
+DB_PATH = os.getenv('DATA_DB')
+
+# resolved path -> ((mtime_ns, size), DataFrame); shared by every DataTools on the same file
+_inventory_cache = {}
+_cache_lock = threading.Lock()
+
+# fn(purchases_path) called after every append_purchase (SupplierHub re-indexes in the background)
+_purchase_listeners = []
+
+
+def add_purchase_listener(fn):
+    _purchase_listeners.append(fn)
+
+
+def _file_key(path: Path):
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+def _atomic_write(path: Path, write):
+    """write(tmp_path) then rename over `path`, so readers never see a partial file."""
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def _with_dtypes(df):
+    df = df.copy()
+    for c, t in INVENTORY_DTYPES.items():
+        if c not in df.columns:
+            continue
+        if t == 'float64':
+            df[c] = pd.to_numeric(df[c], errors='coerce')
+        df[c] = df[c].astype(t)
+    return df
+
 
 class DataTools:
-    def __init__(self, inventory_path='data/inventory.csv', purchases_path='data/purchases.csv'):
+    def __init__(self, inventory_path='data/inventory.csv', purchases_path='data/purchases.csv',
+                 sidecar=SIDECAR_FORMAT):
         self.inv_path = Path(inventory_path)
         self.purchases_path = Path(purchases_path)
+        self.sidecar = sidecar or None
         # ensure files exist
         if not self.inv_path.exists():
             self.inv_path.parent.mkdir(parents=True, exist_ok=True)
-            pd.DataFrame(columns=['item','quantity','reorder_level','price','unit','avg_daily_sales']).to_csv(self.inv_path, index=False)
+            pd.DataFrame(columns=INVENTORY_COLUMNS).to_csv(self.inv_path, index=False)
         if not self.purchases_path.exists():
             self.purchases_path.parent.mkdir(parents=True, exist_ok=True)
             pd.DataFrame(columns=['date','supplier','item','qty','price']).to_csv(self.purchases_path, index=False)
 
+    # ---------- inventory ----------
+    def _sidecar_paths(self):
+        ext = 'parquet' if self.sidecar == 'parquet' else 'feather'
+        data = self.inv_path.with_name(f'.{self.inv_path.stem}.{ext}')
+        return data, data.with_name(data.name + '.json')
+
+    def _read_sidecar(self, key):
+        data, meta = self._sidecar_paths()
+        try:
+            with open(meta) as f:
+                if tuple(json.load(f)['source']) != key:
+                    return None
+            return pd.read_parquet(data) if self.sidecar == 'parquet' else pd.read_feather(data)
+        except (OSError, ValueError, KeyError, ImportError):
+            return None
+
+    def _write_sidecar(self, df, key):
+        data, meta = self._sidecar_paths()
+        try:
+            if self.sidecar == 'parquet':
+                _atomic_write(data, lambda p: df.to_parquet(p, index=False))
+            else:
+                _atomic_write(data, lambda p: df.reset_index(drop=True).to_feather(p))
+            _atomic_write(meta, lambda p: p.write_text(json.dumps({'source': list(key)})))
+        except ImportError as e:
+            print(f'Inventory sidecar disabled: {e}')
+            self.sidecar = None
+
+    def _read_csv(self):
+        return _with_dtypes(pd.read_csv(self.inv_path))
 
     def load_inventory(self):
-        return pd.read_csv(self.inv_path)
+        """
+        Inventory as a DataFrame with fixed dtypes. Re-parsed only when the file's mtime or size
+        changes; callers get a copy they may modify freely.
+        """
+        cache_key = str(self.inv_path.resolve())
+        key = _file_key(self.inv_path)
+        with _cache_lock:
+            hit = _inventory_cache.get(cache_key)
+        if hit and hit[0] == key:
+            return hit[1].copy()
 
+        df = self._read_sidecar(key) if self.sidecar else None
+        if df is None:
+            df = self._read_csv()
+            if self.sidecar:
+                self._write_sidecar(df, key)
+        with _cache_lock:
+            _inventory_cache[cache_key] = (key, df)
+        return df.copy()
 
     def save_inventory(self, df):
-       df.to_csv(self.inv_path, index=False)
+        out = df.copy()
+        for c in INTEGER_LIKE:
+            if c in out.columns and pd.api.types.is_float_dtype(out[c]):
+                whole = out[c].dropna()
+                if (whole == whole.round()).all():
+                    out[c] = out[c].astype('Int64')
+        _atomic_write(self.inv_path, lambda p: out.to_csv(p, index=False))
+
+        # the file we just wrote is the cached copy; skip the re-parse on the next load
+        key = _file_key(self.inv_path)
+        cached = _with_dtypes(df)
+        with _cache_lock:
+            _inventory_cache[str(self.inv_path.resolve())] = (key, cached)
+        if self.sidecar:
+            self._write_sidecar(cached, key)
 
+    def _inventory_lock(self):
+        # the CSV backend's read-modify-write helpers rewrite the whole file
+        return file_lock(Path(str(self.inv_path) + '.lock'))
 
+    def update_item(self, item, price=None, quantity=None):
+        """Set one item's price and/or quantity; False if the item is unknown."""
+        if price is None and quantity is None:
+            return False
+        with self._inventory_lock():
+            df = self.load_inventory()
+            hit = (df['item'].astype(str) == str(item)).to_numpy()
+            if not hit.any():
+                return False
+            if price is not None:
+                df.loc[hit, 'price'] = price
+            if quantity is not None:
+                df.loc[hit, 'quantity'] = quantity
+            self.save_inventory(df)
+            return True
+
+    def update_prices(self, changes):
+        """Write the new prices from apply_pricing_rules-style changes ({'item', 'new'})."""
+        if not changes:
+            return 0
+        new = {str(c['item']): c['new'] for c in changes}
+        with self._inventory_lock():
+            df = self.load_inventory()
+            mapped = df['item'].astype(str).map(new)
+            hit = mapped.notna().to_numpy()
+            df.loc[hit, 'price'] = mapped[hit].astype(float)
+            self.save_inventory(df)
+            return int(hit.sum())
+
+    def adjust_quantity(self, item, delta):
+        """Add `delta` to an item's quantity; returns the new quantity (None if unknown)."""
+        with self._inventory_lock():
+            df = self.load_inventory()
+            hit = (df['item'].astype(str) == str(item)).to_numpy()
+            if not hit.any():
+                return None
+            df.loc[hit, 'quantity'] = df.loc[hit, 'quantity'] + delta
+            self.save_inventory(df)
+            return float(df.loc[hit, 'quantity'].iloc[0])
+
+    # ---------- orders ----------
+    def order_log(self, orders_path='data/orders.csv'):
+        return OrderLog(orders_path)
+
+    # ---------- purchases ----------
     def load_purchases(self):
         return pd.read_csv(self.purchases_path)
 
 
     def append_purchase(self, rec: dict):
-        df = self.load_purchases()
-        df = pd.concat([df, pd.DataFrame([rec])], ignore_index=True)
-        df.to_csv(self.purchases_path, index=False)
\ No newline at end of file
+        """Append one row in header order; earlier rows are never rewritten."""
+        with file_lock(Path(str(self.purchases_path) + '.lock')):
+            with open(self.purchases_path, 'a+b') as f:
+                f.seek(0)
+                header = f.readline().decode('utf-8')
+                buf = io.StringIO()
+                writer = csv.writer(buf, lineterminator='\n')
+                if header.strip():
+                    columns = next(csv.reader([header]))
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        f.write(b'\n')
+                else:
+                    # new or 0-byte file: start it with the header, as OrderLog does
+                    columns = PURCHASE_COLUMNS
+                    f.truncate(0)
+                    writer.writerow(columns)
+                writer.writerow([rec.get(c, '') for c in columns])
+                f.write(buf.getvalue().encode('utf-8'))
+        for fn in list(_purchase_listeners):
+            fn(self.purchases_path)
+
+
+def make_data_tools(inventory_path='data/inventory.csv', purchases_path='data/purchases.csv',
+                    orders_path='data/orders.csv', backend=None):
+    """DataTools for the configured backend (DATA_BACKEND=csv|sqlite)."""
+    backend = (backend or STORAGE_BACKEND).lower()
+    if backend == 'sqlite':
+        from tools.sqlite_store import SqliteDataTools
+        return SqliteDataTools(inventory_path, purchases_path, db_path=DB_PATH, orders_path=orders_path)
+    if backend != 'csv':
+        raise ValueError(f'Unknown DATA_BACKEND: {backend}')
+    return DataTools(inventory_path, purchases_path)
@@ -0,0 +1,227 @@
+import asyncio
+import csv
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+BROADCAST_DIR = os.getenv('BROADCAST_DIR', 'data/broadcasts')
+BROADCAST_WORKERS = int(os.getenv('BROADCAST_WORKERS', '16'))
+# messages per second across all workers (0 = unlimited); WhatsApp senders are throttled by the provider
+BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', '20'))
+MAX_ATTEMPTS = int(os.getenv('BROADCAST_MAX_ATTEMPTS', '3'))
+
+STATUS_COLUMNS = ['phone', 'segment', 'status', 'attempts', 'detail', 'timestamp']
+
+
+class RateLimiter:
+    """Token bucket shared by the send workers: `rate` sends per second, bursts up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def offers_from_changes(changes):
+    """Only price drops are offers (low-stock markups are not advertised)."""
+    return [c for c in changes if c['new'] < c['old']]
+
+
+def load_segments(path):
+    """segments.json: {segment: {"header": "...", "items": [...]}}; {} when absent."""
+    path = Path(path)
+    return json.loads(path.read_text(encoding='utf-8')) if path.exists() else {}
+
+
+def load_customers(path):
+    """customers.csv (phone[, segment]) -> unique phones with a segment ('all' when missing)."""
+    df = pd.read_csv(path, dtype=str)
+    if 'segment' not in df.columns:
+        df['segment'] = 'all'
+    df['phone'] = df['phone'].str.strip()
+    df['segment'] = df['segment'].fillna('all').str.strip().replace('', 'all')
+    return df.dropna(subset=['phone']).drop_duplicates('phone')[['phone', 'segment']]
+
+
+class OfferBroadcaster:
+    """
+    Sends rendered offer messages to a customer list through WhatsAppTool.asend.
+
+    create() renders one message per segment and snapshots the recipients into
+    <dir>/<run_id>.json / .recipients.csv. run() streams sends through a bounded pool of async
+    workers behind a shared rate limiter, retrying failures with backoff, and appends one status
+    row per recipient to <run_id>.status.csv. That file is the checkpoint: run() on an existing
+    run_id skips everyone whose last status is 'sent', so an interrupted broadcast resumes
+    where it stopped.
+    """
+
+    def __init__(self, whatsapp, out_dir=BROADCAST_DIR, workers=BROADCAST_WORKERS, rate=BROADCAST_RATE,
+                 max_attempts=MAX_ATTEMPTS):
+        self.whatsapp = whatsapp
+        self.out_dir = Path(out_dir)
+        self.workers = workers
+        self.rate = rate
+        self.max_attempts = max_attempts
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, run_id):
+        base = self.out_dir / run_id
+        return (base.with_name(f'{run_id}.json'), base.with_name(f'{run_id}.recipients.csv'),
+                base.with_name(f'{run_id}.status.csv'))
+
+    # ---------- setup ----------
+    def create(self, offers, customers, render, segments=None):
+        """
+        New run for `offers`. `customers` is a DataFrame (phone, segment) or a path to one;
+        `render(offers, header)` builds a message; `segments` maps segment -> {'header', 'items'}
+        (items limits which offers that segment sees). Returns the run_id.
+        """
+        if not isinstance(customers, pd.DataFrame):
+            customers = load_customers(customers)
+        segments = segments or {}
+        messages = {}
+        for seg in customers['segment'].unique().tolist():
+            conf = segments.get(seg, {})
+            items = {str(i).lower() for i in conf.get('items', [])}
+            seg_offers = [o for o in offers if not items or str(o['item']).lower() in items]
+            if seg_offers:
+                messages[seg] = render(seg_offers, conf.get('header'))
+        recipients = customers[customers['segment'].isin(messages)]
+
+        run_id = datetime.now().strftime('%Y%m%d%H%M%S') + '-' + uuid.uuid4().hex[:6]
+        meta_path, recipients_path, _ = self._paths(run_id)
+        recipients.to_csv(recipients_path, index=False)
+        meta = {'run_id': run_id, 'created': datetime.now().isoformat(timespec='seconds'),
+                'offers': offers, 'messages': messages, 'total': len(recipients)}
+        tmp = meta_path.with_name(meta_path.name + '.tmp')
+        tmp.write_text(json.dumps(meta, ensure_ascii=False))
+        os.replace(tmp, meta_path)
+        return run_id
+
+    def _last_status(self, run_id):
+        """phone -> (status, attempts) from the checkpoint file (last row per phone wins)."""
+        _, _, status_path = self._paths(run_id)
+        last = {}
+        if status_path.exists():
+            with open(status_path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    last[row['phone']] = (row['status'], int(row['attempts'] or 0))
+        return last
+
+    # ---------- sending ----------
+    def _pending(self, run_id):
+        meta_path, recipients_path, _ = self._paths(run_id)
+        meta = json.loads(meta_path.read_text())
+        done = self._last_status(run_id)
+        recipients = pd.read_csv(recipients_path, dtype=str)
+        pending = [(p, s) for p, s in zip(recipients['phone'], recipients['segment'])
+                   if done.get(p, ('', 0))[0] != 'sent']
+        return meta, done, pending
+
+    async def run(self, run_id):
+        """Send to every recipient not yet 'sent'. Returns status(run_id) when done."""
+        meta, done, pending = await asyncio.to_thread(self._pending, run_id)
+        _, _, status_path = self._paths(run_id)
+
+        limiter = RateLimiter(self.rate)
+        queue = asyncio.Queue(maxsize=self.workers * 4)
+        new_file = not status_path.exists()
+        out = open(status_path, 'a', newline='', encoding='utf-8')
+        writer = csv.writer(out)
+        if new_file:
+            writer.writerow(STATUS_COLUMNS)
+
+        def record(phone, segment, status, attempts, detail):
+            # flushed per row: the file is the resume checkpoint and what status() reads while the
+            # run is live; a buffered 'sent' row lost in a crash would mean a duplicate message.
+            # Sends are rate limited, so one small write per message costs nothing that matters.
+            writer.writerow([phone, segment, status, attempts, detail, datetime.now().isoformat(timespec='seconds')])
+            out.flush()
+
+        async def send(phone, segment):
+            attempts = done.get(phone, ('', 0))[1]
+            for attempt in range(1, self.max_attempts + 1):
+                await limiter.acquire()
+                try:
+                    resp = await self.whatsapp.asend(phone, meta['messages'][segment]) or {}
+                    record(phone, segment, 'sent', attempts + attempt, resp.get('sid') or resp.get('status', ''))
+                    return
+                except Exception as e:
+                    if attempt == self.max_attempts:
+                        record(phone, segment, 'failed', attempts + attempt, str(e)[:200])
+                        return
+                    await asyncio.sleep(min(2 ** attempt * 0.5, 10))
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                try:
+                    if item is None:
+                        return
+                    await send(*item)
+                finally:
+                    queue.task_done()
+
+        tasks = [asyncio.create_task(worker()) for _ in range(min(self.workers, max(len(pending), 1)))]
+        try:
+            for item in pending:
+                await queue.put(item)
+            for _ in tasks:
+                await queue.put(None)
+            await asyncio.gather(*tasks)
+        finally:
+            for t in tasks:
+                t.cancel()
+            out.flush()
+            out.close()
+        return self.status(run_id)
+
+    # ---------- progress ----------
+    def status(self, run_id):
+        meta_path, _, _ = self._paths(run_id)
+        if not meta_path.exists():
+            return None
+        meta = json.loads(meta_path.read_text())
+        counts = {'sent': 0, 'failed': 0}
+        for status, _ in self._last_status(run_id).values():
+            counts[status] = counts.get(status, 0) + 1
+        return {
+            'run_id': run_id,
+            'created': meta['created'],
+            'total': meta['total'],
+            'segments': list(meta['messages']),
+            **counts,
+            'pending': meta['total'] - sum(counts.values()),
+        }
+
+    def recipients(self, run_id, status=None, limit=100):
+        """Last status per recipient, optionally only one status (e.g. 'failed')."""
+        rows = []
+        _, _, status_path = self._paths(run_id)
+        if status_path.exists():
+            last = {}
+            with open(status_path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    last[row['phone']] = row
+            rows = [r for r in last.values() if status is None or r['status'] == status]
+        return rows[:limit]
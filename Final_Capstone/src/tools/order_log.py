@@ -0,0 +1,214 @@
+import csv
+import io
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+COLUMNS = ['order_id', 'timestamp', 'item', 'qty', 'unit', 'status', 'supplier_phone']
+BLOCK_SIZE = 64 * 1024
+SUMMARY_COLUMNS = ['order_id', 'timestamp', 'items', 'total_qty', 'status', 'supplier_phone']
+
+
+@contextmanager
+def file_lock(lock_path):
+    """Exclusive inter-process lock held on a sidecar file for the duration of the block."""
+    with open(lock_path, 'a+b') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _tail_lines(path, n):
+    """Last n lines of a file, read backwards in blocks (never the whole file)."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b''
+        while pos > 0 and data.count(b'\n') <= n:
+            step = min(BLOCK_SIZE, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    # first line is either the header (pos == 0) or cut mid-row
+    lines = data.decode('utf-8').splitlines()[1:]
+    return [l for l in lines if l.strip()][-n:] if n > 0 else []
+
+
+def summarize(df):
+    """One row per order, newest first: line count, total qty and the order's timestamp/status/phone."""
+    if df.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    qty = pd.to_numeric(df['qty'], errors='coerce')
+    out = (df.assign(qty=qty)
+           .groupby('order_id', sort=False)
+           .agg(timestamp=('timestamp', 'first'), items=('item', 'size'), total_qty=('qty', 'sum'),
+                status=('status', 'first'), supplier_phone=('supplier_phone', 'first'))
+           .sort_index(ascending=False)
+           .reset_index())
+    return out[SUMMARY_COLUMNS]
+
+
+def page(summary, offset=0, limit=20, totals=None):
+    """Response body shared by both order log backends for /order/summary."""
+    rows = summary.iloc[max(offset, 0):max(offset, 0) + max(limit, 0)]
+    return {
+        'total': len(summary),
+        'offset': offset,
+        'limit': limit,
+        'totals': totals or {},
+        'orders': [
+            {k: _number(v) if k in ('order_id', 'total_qty') else v for k, v in rec.items()}
+            for rec in rows.astype(object).where(rows.notna(), None).to_dict('records')
+        ],
+    }
+
+
+def _number(value):
+    try:
+        f = float(value)
+    except (TypeError, ValueError):
+        return value
+    return int(f) if f.is_integer() else f
+
+
+class OrderLog:
+    """
+    Append-only order history (orders.csv). Each save appends one block of rows under a file
+    lock, so concurrent confirms never lose each other's rows and a save costs O(order size)
+    rather than O(history). Reads only touch the tail of the file.
+    """
+
+    def __init__(self, path='data/orders.csv'):
+        self.path = Path(path)
+        self.lock_path = Path(str(self.path) + '.lock')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._cache = (None, None, None, None)  # (file key, rows, summary, order_id -> row positions)
+        self._cache_lock = threading.Lock()
+        with file_lock(self.lock_path):
+            if not self.path.exists() or self.path.stat().st_size == 0:
+                with open(self.path, 'w', newline='', encoding='utf-8') as f:
+                    csv.writer(f).writerow(COLUMNS)
+
+    def _last_order_id(self):
+        rows = _tail_lines(self.path, 1)
+        if not rows:
+            return 0
+        try:
+            return int(float(next(csv.reader(rows))[0]))
+        except (ValueError, IndexError):
+            return 0
+
+    def append(self, orders, supplier_phone, status='sent'):
+        """Append one order (several item rows) and return its order_id."""
+        now = datetime.now()
+        with file_lock(self.lock_path):
+            # monotonic integer ids seeded from the YYYYmmddHHMMSS clock: several orders in one second
+            # get last + 1, so an id is not always a valid timestamp (the 'timestamp' column is)
+            order_id = max(int(now.strftime('%Y%m%d%H%M%S')), self._last_order_id() + 1)
+            buf = io.StringIO()
+            w = csv.writer(buf, lineterminator='\n')
+            for o in orders:
+                w.writerow([
+                    order_id,
+                    now.strftime('%Y-%m-%d %H:%M:%S'),
+                    str(o['item']).replace('\n', ' '),
+                    o['qty'],
+                    str(o.get('unit', '') or '').replace('\n', ' '),
+                    status,
+                    supplier_phone,
+                ])
+            with open(self.path, 'a+b') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        f.write(b'\n')
+                f.write(buf.getvalue().encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+        return order_id
+
+    def tail(self, limit=50):
+        """Most recent `limit` rows, oldest first (same order as DataFrame.tail)."""
+        if not self.path.exists():
+            return []
+        records = []
+        for row in csv.reader(_tail_lines(self.path, limit)):
+            rec = dict(zip(COLUMNS, row + [''] * (len(COLUMNS) - len(row))))
+            rec['order_id'] = _number(rec['order_id'])
+            rec['qty'] = _number(rec['qty'])
+            records.append(rec)
+        return records
+
+    # ---------- aggregated reads ----------
+    def version(self):
+        st = self.path.stat()
+        return st.st_mtime_ns, st.st_size
+
+    def _indexed(self):
+        """(rows, per-order summary, order_id -> row positions), rebuilt only when the file changes."""
+        key = self.version()
+        with self._cache_lock:
+            if self._cache[0] == key:
+                return self._cache[1:]
+        df = pd.read_csv(self.path, dtype={'unit': str, 'status': str, 'supplier_phone': str})
+        cached = (key, df, summarize(df), df.groupby('order_id', sort=False).indices)
+        with self._cache_lock:
+            self._cache = cached
+        return cached[1:]
+
+    def frame(self):
+        return self._indexed()[0]
+
+    def summary(self, offset=0, limit=20):
+        df, summary, _ = self._indexed()
+        totals = {
+            'orders': len(summary),
+            'lines': len(df),
+            'total_qty': _number(float(pd.to_numeric(df['qty'], errors='coerce').sum())) if len(df) else 0,
+            'unique_items': int(df['item'].nunique()),
+        }
+        return page(summary, offset, limit, totals)
+
+    def lines(self, order_id):
+        """Item rows of one order ([] if unknown)."""
+        df, _, positions = self._indexed()
+        idx = positions.get(order_id)
+        if idx is None:
+            return []
+        rows = df.iloc[idx]
+        return [
+            {k: _number(v) if k in ('order_id', 'qty') else v for k, v in rec.items()}
+            for rec in rows.astype(object).where(rows.notna(), None).to_dict('records')
+        ]
+
+    def iter_csv(self):
+        """The log as CSV bytes in blocks, up to its size when the export started."""
+        size = self.path.stat().st_size
+        with open(self.path, 'rb') as f:
+            while size > 0:
+                block = f.read(min(BLOCK_SIZE, size))
+                if not block:
+                    break
+                size -= len(block)
+                yield block
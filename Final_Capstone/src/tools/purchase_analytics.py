@@ -0,0 +1,227 @@
+import calendar
+import re
+import threading
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+from tools.data_tools import _file_key
+
+MONTHS = {m.lower(): i for i, m in enumerate(calendar.month_name) if m}
+MONTHS.update({m.lower(): i for i, m in enumerate(calendar.month_abbr) if m})
+# words that say nothing about which supplier is meant
+GENERIC_SUPPLIER_WORDS = {'supplier', 'suppliers', 'wholesale', 'wholesalers', 'traders', 'trading', 'mills',
+                          'store', 'stores', 'enterprises', 'ltd', 'pvt', 'co', 'and', 'the'}
+
+INTENT_PATTERNS = [
+    # order matters: first match wins. Every pattern needs a price / spend / count / listing
+    # word, so "which supplier delivers fastest" never matches the price ranking.
+    ('best_supplier', re.compile(r'\b(cheapest|cheaper|cheap|lowest)\b'
+                                 r'|\bbest\b.*\b(price|rate|deal)s?\b', re.I)),
+    ('avg_price', re.compile(r'\b(average|avg|mean|typical)\b', re.I)),
+    ('total_spend', re.compile(r'\b(spent|spend|spending|how much did we pay|total (?:cost|amount|paid))\b', re.I)),
+    ('count', re.compile(r'\bhow many (?:times|purchases|orders|units)\b|\bnumber of (?:purchases|orders)\b', re.I)),
+    ('list', re.compile(r'\b(what items|which items|list|all purchases|purchased from|bought from|buy from)\b'
+                        r'|\bshow\b.*\bpurchases\b', re.I)),
+]
+# every word of an answerable question is one of these, a month, an item or a supplier name;
+# anything else (delivery, quality, reliable, days, complaint, ...) means the question is
+# about something purchases.csv does not record and goes to RAG
+QUESTION_WORDS = {
+    'what', 'which', 'who', 'how', 'much', 'many', 'is', 'are', 'was', 'were', 'the', 'a', 'an', 'of',
+    'for', 'on', 'in', 'at', 'to', 'from', 'by', 'with', 'did', 'do', 'does', 'we', 'our', 'us', 'i', 'me',
+    'my', 'have', 'has', 'had', 'it', 'this', 'that', 'last', 'month', 'year', 'all', 'and', 'or', 'so',
+    'far', 'ever', 'been', 'there', 'any', 'each', 'per', 'overall', 'please', 'tell', 'can', 'you', 'give',
+    'get', 'got', 'pay', 'paid', 'spend', 'spent', 'spending', 'total', 'amount', 'cost', 'price', 'rate',
+    'deal', 'average', 'avg', 'mean', 'typical', 'best', 'cheapest', 'cheaper', 'cheap', 'lowest',
+    'supplier', 'offer', 'offered', 'buy', 'bought', 'purchase', 'purchased', 'item', 'list', 'show',
+    'time', 'number', 'order', 'unit', 'kg', 'above', 'over', 'more', 'than', 'greater', 'below', 'under',
+    'less', 'r', 'rs', 'inr',
+}
+THRESHOLD_RE = re.compile(
+    r'\b(above|over|more than|greater than|below|under|less than)\s*(?:rs\.?|inr|₹|\$)?\s*(\d+(?:\.\d+)?)', re.I)
+YEAR_RE = re.compile(r'\b(20\d{2})\b')
+WORD_RE = re.compile(r"[a-z]+")
+
+
+def _singular(word):
+    if word.endswith('oes') or word.endswith('ches') or word.endswith('shes'):
+        return word[:-2]
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def _money(x):
+    return f'₹{x:,.2f}'
+
+
+class PurchaseAnalytics:
+    """
+    Answers aggregate purchase-history questions with pandas group-bys over purchases.csv
+    (supplier / item / month, unit price = price / qty) instead of retrieval + LLM.
+    classify() returns None for questions it cannot answer exactly; those go to RAG.
+    """
+
+    def __init__(self, purchases_path='data/purchases.csv'):
+        self.purchases_path = Path(purchases_path)
+        self._df = None
+        self._key = None
+        self._lock = threading.Lock()
+
+    # ---------- data ----------
+    def frame(self):
+        """purchases.csv with parsed dates, normalized names and unit_price; re-read only when the file changes."""
+        key = _file_key(self.purchases_path)
+        with self._lock:
+            if self._key != key:
+                df = pd.read_csv(self.purchases_path)
+                df['date'] = pd.to_datetime(df['date'], errors='coerce')
+                df['month'] = df['date'].dt.to_period('M')
+                df['item_key'] = df['item'].astype(str).str.strip().str.lower().map(_singular)
+                df['supplier'] = df['supplier'].astype(str).str.strip()
+                df['qty'] = pd.to_numeric(df['qty'], errors='coerce')
+                df['price'] = pd.to_numeric(df['price'], errors='coerce')
+                df['unit_price'] = df['price'] / df['qty'].where(df['qty'] > 0)
+                self._df, self._key = df, key
+            return self._df
+
+    # ---------- intent + entities ----------
+    def classify(self, question, today=None):
+        """(intent, filters) for questions the engine can answer, else None."""
+        intent = next((name for name, rx in INTENT_PATTERNS if rx.search(question)), None)
+        if intent is None:
+            return None
+        df = self.frame()
+        q = question.lower()
+        words = WORD_RE.findall(q)
+
+        item_keys = set(df['item_key'].dropna().unique())
+        suppliers = []
+        for name in df['supplier'].dropna().unique():
+            # "Rajesh Rice Mills" is matched by "rajesh", never by the item word "rice"
+            tokens = [t for t in WORD_RE.findall(name.lower())
+                      if t not in GENERIC_SUPPLIER_WORDS and _singular(t) not in item_keys and len(t) > 2]
+            if name.lower() in q or any(t in words for t in tokens):
+                suppliers.append(name)
+        # item words inside a supplier's full name do not count as item mentions
+        q_items = q
+        for name in suppliers:
+            q_items = q_items.replace(name.lower(), ' ')
+        singular = {_singular(w) for w in WORD_RE.findall(q_items)}
+        items = sorted(k for k in item_keys if k in singular or (' ' in k and k in q_items))
+
+        filters = {'items': items, 'suppliers': suppliers, 'months': [], 'min_price': None, 'max_price': None}
+        today = today or date.today()
+        if 'last month' in q:
+            filters['months'] = [pd.Period(today, 'M') - 1]
+        elif 'this month' in q:
+            filters['months'] = [pd.Period(today, 'M')]
+        else:
+            # 'may' is only a month in 'in may'
+            month_nums = [MONTHS[w] for w in words if w in MONTHS and (w != 'may' or 'in may' in q)]
+            years = [int(y) for y in YEAR_RE.findall(q)]
+            if month_nums:
+                periods = df['month'].dropna()
+                filters['months'] = [
+                    p for p in periods.unique()
+                    if p.month in month_nums and (not years or p.year in years)
+                ] or [pd.Period(year=(years or [today.year])[0], month=m, freq='M') for m in month_nums]
+        for word, amount in THRESHOLD_RE.findall(q):
+            if word in ('above', 'over', 'more than', 'greater than'):
+                filters['min_price'] = float(amount)
+            else:
+                filters['max_price'] = float(amount)
+
+        known = QUESTION_WORDS | set(MONTHS) | {t for k in item_keys for t in k.split()}
+        known |= {t for name in suppliers for t in WORD_RE.findall(name.lower())}
+        if any(w not in known and _singular(w) not in known for w in words):
+            return None
+        # aggregates over an item need the item; anything else we could not pin down goes to RAG
+        if intent in ('avg_price', 'best_supplier') and not items:
+            return None
+        if intent == 'list' and not (suppliers or items or filters['months'] or filters['min_price'] is not None
+                                     or filters['max_price'] is not None or 'all purchases' in q):
+            return None
+        return intent, filters
+
+    def _filter(self, filters):
+        df = self.frame()
+        mask = pd.Series(True, index=df.index)
+        if filters['items']:
+            mask &= df['item_key'].isin(filters['items'])
+        if filters['suppliers']:
+            mask &= df['supplier'].isin(filters['suppliers'])
+        if filters['months']:
+            mask &= df['month'].isin(filters['months'])
+        if filters['min_price'] is not None:
+            mask &= df['price'] > filters['min_price']
+        if filters['max_price'] is not None:
+            mask &= df['price'] < filters['max_price']
+        return df[mask]
+
+    @staticmethod
+    def _scope(filters):
+        parts = []
+        if filters['items']:
+            parts.append(', '.join(i.title() for i in filters['items']))
+        if filters['suppliers']:
+            parts.append('from ' + ', '.join(filters['suppliers']))
+        if filters['months']:
+            parts.append('in ' + ', '.join(p.strftime('%B %Y') for p in filters['months']))
+        if filters['min_price'] is not None:
+            parts.append(f"above {_money(filters['min_price'])}")
+        if filters['max_price'] is not None:
+            parts.append(f"below {_money(filters['max_price'])}")
+        return ' '.join(parts) or 'all purchases'
+
+    # ---------- answers ----------
+    def answer(self, question, today=None):
+        """Exact answer string, or None when the question should go to RAG."""
+        routed = self.classify(question, today)
+        if routed is None:
+            return None
+        intent, filters = routed
+        rows = self._filter(filters)
+        scope = self._scope(filters)
+        if rows.empty:
+            return f'No purchases found ({scope}).'
+
+        if intent == 'avg_price':
+            lines = [f'Average unit price ({scope}): {_money(rows["unit_price"].mean())} '
+                     f'over {len(rows)} purchase(s), {rows["qty"].sum():g} units.']
+            if rows['supplier'].nunique() > 1:
+                by = rows.groupby('supplier')['unit_price'].mean().sort_values()
+                lines += [f'- {s}: {_money(p)}' for s, p in by.items()]
+            return '\n'.join(lines)
+
+        if intent == 'best_supplier':
+            by = (rows.groupby('supplier')
+                  .agg(unit_price=('unit_price', 'mean'), purchases=('unit_price', 'size'), last=('date', 'max'))
+                  .sort_values('unit_price'))
+            best = by.index[0]
+            lines = [f'Best price ({scope}): {best} at {_money(by.iloc[0]["unit_price"])} per unit.']
+            lines += [f'- {s}: {_money(r.unit_price)} per unit ({r.purchases} purchase(s))' for s, r in by.iterrows()]
+            return '\n'.join(lines)
+
+        if intent == 'total_spend':
+            lines = [f'Total spent ({scope}): {_money(rows["price"].sum())} across {len(rows)} purchase(s).']
+            if not filters['suppliers'] and rows['supplier'].nunique() > 1:
+                by = rows.groupby('supplier')['price'].sum().sort_values(ascending=False)
+                lines += [f'- {s}: {_money(p)}' for s, p in by.items()]
+            return '\n'.join(lines)
+
+        if intent == 'count':
+            return f'{len(rows)} purchase(s) ({scope}), {rows["qty"].sum():g} units in total.'
+
+        rows = rows.sort_values('date')
+        lines = [f'{len(rows)} purchase(s) ({scope}):']
+        lines += [
+            f"- {r.date.date() if pd.notna(r.date) else '?'}: {r.item} x{r.qty:g} from {r.supplier} "
+            f"for {_money(r.price)} ({_money(r.unit_price)}/unit)"
+            for r in rows.itertuples()
+        ]
+        return '\n'.join(lines)
@@ -0,0 +1,333 @@
+import csv
+import io
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from tools.data_tools import INVENTORY_COLUMNS, PURCHASE_COLUMNS, DataTools, _with_dtypes
+from tools.order_log import COLUMNS as ORDER_COLUMNS, SUMMARY_COLUMNS, _number
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS inventory (
+    item TEXT PRIMARY KEY,
+    quantity REAL,
+    reorder_level REAL,
+    price REAL,
+    unit TEXT,
+    avg_daily_sales REAL
+);
+CREATE TABLE IF NOT EXISTS purchases (
+    id INTEGER PRIMARY KEY,
+    date TEXT,
+    supplier TEXT,
+    item TEXT,
+    qty REAL,
+    price REAL
+);
+CREATE INDEX IF NOT EXISTS ix_purchases_item ON purchases(item, date);
+CREATE INDEX IF NOT EXISTS ix_purchases_supplier ON purchases(supplier, date);
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    order_id INTEGER NOT NULL,
+    timestamp TEXT,
+    item TEXT,
+    qty REAL,
+    unit TEXT,
+    status TEXT,
+    supplier_phone TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_orders_order_id ON orders(order_id);
+-- bumped inside every write transaction; readers compare it to reuse cached frames
+CREATE TABLE IF NOT EXISTS versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+
+def _read_csv_rows(path, columns):
+    path = Path(path)
+    if not path.exists() or path.stat().st_size == 0:
+        return []
+    df = pd.read_csv(path)
+    for c in columns:
+        if c not in df.columns:
+            df[c] = None
+    df = df[columns].astype(object).where(df[columns].notna(), None)
+    return list(df.itertuples(index=False, name=None))
+
+
+class SqliteStore:
+    """
+    One SQLite file (WAL mode) holding inventory, purchases and orders. Every thread gets its own
+    connection; `transaction()` is an IMMEDIATE transaction, so read-modify-write sequences from
+    several workers or processes serialize instead of overwriting each other.
+    """
+
+    def __init__(self, db_path='data/capstone.db'):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self.connection().executescript(SCHEMA)
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def version(self, name):
+        row = self.connection().execute('SELECT version FROM versions WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def bump(conn, name):
+        conn.execute(
+            'INSERT INTO versions (name, version) VALUES (?, 1) '
+            'ON CONFLICT(name) DO UPDATE SET version = version + 1', (name,)
+        )
+
+    def count(self, table):
+        return self.connection().execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+    # ---------- bulk import ----------
+    def import_csv(self, inventory_path=None, purchases_path=None, orders_path=None, replace=False):
+        """
+        Load the CSV files into their tables in one transaction. With replace=False a table that
+        already has rows is left alone, so this is safe to call on every start.
+        Returns {table: rows imported}.
+        """
+        sources = [
+            ('inventory', inventory_path, INVENTORY_COLUMNS),
+            ('purchases', purchases_path, PURCHASE_COLUMNS),
+            ('orders', orders_path, ORDER_COLUMNS),
+        ]
+        imported = {}
+        with self.transaction() as conn:
+            for table, path, columns in sources:
+                if path is None:
+                    continue
+                if not replace and conn.execute(f'SELECT 1 FROM {table} LIMIT 1').fetchone():
+                    continue
+                rows = _read_csv_rows(path, columns)
+                if replace:
+                    conn.execute(f'DELETE FROM {table}')
+                verb = 'INSERT OR REPLACE' if table == 'inventory' else 'INSERT'
+                conn.executemany(
+                    f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows
+                )
+                self.bump(conn, table)
+                imported[table] = len(rows)
+        return imported
+
+
+class SqliteDataTools(DataTools):
+    """
+    DataTools on SqliteStore. load_inventory is cached on the table's version counter; single-item
+    changes (update_item / update_prices) are UPDATE statements on the indexed primary key
+    instead of a rewrite of the whole inventory. On first use the tables are filled from the
+    existing CSVs. purchases.csv stays the append-only feed SupplierHub indexes, so
+    append_purchase writes the row to both.
+    """
+
+    def __init__(self, inventory_path='data/inventory.csv', purchases_path='data/purchases.csv',
+                 db_path=None, orders_path=None):
+        super().__init__(inventory_path, purchases_path, sidecar=None)
+        self.store = SqliteStore(db_path or self.inv_path.with_name('capstone.db'))
+        self._cache = (None, None)
+        self._cache_lock = threading.Lock()
+        self.store.import_csv(self.inv_path, self.purchases_path, orders_path)
+
+    # ---------- inventory ----------
+    def load_inventory(self):
+        version = self.store.version('inventory')
+        with self._cache_lock:
+            cached_version, df = self._cache
+        if cached_version == version:
+            return df.copy()
+        conn = self.store.connection()
+        rows = conn.execute(f"SELECT {', '.join(INVENTORY_COLUMNS)} FROM inventory ORDER BY rowid").fetchall()
+        df = _with_dtypes(pd.DataFrame.from_records(rows, columns=INVENTORY_COLUMNS))
+        with self._cache_lock:
+            self._cache = (version, df)
+        return df.copy()
+
+    def save_inventory(self, df):
+        """Replace the whole table (kept for callers that edit the full frame)."""
+        columns = [c for c in INVENTORY_COLUMNS if c in df.columns]
+        out = df[columns].astype(object).where(df[columns].notna(), None)
+        with self.store.transaction() as conn:
+            conn.execute('DELETE FROM inventory')
+            conn.executemany(
+                f"INSERT OR REPLACE INTO inventory ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                list(out.itertuples(index=False, name=None)),
+            )
+            self.store.bump(conn, 'inventory')
+
+    def update_item(self, item, price=None, quantity=None):
+        fields = {k: v for k, v in (('price', price), ('quantity', quantity)) if v is not None}
+        if not fields:
+            return False
+        with self.store.transaction() as conn:
+            cur = conn.execute(
+                f"UPDATE inventory SET {', '.join(f'{k} = ?' for k in fields)} WHERE item = ?",
+                [*fields.values(), str(item)],
+            )
+            if cur.rowcount:
+                self.store.bump(conn, 'inventory')
+        return cur.rowcount > 0
+
+    def update_prices(self, changes):
+        if not changes:
+            return 0
+        with self.store.transaction() as conn:
+            cur = conn.executemany('UPDATE inventory SET price = ? WHERE item = ?',
+                                   [(c['new'], str(c['item'])) for c in changes])
+            self.store.bump(conn, 'inventory')
+        return cur.rowcount
+
+    def adjust_quantity(self, item, delta):
+        """Atomically add `delta` to an item's quantity; returns the new quantity (None if unknown)."""
+        with self.store.transaction() as conn:
+            row = conn.execute('UPDATE inventory SET quantity = quantity + ? WHERE item = ? RETURNING quantity',
+                               (delta, str(item))).fetchone()
+            if row:
+                self.store.bump(conn, 'inventory')
+        return float(row[0]) if row else None
+
+    # ---------- purchases ----------
+    def load_purchases(self):
+        rows = self.store.connection().execute(
+            f"SELECT {', '.join(PURCHASE_COLUMNS)} FROM purchases ORDER BY id").fetchall()
+        return pd.DataFrame.from_records(rows, columns=PURCHASE_COLUMNS)
+
+    def append_purchase(self, rec: dict):
+        with self.store.transaction() as conn:
+            conn.execute(f"INSERT INTO purchases ({', '.join(PURCHASE_COLUMNS)}) VALUES (?, ?, ?, ?, ?)",
+                         [rec.get(c) for c in PURCHASE_COLUMNS])
+            self.store.bump(conn, 'purchases')
+        super().append_purchase(rec)
+
+    # ---------- orders ----------
+    def order_log(self, orders_path='data/orders.csv'):
+        return SqliteOrderLog(self.store)
+
+
+class SqliteOrderLog:
+    """OrderLog interface (append / tail / summary / lines / iter_csv) on the orders table."""
+
+    def __init__(self, store: SqliteStore):
+        self.store = store
+
+    def append(self, orders, supplier_phone, status='sent'):
+        now = datetime.now()
+        with self.store.transaction() as conn:
+            last = conn.execute('SELECT MAX(order_id) FROM orders').fetchone()[0] or 0
+            order_id = max(int(now.strftime('%Y%m%d%H%M%S')), last + 1)
+            conn.executemany(
+                f"INSERT INTO orders ({', '.join(ORDER_COLUMNS)}) VALUES ({', '.join('?' * len(ORDER_COLUMNS))})",
+                [(order_id, now.strftime('%Y-%m-%d %H:%M:%S'), str(o['item']), o['qty'],
+                  str(o.get('unit', '') or ''), status, supplier_phone) for o in orders],
+            )
+            self.store.bump(conn, 'orders')
+        return order_id
+
+    def tail(self, limit=50):
+        if limit <= 0:
+            return []
+        rows = self.store.connection().execute(
+            f"SELECT {', '.join(ORDER_COLUMNS)} FROM orders ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        records = []
+        for row in reversed(rows):
+            rec = dict(zip(ORDER_COLUMNS, row))
+            rec['order_id'] = _number(rec['order_id'])
+            rec['qty'] = _number(rec['qty'])
+            records.append(rec)
+        return records
+
+    def version(self):
+        return self.store.version('orders')
+
+    def summary(self, offset=0, limit=20):
+        conn = self.store.connection()
+        # timestamp / status / phone come from each order's first line, like order_log.summarize
+        rows = conn.execute(
+            'SELECT g.order_id, f.timestamp, g.lines, g.qty, f.status, f.supplier_phone FROM '
+            '(SELECT order_id, MIN(id) AS first_id, COUNT(*) AS lines, SUM(qty) AS qty FROM orders '
+            ' GROUP BY order_id ORDER BY order_id DESC LIMIT ? OFFSET ?) g '
+            'JOIN orders f ON f.id = g.first_id ORDER BY g.order_id DESC',
+            (max(limit, 0), max(offset, 0)),
+        ).fetchall()
+        n_orders, n_lines, qty, items = conn.execute(
+            'SELECT COUNT(DISTINCT order_id), COUNT(*), SUM(qty), COUNT(DISTINCT item) FROM orders').fetchone()
+        return {
+            'total': n_orders,
+            'offset': offset,
+            'limit': limit,
+            'totals': {'orders': n_orders, 'lines': n_lines, 'total_qty': _number(qty or 0), 'unique_items': items},
+            'orders': [
+                {k: _number(v) if k in ('order_id', 'total_qty') else v for k, v in zip(SUMMARY_COLUMNS, row)}
+                for row in rows
+            ],
+        }
+
+    def lines(self, order_id):
+        rows = self.store.connection().execute(
+            f"SELECT {', '.join(ORDER_COLUMNS)} FROM orders WHERE order_id = ? ORDER BY id", (order_id,)).fetchall()
+        return [
+            {k: _number(v) if k in ('order_id', 'qty') else v for k, v in zip(ORDER_COLUMNS, row)}
+            for row in rows
+        ]
+
+    def iter_csv(self, batch=5000):
+        """Export in the orders.csv layout, `batch` rows per chunk from a cursor (no full fetch)."""
+        cur = self.store.connection().cursor()
+        cur.execute(f"SELECT {', '.join(ORDER_COLUMNS)} FROM orders ORDER BY id")
+        buf = io.StringIO()
+        w = csv.writer(buf, lineterminator='\n')
+        w.writerow(ORDER_COLUMNS)
+        while True:
+            rows = cur.fetchmany(batch)
+            for row in rows:
+                w.writerow([_number(v) if k in ('order_id', 'qty') else v for k, v in zip(ORDER_COLUMNS, row)])
+            yield buf.getvalue().encode('utf-8')
+            buf.seek(0)
+            buf.truncate()
+            if not rows:
+                break
+
+    def frame(self):
+        rows = self.store.connection().execute(
+            f"SELECT {', '.join(ORDER_COLUMNS)} FROM orders ORDER BY id").fetchall()
+        return pd.DataFrame.from_records(rows, columns=ORDER_COLUMNS)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Import the CSV data files into the SQLite backend')
+    parser.add_argument('--db', default='data/capstone.db')
+    parser.add_argument('--inventory', default='data/inventory.csv')
+    parser.add_argument('--purchases', default='data/purchases.csv')
+    parser.add_argument('--orders', default='data/orders.csv')
+    parser.add_argument('--replace', action='store_true', help='overwrite tables that already have rows')
+    args = parser.parse_args()
+    print(SqliteStore(args.db).import_csv(args.inventory, args.purchases, args.orders, replace=args.replace))
@@ -0,0 +1,105 @@
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from tools.data_tools import _file_key
+from tools.purchase_analytics import PurchaseAnalytics, _singular
+
+# 'cheapest' (lowest recent unit price) or 'fastest' (shortest lead_days, then price)
+ROUTING_STRATEGY = os.getenv('SUPPLIER_ROUTING', 'cheapest')
+# unit price = mean over each supplier's last N purchases of the item
+RECENT_PURCHASES = int(os.getenv('SUPPLIER_RECENT_PURCHASES', '5'))
+
+
+def _item_key(name):
+    return _singular(str(name).strip().lower())
+
+
+class SupplierRouter:
+    """
+    Picks a supplier per item from purchases.csv and groups order lines by destination phone.
+    Phones (and optional lead_days) come from suppliers.csv (supplier,phone[,lead_days]); items
+    never bought before, or bought from a supplier without a phone, go to `default_phone`.
+    """
+
+    def __init__(self, purchases_path='data/purchases.csv', contacts_path=None, default_phone=None,
+                 strategy=ROUTING_STRATEGY):
+        self.analytics = PurchaseAnalytics(purchases_path)
+        self.contacts_path = Path(contacts_path) if contacts_path else Path(purchases_path).with_name('suppliers.csv')
+        self.default_phone = default_phone
+        self.strategy = strategy
+        self._ranking = (None, None, None)  # (purchases frame, contacts, ranking)
+        self._contacts = (None, {})
+        self._lock = threading.Lock()
+
+    def contacts(self):
+        """supplier name -> {'phone', 'lead_days'}; re-read only when suppliers.csv changes."""
+        if not self.contacts_path.exists():
+            with self._lock:
+                if self._contacts[0] is not None:
+                    self._contacts = (None, {})
+                return self._contacts[1]
+        key = _file_key(self.contacts_path)
+        with self._lock:
+            if self._contacts[0] == key:
+                return self._contacts[1]
+        df = pd.read_csv(self.contacts_path, dtype={'phone': str})
+        if 'lead_days' not in df.columns:
+            df['lead_days'] = np.nan
+        contacts = {
+            str(r.supplier).strip(): {'phone': str(r.phone).strip(), 'lead_days': float(r.lead_days)}
+            for r in df.dropna(subset=['supplier', 'phone']).itertuples()
+        }
+        with self._lock:
+            self._contacts = (key, contacts)
+        return contacts
+
+    def ranking(self):
+        """Best supplier per item_key: one group-by over the purchase history, cached per file version."""
+        df = self.analytics.frame()
+        contacts = self.contacts()
+        with self._lock:
+            if self._ranking[0] is df and self._ranking[1] is contacts:
+                return self._ranking[2]
+
+        rows = df.dropna(subset=['unit_price', 'item_key']).sort_values('date')
+        recent = rows.groupby(['item_key', 'supplier']).tail(RECENT_PURCHASES)
+        by = (recent.groupby(['item_key', 'supplier'], as_index=False)
+              .agg(unit_price=('unit_price', 'mean'), purchases=('unit_price', 'size'), last=('date', 'max')))
+        by['phone'] = by['supplier'].map(lambda s: contacts.get(s, {}).get('phone'))
+        by['lead_days'] = by['supplier'].map(lambda s: contacts.get(s, {}).get('lead_days', np.nan))
+        by['unreachable'] = by['phone'].isna()
+        order = ['lead_days', 'unit_price'] if self.strategy == 'fastest' else ['unit_price', 'lead_days']
+        # suppliers we can message first; ties go to the supplier used most recently
+        by = by.sort_values(['item_key', 'unreachable', *order, 'last'], ascending=[True, True, True, True, False],
+                            na_position='last')
+        best = by.drop_duplicates('item_key').set_index('item_key')
+        with self._lock:
+            self._ranking = (df, contacts, best)
+        return best
+
+    def split(self, orders, default_phone=None):
+        """
+        [{'supplier', 'phone', 'orders'}] with one entry per destination phone, in first-seen order.
+        Each order line gets 'supplier' and 'unit_price' (None when unknown).
+        """
+        best = self.ranking()
+        groups = {}
+        for o in orders:
+            key = _item_key(o['item'])
+            row = best.loc[key] if key in best.index else None
+            supplier = row['supplier'] if row is not None else None
+            phone = row['phone'] if row is not None and isinstance(row['phone'], str) else None
+            if phone is None:
+                # no known contact: the store's default supplier line, as before
+                phone, label = default_phone or self.default_phone, 'default'
+            else:
+                label = supplier
+            line = dict(o, supplier=supplier,
+                        unit_price=round(float(row['unit_price']), 2) if row is not None else None)
+            g = groups.setdefault(phone, {'supplier': label, 'phone': phone, 'orders': []})
+            g['orders'].append(line)
+        return list(groups.values())
@@ -1,12 +1,23 @@
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
 load_dotenv()
 from twilio.rest import Client
 
+try:
+    import httpx
+except ImportError:  # asend falls back to the sync client in a thread
+    httpx = None
+
 
 TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID')
 TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
 TWILIO_WHATSAPP_FROM = os.getenv('TWILIO_WHATSAPP_FROM')
+TWILIO_API = 'https://api.twilio.com/2010-04-01'
+SEND_TIMEOUT = float(os.getenv('WHATSAPP_SEND_TIMEOUT', '15'))
+# simulated provider latency for the stub (benchmarks / demos without Twilio credentials)
+STUB_DELAY = float(os.getenv('WHATSAPP_STUB_DELAY', '0'))
 
 
 class WhatsAppTool:
@@ -15,10 +26,13 @@ class WhatsAppTool:
             self.client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
         else:
             self.client = None
+        self._http = None  # shared httpx.AsyncClient, created on first asend
 
 
     def send(self, to_number: str, body: str):
         if not self.client:
+            if STUB_DELAY:
+                time.sleep(STUB_DELAY)
             print('[WhatsApp Stub] TO:', to_number, '', body)
             return {'status': 'stubbed', 'body': body}
         msg = self.client.messages.create(
@@ -26,4 +40,34 @@ class WhatsAppTool:
         from_=TWILIO_WHATSAPP_FROM,
         to=to_number
         )
-        return {'sid': msg.sid}
\ No newline at end of file
+        return {'sid': msg.sid}
+
+
+    async def asend(self, to_number: str, body: str):
+        """Non-blocking send over one pooled HTTP session (keep-alive across messages)."""
+        if not self.client:
+            if STUB_DELAY:
+                await asyncio.sleep(STUB_DELAY)
+            print('[WhatsApp Stub] TO:', to_number, '', body)
+            return {'status': 'stubbed', 'body': body}
+        if httpx is None:
+            return await asyncio.to_thread(self.send, to_number, body)
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=TWILIO_API,
+                auth=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN),
+                timeout=SEND_TIMEOUT,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=20),
+            )
+        r = await self._http.post(
+            f'/Accounts/{TWILIO_ACCOUNT_SID}/Messages.json',
+            data={'From': TWILIO_WHATSAPP_FROM, 'To': to_number, 'Body': body},
+        )
+        r.raise_for_status()
+        return {'sid': r.json().get('sid')}
+
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
@@ -336,6 +336,31 @@ with tab1:
                 with col3:
                     st.metric("Unique Products", df['item'].nunique() if 'item' in df else 0)
 
+                if st.button('📈 Simulate stockout risk', use_container_width=False):
+                    with st.spinner('Simulating demand paths...'):
+                        sim = requests.post(f'{API}/order/simulate',
+                                            json={'orders': data['orders'], 'top': 20}).json()
+                    if 'summary' in sim:
+                        summary = sim['summary']
+                        c1, c2, c3 = st.columns(3)
+                        c1.metric("Items at Risk", f"{summary['at_risk']} / {summary['items']}")
+                        c2.metric("Expected Lost Units", f"{summary['expected_lost_units']:,.1f}")
+                        c3.metric("Holding Cost", f"₹{summary['holding_cost']:,.2f}")
+                        st.dataframe(
+                            pd.DataFrame(sim['items'])[['item', 'on_hand', 'order_qty', 'stockout_prob',
+                                                        'expected_lost', 'expected_leftover']],
+                            use_container_width=True,
+                            hide_index=True,
+                            column_config={
+                                "stockout_prob": st.column_config.ProgressColumn(
+                                    "Stockout Risk", min_value=0.0, max_value=1.0, format="%.2f"),
+                            }
+                        )
+                    else:
+                        st.error(f"❌ Simulation failed: {sim.get('detail')}")
+
+                split = st.checkbox('Split by supplier (cheapest per item from purchase history)', value=False)
+
                 # Confirmation buttons
                 st.markdown("<br>", unsafe_allow_html=True)
                 col1, col2, col3, col4, col5 = st.columns([1, 1.5, 0.5, 1.5, 1])
@@ -346,7 +371,8 @@ with tab1:
                             try:
                                 confirm_payload = {
                                     'orders': data['orders'],
-                                    'store_name': 'My Store'
+                                    'store_name': 'My Store',
+                                    'split_by_supplier': split
                                 }
                                 r = requests.post(f'{API}/order/confirm', json=confirm_payload)
                                 result = r.json()
@@ -355,8 +381,16 @@ with tab1:
                                     st.success('✅ Order sent successfully via WhatsApp!')
                                     st.session_state.show_confirmation = False
                                     st.session_state.order_preview = None
+                                elif result.get('status') == 'partial':
+                                    st.warning(f"⚠️ {result.get('message')}")
+                                    st.session_state.show_confirmation = False
+                                    st.session_state.order_preview = None
                                 else:
                                     st.error(f"❌ Failed to send: {result.get('message')}")
+                                for d in result.get('dispatches', []):
+                                    icon = '✅' if d['status'] == 'sent' else '❌'
+                                    st.write(f"{icon} {d['supplier']} ({d['phone']}): {len(d['orders'])} item(s)"
+                                             + (f" — {d['error']}" if d.get('error') else ''))
                             except Exception as e:
                                 st.error(f"❌ Error: {str(e)}")
 
@@ -410,6 +444,20 @@ with tab2:
                 except Exception as e:
                     st.error(f"❌ Error: {str(e)}")
 
+
+def answer_card(answer):
+    return f"""
+    <div style="background: linear-gradient(135deg, rgba(66, 135, 245, 0.2) 0%, rgba(59, 89, 152, 0.2) 100%); 
+                padding: 1.5rem; 
+                border-radius: 8px; 
+                border-left: 4px solid #4287f5;
+                color: #ffffff;
+                backdrop-filter: blur(10px);">
+        {answer}
+    </div>
+    """
+
+
 # Tab 3: Supplier Hub
 with tab3:
     st.markdown("<br>", unsafe_allow_html=True)
@@ -434,27 +482,17 @@ with tab3:
         if st.button('🔎 Search', use_container_width=True) and q:
             with st.spinner('Analyzing purchase data...'):
                 try:
-                    r = requests.post(f'{API}/supplier/query', json={'query': q})
-                    data = r.json()
-
                     st.markdown("### 📝 Answer")
-                    if isinstance(data, dict):
-                        if 'answer' in data or 'response' in data:
-                            answer = data.get('answer') or data.get('response')
-                            st.markdown(f"""
-                            <div style="background: linear-gradient(135deg, rgba(66, 135, 245, 0.2) 0%, rgba(59, 89, 152, 0.2) 100%); 
-                                        padding: 1.5rem; 
-                                        border-radius: 8px; 
-                                        border-left: 4px solid #4287f5;
-                                        color: #ffffff;
-                                        backdrop-filter: blur(10px);">
-                                {answer}
-                            </div>
-                            """, unsafe_allow_html=True)
-                        else:
-                            st.json(data)
-                    else:
-                        st.write(data)
+                    answer_box = st.empty()
+                    answer = ''
+                    # tokens are rendered as the API streams them
+                    with requests.post(f'{API}/supplier/query/stream', json={'query': q}, stream=True) as r:
+                        r.raise_for_status()
+                        for chunk in r.iter_content(chunk_size=None, decode_unicode=True):
+                            answer += chunk
+                            answer_box.markdown(answer_card(answer), unsafe_allow_html=True)
+                    if not answer:
+                        answer_box.info("No answer returned.")
                 except Exception as e:
                     st.error(f"❌ Error: {str(e)}")
 
@@ -477,104 +515,95 @@ with tab4:
 
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
-        # Limit selector
-        limit = st.selectbox("📊 Number of orders to display", [10, 25, 50, 100], index=2)
+        # Page size selector
+        # a new page size starts again from the newest orders (the old offset may be past the end)
+        limit = st.selectbox("📊 Orders per page", [10, 25, 50, 100], index=0,
+                             on_change=lambda: st.session_state.update(history_page=0))
+        if 'history_page' not in st.session_state:
+            st.session_state.history_page = 0
 
         if st.button('🔄 Refresh History', use_container_width=True):
             st.rerun()
 
-    # Fetch order history
+    # Fetch one page of per-order aggregates (grouped on the server)
     try:
         with st.spinner('Loading order history...'):
-            r = requests.get(f'{API}/order/history', params={'limit': limit})
+            r = requests.get(f'{API}/order/summary',
+                             params={'offset': st.session_state.history_page * limit, 'limit': limit})
             data = r.json()
 
-            if 'orders' in data and len(data['orders']) > 0:
-                orders = data['orders']
-                df = pd.DataFrame(orders)
-
-                # Display summary metrics
-                st.markdown("### 📊 Summary")
-                col1, col2, col3, col4 = st.columns(4)
-
-                with col1:
-                    st.metric("Total Orders", df['order_id'].nunique() if 'order_id' in df else 0)
-                with col2:
-                    st.metric("Total Items", len(df))
-                with col3:
-                    st.metric("Unique Products", df['item'].nunique() if 'item' in df else 0)
-                with col4:
-                    total_qty = df['qty'].sum() if 'qty' in df else 0
-                    st.metric("Total Quantity", f"{total_qty:,.0f}")
-
-                # Display order history table
-                st.markdown("### 📋 Detailed Order History")
-
-                # Reorder columns for better display
-                display_columns = ['order_id', 'timestamp', 'item', 'qty', 'unit', 'status']
-                df_display = df[display_columns] if all(col in df.columns for col in display_columns) else df
-
-                st.dataframe(
-                    df_display,
-                    use_container_width=True,
-                    hide_index=True,
-                    column_config={
-                        "order_id": st.column_config.TextColumn("📋 Order ID", width="medium"),
-                        "timestamp": st.column_config.TextColumn("🕒 Date & Time", width="medium"),
-                        "item": st.column_config.TextColumn("🏷️ Item", width="medium"),
-                        "qty": st.column_config.NumberColumn("📊 Quantity", width="small", format="%d"),
-                        "unit": st.column_config.TextColumn("📦 Unit", width="small"),
-                        "status": st.column_config.TextColumn("✅ Status", width="small")
-                    }
-                )
-
-                # Group by order_id to show individual orders
-                if 'order_id' in df.columns:
-                    st.markdown("### 📦 Orders Grouped by Order ID")
-
-                    # Get unique order IDs (most recent first)
-                    unique_orders = df['order_id'].unique()[:10]  # Show last 10 orders
-
-                    for order_id in unique_orders:
-                        order_items = df[df['order_id'] == order_id]
-                        timestamp = order_items.iloc[0]['timestamp'] if 'timestamp' in order_items else 'N/A'
-                        status = order_items.iloc[0]['status'] if 'status' in order_items else 'N/A'
-
-                        with st.expander(f"🔖 Order #{order_id} - {timestamp} ({len(order_items)} items)"):
-                            col1, col2 = st.columns([2, 1])
-                            with col1:
-                                st.write(f"**Status:** {status}")
-                                st.write(f"**Total Items:** {len(order_items)}")
-                            with col2:
-                                total = order_items['qty'].sum() if 'qty' in order_items else 0
-                                st.write(f"**Total Qty:** {total}")
-
-                            # Show items in this order
-                            order_display = order_items[['item', 'qty', 'unit']]
-                            st.dataframe(
-                                order_display,
-                                use_container_width=True,
-                                hide_index=True,
-                                column_config={
-                                    "item": "Item",
-                                    "qty": "Quantity",
-                                    "unit": "Unit"
-                                }
-                            )
-
-                # Download button
-                st.markdown("### 💾 Export Data")
-                csv = df.to_csv(index=False)
-                st.download_button(
-                    label="📥 Download Order History as CSV",
-                    data=csv,
-                    file_name=f"order_history_{datetime.now().strftime('%Y%m%d')}.csv",
-                    mime="text/csv",
-                    use_container_width=True
-                )
+        if data.get('orders'):
+            totals = data.get('totals', {})
+
+            # Display summary metrics (whole history)
+            st.markdown("### 📊 Summary")
+            col1, col2, col3, col4 = st.columns(4)
+
+            with col1:
+                st.metric("Total Orders", totals.get('orders', data['total']))
+            with col2:
+                st.metric("Total Items", totals.get('lines', 0))
+            with col3:
+                st.metric("Unique Products", totals.get('unique_items', 0))
+            with col4:
+                st.metric("Total Quantity", f"{totals.get('total_qty', 0):,.0f}")
+
+            st.markdown("### 📋 Orders")
+            df = pd.DataFrame(data['orders'])
+            st.dataframe(
+                df[['order_id', 'timestamp', 'items', 'total_qty', 'status']],
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "order_id": st.column_config.TextColumn("📋 Order ID", width="medium"),
+                    "timestamp": st.column_config.TextColumn("🕒 Date & Time", width="medium"),
+                    "items": st.column_config.NumberColumn("🏷️ Items", width="small"),
+                    "total_qty": st.column_config.NumberColumn("📊 Total Qty", width="small", format="%d"),
+                    "status": st.column_config.TextColumn("✅ Status", width="small")
+                }
+            )
+
+            # Pagination
+            pages = max(1, -(-data['total'] // limit))
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                if st.button('⬅️ Newer', use_container_width=True, disabled=st.session_state.history_page == 0):
+                    st.session_state.history_page -= 1
+                    st.rerun()
+            with col2:
+                st.markdown(f"<p style='text-align:center'>Page {st.session_state.history_page + 1} of {pages}</p>",
+                            unsafe_allow_html=True)
+            with col3:
+                if st.button('Older ➡️', use_container_width=True,
+                             disabled=st.session_state.history_page + 1 >= pages):
+                    st.session_state.history_page += 1
+                    st.rerun()
 
-            else:
-                st.info("📭 No order history found. Place your first order to see it here!")
+            # Lines are fetched only for the order being looked at
+            st.markdown("### 📦 Order Details")
+            labels = {f"#{o['order_id']} - {o['timestamp']} ({o['items']} items)": o['order_id'] for o in data['orders']}
+            choice = st.selectbox("Select an order", list(labels))
+            if choice:
+                detail = requests.get(f"{API}/order/{labels[choice]}").json()
+                lines = pd.DataFrame(detail.get('lines', []))
+                if not lines.empty:
+                    st.dataframe(
+                        lines[['item', 'qty', 'unit']],
+                        use_container_width=True,
+                        hide_index=True,
+                        column_config={
+                            "item": "Item",
+                            "qty": "Quantity",
+                            "unit": "Unit"
+                        }
+                    )
+
+            # Download link: the API streams the CSV, nothing is serialized here
+            st.markdown("### 💾 Export Data")
+            st.link_button("📥 Download Order History as CSV", f"{API}/order/export", use_container_width=True)
+
+        else:
+            st.info("📭 No order history found. Place your first order to see it here!")
 
     except Exception as e:
-        st.error(f"❌ Error loading order history: {str(e)}")
\ No newline at end of file
+        st.error(f"❌ Error loading order history: {str(e)}")
@@ -1,4 +1,10 @@
+import os
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+
 import numpy as np
+import pandas as pd
 
 
 def simple_forecast(avg_daily, days_ahead=3):
@@ -8,4 +14,244 @@ def simple_forecast(avg_daily, days_ahead=3):
         daily = float(arr.mean()) if len(arr)>0 else 0.0
     else:
         daily = float(avg_daily or 0.0)
-    return int(np.ceil(daily * days_ahead))
\ No newline at end of file
+    return int(np.ceil(daily * days_ahead))
+
+
+def forecast_demand(avg_daily, days_ahead=3):
+    """Vectorized simple_forecast: one ceil(daily * days_ahead) per element of avg_daily."""
+    daily = np.nan_to_num(np.asarray(avg_daily, dtype=float), nan=0.0)
+    return np.ceil(daily * days_ahead).astype(np.int64)
+
+
+# ---------------------------------------------------------------------------
+# Per-item demand model: additive exponential smoothing with weekly seasonality
+#
+#   forecast(t)  = level + season[weekday(t)]
+#   level       <- alpha * (y - season[wd]) + (1 - alpha) * level
+#   season[wd]  <- gamma * (y - level) + (1 - gamma) * season[wd]
+#
+# alpha/gamma are picked per item from a small grid by one-step-ahead SSE. All items and all
+# grid points advance together, one day per step, so a fit is O(days) NumPy operations.
+# ---------------------------------------------------------------------------
+ALPHAS = np.array([0.05, 0.1, 0.2, 0.3, 0.5])
+GAMMAS = np.array([0.05, 0.1, 0.2, 0.3])
+HISTORY_DAYS = int(os.getenv('FORECAST_HISTORY_DAYS', '182'))
+REFIT_DAYS = int(os.getenv('FORECAST_REFIT_DAYS', '7'))   # refit params weekly, smooth new days in between
+MIN_ACTIVE_DAYS = 3       # fewer days with demand -> fall back to avg_daily_sales
+FIT_CHUNK = 10_000        # items per fitting block, bounds memory to ~FIT_CHUNK * grid * 7 floats
+
+
+def daily_matrix(df, start, end, item_col='item', date_col=None, qty_col='qty'):
+    """(items, Y) with Y[i, d] = units of item i on day start + d, zero-filled, from one group-by."""
+    # sales.csv has 'date', the order log has 'timestamp'
+    date_col = date_col or ('date' if 'date' in df.columns else 'timestamp')
+    if 'status' in df.columns:
+        # only delivered orders are demand: a failed dispatch and its retry would count twice
+        df = df[df['status'].astype(str).str.strip().str.lower() == 'sent']
+    days = (end - start).days + 1
+    day = pd.to_datetime(df[date_col], errors='coerce').dt.normalize()
+    ok = day.notna() & (day >= pd.Timestamp(start)) & (day <= pd.Timestamp(end))
+    sub = pd.DataFrame({
+        'item': df.loc[ok, item_col].astype(str),
+        'd': (day[ok] - pd.Timestamp(start)).dt.days,
+        'q': pd.to_numeric(df.loc[ok, qty_col], errors='coerce').fillna(0),
+    })
+    codes, items = pd.factorize(sub['item'], sort=True)
+    Y = np.zeros((len(items), max(days, 0)))
+    np.add.at(Y, (codes, sub['d'].to_numpy()), sub['q'].to_numpy(dtype=float))
+    return list(items), Y
+
+
+def _weekdays(start, n):
+    return (start.weekday() + np.arange(n)) % 7
+
+
+def _init_state(Y, start):
+    """Level = mean of the first two weeks, season = weekday means minus that level."""
+    head = Y[:, :14]
+    level = head.mean(axis=1)
+    season = np.zeros((len(Y), 7))
+    wd = _weekdays(start, head.shape[1])
+    for d in range(7):
+        cols = wd == d
+        if cols.any():
+            season[:, d] = head[:, cols].mean(axis=1) - level
+    return level, season
+
+
+def _smooth(Y, start, level, season, alpha, gamma, sse=None, warmup=7):
+    """
+    Run the recursion over Y's columns. level: (..., ), season: (..., 7); alpha/gamma broadcast
+    against level. Updates state in place; accumulates squared one-step errors into sse.
+    """
+    for t, wd in enumerate(_weekdays(start, Y.shape[1])):
+        y = Y[:, t][:, None] if level.ndim == 2 else Y[:, t]
+        s = season[..., wd]
+        if sse is not None and t >= warmup:
+            sse += (y - (level + s)) ** 2
+        level[...] = alpha * (y - s) + (1 - alpha) * level
+        season[..., wd] = gamma * (y - level) + (1 - gamma) * s
+    return level, season
+
+
+def fit_smoothing(Y, start):
+    """Vectorized grid fit for every row of Y. Returns alpha, gamma, level, season (end-of-series state)."""
+    n = len(Y)
+    ga, gg = np.meshgrid(ALPHAS, GAMMAS, indexing='ij')
+    ga, gg = ga.ravel(), gg.ravel()
+    alpha, gamma = np.empty(n), np.empty(n)
+    level, season = np.empty(n), np.empty((n, 7))
+    for lo in range(0, n, FIT_CHUNK):
+        y = Y[lo:lo + FIT_CHUNK]
+        l0, s0 = _init_state(y, start)
+        L = np.repeat(l0[:, None], len(ga), axis=1)                 # (m, grid)
+        S = np.repeat(s0[:, None, :], len(ga), axis=1)              # (m, grid, 7)
+        sse = np.zeros_like(L)
+        _smooth(y, start, L, S, ga[None, :], gg[None, :], sse)
+        best = sse.argmin(axis=1)
+        rows = np.arange(len(y))
+        alpha[lo:lo + len(y)], gamma[lo:lo + len(y)] = ga[best], gg[best]
+        level[lo:lo + len(y)], season[lo:lo + len(y)] = L[rows, best], S[rows, best]
+    return alpha, gamma, level, season
+
+
+class DemandForecaster:
+    """
+    Per-item demand forecasts from dated demand history (sales.csv if present, else the order log
+    as a proxy). Fitted parameters and end-of-series state live in an .npz next to the data:
+    days added since the last run are smoothed into the stored state, and the grid fit is
+    only redone every REFIT_DAYS days or for items seen for the first time.
+    """
+
+    def __init__(self, history_path='data/orders.csv', state_path=None, sales_path='data/sales.csv', history=None):
+        sales = Path(sales_path) if sales_path else None
+        self.history_path = sales if sales is not None and sales.exists() else Path(history_path)
+        # order log object (frame() / version(), cached by the log) used instead of re-reading the CSV
+        # when there is no sales.csv
+        self.history = history if self.history_path != sales else None
+        self.state_path = Path(state_path) if state_path else self.history_path.with_name('demand_model.npz')
+        self.state = None
+        self._source_key = None
+        self._lock = threading.Lock()
+        self._load_state()
+
+    # ---------- persistence ----------
+    def _load_state(self):
+        if not self.state_path.exists():
+            return
+        try:
+            with np.load(self.state_path) as z:
+                self.state = {k: z[k] for k in z.files}
+            self.state['items'] = self.state['items'].tolist()
+        except (OSError, ValueError, KeyError) as e:
+            print(f'Ignoring demand model state: {e}')
+            self.state = None
+
+    def _save_state(self):
+        st = self.state
+        tmp = self.state_path.with_name(self.state_path.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            np.savez(f, items=np.array(st['items'], dtype=str), alpha=st['alpha'], gamma=st['gamma'],
+                     level=st['level'], season=st['season'], active_days=st['active_days'],
+                     last_date=st['last_date'], fitted_on=st['fitted_on'])
+        os.replace(tmp, self.state_path)
+
+    # ---------- fitting ----------
+    def refresh(self, today=None):
+        """Bring the model up to yesterday (the last complete day). Cheap when nothing changed."""
+        end = (today or date.today()) - timedelta(days=1)
+        if self.history is not None:
+            key = (self.history.version(), end.isoformat())
+        elif self.history_path.exists():
+            key = (self.history_path.stat().st_mtime_ns, self.history_path.stat().st_size, end.isoformat())
+        else:
+            return self.state
+        with self._lock:
+            if key == self._source_key:
+                return self.state
+            df = self.history.frame() if self.history is not None else pd.read_csv(self.history_path)
+            st = self.state
+            last = date.fromisoformat(str(st['last_date'])) if st is not None else None
+            fitted_on = date.fromisoformat(str(st['fitted_on'])) if st is not None else None
+
+            changed = False
+            if st is None or (end - fitted_on).days >= REFIT_DAYS:
+                start = end - timedelta(days=HISTORY_DAYS - 1)
+                items, Y = daily_matrix(df, start, end)
+                alpha, gamma, level, season = fit_smoothing(Y, start)
+                self.state = {'items': items, 'alpha': alpha, 'gamma': gamma, 'level': level, 'season': season,
+                              'active_days': (Y > 0).sum(axis=1), 'last_date': np.array(end.isoformat()),
+                              'fitted_on': np.array(end.isoformat())}
+                changed = True
+            elif last < end:
+                changed = self._update(df, last + timedelta(days=1), end) > 0
+            # new rows for today (not complete yet) or a touched file leave the state as it is
+            if changed:
+                self._save_state()
+            self._source_key = key
+            return self.state
+
+    def _update(self, df, start, end):
+        """
+        Smooth only the new days [start, end] into the stored state; new items get a fit.
+        Returns the number of days consumed (0 leaves the state untouched).
+        """
+        st = self.state
+        items, Y = daily_matrix(df, start, end)
+        if Y.shape[1] == 0:
+            return 0
+        pos = {name: i for i, name in enumerate(st['items'])}
+        known = np.array([name in pos for name in items], dtype=bool)
+        idx = np.array([pos[name] for name, k in zip(items, known) if k], dtype=int)
+
+        # every known item advances through the new days, zero demand if it had none
+        Yall = np.zeros((len(st['items']), Y.shape[1]))
+        if idx.size:
+            Yall[idx] = Y[known]
+        level, season = st['level'].copy(), st['season'].copy()
+        _smooth(Yall, start, level, season, st['alpha'], st['gamma'])
+        st['level'], st['season'] = level, season
+        st['active_days'] = st['active_days'] + (Yall > 0).sum(axis=1)
+
+        if (~known).any():
+            # first seen since the last fit: fit on the new days alone until the next weekly refit
+            new_items = [name for name, k in zip(items, known) if not k]
+            a, g, l, s = fit_smoothing(Y[~known], start)
+            st['items'] = st['items'] + new_items
+            for k, v in (('alpha', a), ('gamma', g), ('level', l), ('season', s),
+                         ('active_days', (Y[~known] > 0).sum(axis=1))):
+                st[k] = np.concatenate([st[k], v])
+        st['last_date'] = np.array(end.isoformat())
+        return Y.shape[1]
+
+    # ---------- forecasting ----------
+    def forecast(self, items, days_ahead=3, fallback_avg=None, today=None):
+        """
+        Units needed over the next `days_ahead` days for each item (int array). Items without
+        enough history use ceil(fallback_avg * days_ahead), like simple_forecast.
+        """
+        items = [str(i) for i in items]
+        n = len(items)
+        fallback = forecast_demand(fallback_avg if fallback_avg is not None else np.ones(n), days_ahead)
+        try:
+            st = self.refresh(today)
+        except Exception as e:
+            print(f'Demand model unavailable, using avg_daily_sales: {e}')
+            return fallback
+        if st is None or not st['items']:
+            return fallback
+
+        pos = {name: i for i, name in enumerate(st['items'])}
+        idx = np.array([pos.get(name, -1) for name in items])
+        usable = idx >= 0
+        usable[usable] = st['active_days'][idx[usable]] >= MIN_ACTIVE_DAYS
+        if not usable.any():
+            return fallback
+
+        sel = idx[usable]
+        last = date.fromisoformat(str(st['last_date']))
+        wd = _weekdays(last + timedelta(days=1), days_ahead)
+        daily = np.maximum(st['level'][sel][:, None] + st['season'][sel][:, wd], 0.0)
+        out = fallback.copy()
+        out[usable] = np.ceil(daily.sum(axis=1)).astype(np.int64)
+        return out
@@ -0,0 +1,54 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Answers keyed by question embedding. A lookup hits when a cached question's cosine similarity
+    is >= threshold and it was answered against the same index `version` (so new purchases
+    invalidate old answers). LRU-bounded, entries expire after `ttl` seconds.
+    """
+
+    def __init__(self, threshold=0.95, max_entries=256, ttl=3600):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # id -> (unit vector, answer, version, created_at)
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vec):
+        v = np.asarray(vec, dtype=np.float32)
+        n = np.linalg.norm(v)
+        return v / n if n else v
+
+    def get(self, vec, version=None):
+        q = self._unit(vec)
+        now = time.time()
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if now - e[3] > self.ttl or e[2] != version]:
+                del self._entries[key]
+            if not self._entries:
+                return None
+            keys = list(self._entries)
+            sims = np.stack([self._entries[k][0] for k in keys]) @ q
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                return None
+            self._entries.move_to_end(keys[best])
+            return self._entries[keys[best]][1]
+
+    def put(self, vec, answer, version=None):
+        with self._lock:
+            self._entries[self._next_id] = (self._unit(vec), answer, version, time.time())
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
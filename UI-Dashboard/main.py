@@ -5,7 +5,6 @@ import json
 import matplotlib.pyplot as plt
 import plotly.express as px
 import plotly.graph_objects as go
-import subprocess
 import re
 from collections import Counter
 from wordcloud import WordCloud
@@ -13,20 +12,20 @@ import time
 import math
 
 # Local imports (assumes these files are present)
-from scraper.amazon_scraper import extract_asin, get_product_title
-from scraper.flipkart_scraper import get_flipkart_title
 from analysis.sentiment_engine import analyze_sentiment, summarize_reviews
 from database.db_handler import (
     init_db, insert_review, fetch_reviews,
-    add_to_watchlist, get_watchlist, remove_from_watchlist
+    get_watchlist, remove_from_watchlist
 )
 from scheduler.scheduler import start_scheduler
+from scrape_queue import init_queue, enqueue_job, get_job, queue_position, live_workers
 
 # ---------------------------
 # Page config, DB init, scheduler
 # ---------------------------
 st.set_page_config(page_title="Client Sentiment Radar", layout="wide")
 init_db()
+init_queue()
 # start_scheduler()  # comment/uncomment based on dev needs
 start_scheduler()
 
@@ -136,71 +135,67 @@ url = st.text_input("Enter Amazon or Flipkart product URL:", key="product_url_in
 pages_to_scrape = st.slider("Pages to scrape (approx 10-20 reviews per page)", min_value=1, max_value=10, value=3, step=1)
 
 # ---------------------------
-# Analysis button — runs the scraper as a subprocess (run_scraper.py)
+# Analysis button — queues a job for the long-lived scraper worker (scraper_worker.py)
 # ---------------------------
 if st.button("Analyze Product", key="analyze_btn"):
     if not url or not url.strip():
         st.warning("Please paste a valid product URL.")
         st.stop()
-
-    st.info("🔎 Starting analysis — scraper will run in a separate process (may take some time)...")
-
-    # Call the external scraper which inserts into DB
-    try:
-        proc = subprocess.run(
-            ["python", "run_scraper.py", url, str(pages_to_scrape)],
-            capture_output=True,
-            text=True,
-            timeout=600  # 10 minutes; adjust if necessary
-        )
-    except subprocess.TimeoutExpired:
-        st.error("❌ Scraper timed out. Try a smaller pages-to-scrape value or run scraper separately.")
+    if not any(p in url.lower() for p in ("amazon", "flipkart")):
+        st.error("Unsupported platform.")
         st.stop()
 
-    if proc.returncode != 0:
-        st.error("❌ Scraper failed. See console output below:")
-        if proc.stderr:
-            st.code(proc.stderr)
-        if proc.stdout:
-            st.code(proc.stdout)
-        st.stop()
+    st.session_state["scrape_job_id"] = enqueue_job(url.strip(), pages_to_scrape)
+    st.rerun()
 
-    st.success("✅ Scraper completed and saved reviews to database.")
-
-    # Resolve platform + asin + product_name
-    try:
-        if "amazon" in url.lower():
-            platform = "Amazon"
-            asin = extract_asin(url)
-            product_name = get_product_title(asin)
-        elif "flipkart" in url.lower():
-            platform = "Flipkart"
-            asin = url.split("/")[-1][:10]
-            product_name = get_flipkart_title(url)
-        else:
-            st.error("Unsupported platform.")
-            st.stop()
-    except Exception as e:
-        st.error("Failed to extract product metadata.")
-        st.exception(e)
-        st.stop()
+# ---------------------------
+# Job progress — a fragment polls the scrape_jobs table every JOB_POLL_SECS while a job is
+# queued/running, so the rest of the page (including the last product) keeps rendering.
+# ---------------------------
+JOB_POLL_SECS = 1.5
 
-    # Add to watchlist (DB)
-    try:
-        add_to_watchlist(platform, asin, product_name, url)
-    except Exception as e:
-        st.warning("Watchlist add failed (non-fatal).")
-        print("Watchlist error:", e)
-    from database.db_handler import fetch_reviews as fetch_reviews_db
 
-    rows = fetch_reviews_db(asin)
-    if not rows:
-        st.warning("Scraper finished but no reviews were saved — check debug logs or try increasing pages.")
-    else:
-        st.session_state["last_asin"] = asin
-        st.session_state["last_name"] = product_name
-        st.session_state["last_platform"] = platform
+@st.fragment(run_every=JOB_POLL_SECS)
+def scrape_job_progress(job_id):
+    job = get_job(job_id)
+    if not job or job["status"] not in ("queued", "running"):
+        # finished: one full rerun shows the result and loads the product below
         st.rerun()
+    if not live_workers():
+        st.warning("⚠️ No scraper worker is running. Start one with `python scraper_worker.py` — "
+                   "the job stays queued until then.")
+    if job["status"] == "queued":
+        ahead = queue_position(job["id"])
+        st.info(f"🕒 Job #{job['id']} queued" + (f" ({ahead} ahead of it)." if ahead else "."))
+        return
+    stage = job["stage"] or "starting"
+    if stage == "analyzing" and job["reviews_found"]:
+        frac = 0.5 + 0.5 * job["reviews_saved"] / job["reviews_found"]
+        label = f"Analyzing reviews: {job['reviews_saved']}/{job['reviews_found']}"
+    elif stage == "saving":
+        frac, label = 1.0, "Saving product details..."
+    else:
+        frac = 0.5 * job["pages_done"] / max(job["pages"], 1)
+        label = f"Scraping pages: {job['pages_done']}/{job['pages']}"
+        if job["reviews_found"]:
+            label += f" ({job['reviews_found']} reviews so far)"
+    st.progress(min(frac, 1.0), text=f"🔎 Job #{job['id']} — {label}")
+
+
+job_id = st.session_state.get("scrape_job_id")
+job = get_job(job_id) if job_id else None
+if job:
+    if job["status"] in ("queued", "running"):
+        scrape_job_progress(job["id"])
+    elif job["status"] == "failed":
+        st.error(f"❌ Scraper job #{job['id']} failed: {job['message']}")
+        del st.session_state["scrape_job_id"]
+    else:
+        st.success(f"✅ Scraper completed — {job['message']}.")
+        del st.session_state["scrape_job_id"]
+        st.session_state["last_asin"] = job["asin"]
+        st.session_state["last_name"] = job["product_name"] or job["asin"]
+        st.session_state["last_platform"] = job["platform"]
 
 # ---------------------------
 # Helper: generate & render AI summary with robust fallback
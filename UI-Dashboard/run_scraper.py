@@ -1,15 +1,10 @@
 # run_scraper.py
+# Scrape + analyze + store for one product URL. Used by scraper_worker.py (scrape_and_store)
+# and still runnable on its own:  python run_scraper.py <url> [max_pages]
 import sys
 import json
 import io
-
-# Fix Windows stdout unicode if needed
-try:
-    import sys, io
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", errors="replace")
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8", errors="replace")
-except Exception:
-    pass
+import inspect
 
 from scraper.amazon_scraper import extract_asin, scrape_reviews
 from scraper.flipkart_scraper import scrape_flipkart
@@ -26,33 +21,50 @@ def safe_parse(result):
             return {"sentiment": "Unknown", "topics": []}
     return {"sentiment": "Unknown", "topics": []}
 
-def main():
-    if len(sys.argv) < 2:
-        print("ERROR: Missing URL argument")
-        sys.exit(2)
-
-    url = sys.argv[1]
-    max_pages = 3
-    if len(sys.argv) >= 3:
-        try:
-            max_pages = int(sys.argv[2])
-        except:
-            max_pages = 3
+def accepts(fn, name):
+    """True if `fn` takes a keyword argument `name` (or **kwargs)."""
+    try:
+        params = inspect.signature(fn).parameters
+    except (TypeError, ValueError):
+        return False
+    return name in params or any(p.kind == p.VAR_KEYWORD for p in params.values())
 
+def resolve_product(url):
+    """(platform, asin, scrape function, first positional arg) for a product URL."""
     if "amazon" in url.lower():
         asin = extract_asin(url)
-        reviews = scrape_reviews(asin, max_pages=max_pages)
-        platform = "Amazon"
+        return "Amazon", asin, scrape_reviews, asin
+    if "flipkart" in url.lower():
+        return "Flipkart", url.split("/")[-1][:10], scrape_flipkart, url
+    raise ValueError("Unsupported platform")
 
-    elif "flipkart" in url.lower():
-        asin = url.split("/")[-1][:10]
-        reviews = scrape_flipkart(url, max_pages=max_pages)
-        platform = "Flipkart"
+def scrape_and_store(url, max_pages=3, on_progress=None, context=None):
+    """
+    Scrape up to `max_pages` review pages, run sentiment on each review and insert it.
+    `on_progress(**fields)` gets stage / pages_done / reviews_found / reviews_saved updates.
+    A warm browser `context` and a per-page `on_page(page_no, reviews_so_far)` callback are
+    passed to the scraper only when its signature accepts them.
+    Returns {"platform", "asin", "reviews_found", "reviews_saved"}.
+    """
+    report = on_progress or (lambda **fields: None)
+    platform, asin, scrape, target = resolve_product(url)
 
+    kwargs = {"max_pages": max_pages}
+    if context is not None and accepts(scrape, "context"):
+        kwargs["context"] = context
+    per_page = accepts(scrape, "on_page")
+    if per_page:
+        kwargs["on_page"] = lambda page_no, found=0: report(pages_done=page_no, reviews_found=found)
+
+    report(stage="scraping", platform=platform, asin=asin)
+    reviews = scrape(target, **kwargs) or []
+    if per_page:
+        report(stage="analyzing", reviews_found=len(reviews))
     else:
-        print("ERROR: Unsupported platform")
-        sys.exit(1)
+        # no per-page hook: all requested pages are done once the scraper returns
+        report(stage="analyzing", pages_done=max_pages, reviews_found=len(reviews))
 
+    saved = 0
     for r in reviews:
         sentiment_raw = analyze_sentiment(r["text"])
         parsed = safe_parse(sentiment_raw)
@@ -66,6 +78,36 @@ def main():
             "sentiment": parsed.get("sentiment", "Unknown"),
             "topics": ", ".join(parsed.get("topics", []))
         })
+        saved += 1
+        report(reviews_saved=saved)
+
+    return {"platform": platform, "asin": asin, "reviews_found": len(reviews), "reviews_saved": saved}
+
+def main():
+    # Fix Windows stdout unicode if needed
+    try:
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", errors="replace")
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8", errors="replace")
+    except Exception:
+        pass
+
+    if len(sys.argv) < 2:
+        print("ERROR: Missing URL argument")
+        sys.exit(2)
+
+    url = sys.argv[1]
+    max_pages = 3
+    if len(sys.argv) >= 3:
+        try:
+            max_pages = int(sys.argv[2])
+        except:
+            max_pages = 3
+
+    try:
+        scrape_and_store(url, max_pages)
+    except ValueError:
+        print("ERROR: Unsupported platform")
+        sys.exit(1)
 
     print("OK")
     sys.exit(0)
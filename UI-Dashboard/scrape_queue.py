@@ -0,0 +1,187 @@
+# scrape_queue.py
+# Job queue shared by the dashboard (enqueue / poll) and scraper_worker.py (claim / progress).
+# Lives in the same SQLite file as the reviews; WAL mode lets the UI read while workers write.
+import os
+import socket
+import sqlite3
+import time
+from datetime import datetime
+
+DB = os.getenv("SCRAPE_DB", "reviews.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scrape_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    pages INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',      -- queued / running / done / failed
+    stage TEXT,                                 -- scraping / analyzing / saving / finished
+    pages_done INTEGER DEFAULT 0,
+    reviews_found INTEGER DEFAULT 0,
+    reviews_saved INTEGER DEFAULT 0,
+    platform TEXT,
+    asin TEXT,
+    product_name TEXT,
+    message TEXT,
+    worker TEXT,
+    created_at TEXT,
+    started_at TEXT,
+    finished_at TEXT,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_scrape_jobs_status ON scrape_jobs(status, id);
+CREATE TABLE IF NOT EXISTS scrape_workers (
+    name TEXT PRIMARY KEY,
+    pool_size INTEGER,
+    busy INTEGER DEFAULT 0,
+    heartbeat_at REAL
+);
+"""
+
+JOB_FIELDS = {
+    "status", "stage", "pages_done", "reviews_found", "reviews_saved", "platform", "asin",
+    "product_name", "message", "finished_at",
+}
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def connect():
+    conn = sqlite3.connect(DB, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def init_queue():
+    conn = connect()
+    conn.executescript(SCHEMA)
+    conn.close()
+
+
+def enqueue_job(url, pages):
+    conn = connect()
+    try:
+        cur = conn.execute(
+            "INSERT INTO scrape_jobs (url, pages, status, stage, created_at) VALUES (?, ?, 'queued', 'queued', ?)",
+            (url, int(pages), _now()),
+        )
+        return cur.lastrowid
+    finally:
+        conn.close()
+
+
+def get_job(job_id):
+    conn = connect()
+    try:
+        row = conn.execute("SELECT * FROM scrape_jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def recent_jobs(limit=10):
+    conn = connect()
+    try:
+        rows = conn.execute("SELECT * FROM scrape_jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(r) for r in rows]
+    finally:
+        conn.close()
+
+
+def queue_position(job_id):
+    """Number of queued jobs ahead of this one."""
+    conn = connect()
+    try:
+        return conn.execute(
+            "SELECT COUNT(*) FROM scrape_jobs WHERE status = 'queued' AND id < ?", (job_id,)
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+
+# ---------------------------
+# Worker side
+# ---------------------------
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_job(conn, worker):
+    """Atomically move the oldest queued job to running for `worker`; None if the queue is empty."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT id FROM scrape_jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute(
+            "UPDATE scrape_jobs SET status = 'running', stage = 'starting', worker = ?, started_at = ?, "
+            "heartbeat_at = ? WHERE id = ?",
+            (worker, _now(), time.time(), row["id"]),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return dict(conn.execute("SELECT * FROM scrape_jobs WHERE id = ?", (row["id"],)).fetchone())
+
+
+def update_job(conn, job_id, **fields):
+    """Set progress fields (see JOB_FIELDS) and refresh the job's heartbeat."""
+    unknown = set(fields) - JOB_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown job fields: {sorted(unknown)}")
+    sets = ", ".join(f"{k} = ?" for k in fields)
+    conn.execute(
+        f"UPDATE scrape_jobs SET {sets}{', ' if sets else ''}heartbeat_at = ? WHERE id = ?",
+        (*fields.values(), time.time(), job_id),
+    )
+
+
+def finish_job(conn, job_id, status, message=""):
+    update_job(conn, job_id, status=status, stage="finished", message=message, finished_at=_now())
+
+
+def requeue_stale(conn, max_age):
+    """Running jobs nobody is heart-beating any more (worker crashed or killed) go back to the queue."""
+    cur = conn.execute(
+        "UPDATE scrape_jobs SET status = 'queued', stage = 'requeued', worker = NULL "
+        "WHERE status = 'running' AND heartbeat_at < ?",
+        (time.time() - max_age,),
+    )
+    return cur.rowcount
+
+
+def touch_job(conn, job_id):
+    """Refresh one running job's heartbeat (called for as long as its worker slot is on it)."""
+    conn.execute(
+        "UPDATE scrape_jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running'", (time.time(), job_id)
+    )
+
+
+def worker_heartbeat(conn, worker, pool_size, busy):
+    """Mark the worker process alive (for the dashboard). Job heartbeats are per job, see touch_job."""
+    conn.execute(
+        "INSERT INTO scrape_workers (name, pool_size, busy, heartbeat_at) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET pool_size = excluded.pool_size, busy = excluded.busy, "
+        "heartbeat_at = excluded.heartbeat_at",
+        (worker, pool_size, busy, time.time()),
+    )
+
+
+def remove_worker(conn, worker):
+    conn.execute("DELETE FROM scrape_workers WHERE name = ?", (worker,))
+
+
+def live_workers(max_age=30):
+    conn = connect()
+    try:
+        rows = conn.execute(
+            "SELECT * FROM scrape_workers WHERE heartbeat_at >= ?", (time.time() - max_age,)
+        ).fetchall()
+        return [dict(r) for r in rows]
+    finally:
+        conn.close()
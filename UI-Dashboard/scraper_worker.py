@@ -0,0 +1,232 @@
+# scraper_worker.py
+# Long-lived scraper service: claims jobs that main.py puts in the scrape_jobs queue
+# (scrape_queue.py) and runs up to SCRAPER_WORKERS of them at once, each thread keeping its
+# own browser warm between jobs instead of paying a process + browser start per click.
+#
+#   python scraper_worker.py                 # pool size from SCRAPER_WORKERS (default 2)
+#   python scraper_worker.py --workers 4
+import argparse
+import os
+import shutil
+import threading
+import time
+import traceback
+from pathlib import Path
+
+import scrape_queue as q
+from run_scraper import accepts, scrape_and_store
+from scraper.amazon_scraper import get_product_title, scrape_reviews
+from scraper.flipkart_scraper import get_flipkart_title, scrape_flipkart
+from database.db_handler import add_to_watchlist
+
+POOL_SIZE = int(os.getenv("SCRAPER_WORKERS", "2"))
+POLL_SECS = float(os.getenv("SCRAPER_POLL_SECS", "1.0"))
+# running jobs whose heartbeat (JobHeartbeat, every HEARTBEAT_SECS) is older than this are requeued
+STALE_SECS = float(os.getenv("SCRAPER_STALE_SECS", "60"))
+HEARTBEAT_SECS = 5
+# progress writes are throttled to one per this interval (stage changes always go through)
+PROGRESS_SECS = 0.5
+HEADLESS = os.getenv("SCRAPER_HEADLESS", "1") != "0"
+PROFILE_DIR = Path.cwd() / "pw_profile"  # same dir as playwright_login.py
+
+# Warm browsers only help if the scrapers can be handed one; otherwise they open their own.
+WARM_CONTEXT = accepts(scrape_reviews, "context") or accepts(scrape_flipkart, "context")
+
+
+class WarmBrowser:
+    """
+    One persistent Playwright context per worker thread, launched on first use and reused
+    for every job that thread runs. Chromium locks a profile dir per process, so thread 0
+    uses pw_profile itself and the others get a copy of it (logged-in session included).
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self._pw = None
+        self.context = None
+
+    def profile_dir(self):
+        if self.index == 0:
+            return PROFILE_DIR
+        target = PROFILE_DIR.with_name(f"{PROFILE_DIR.name}_{self.index}")
+        if PROFILE_DIR.exists() and not target.exists():
+            shutil.copytree(PROFILE_DIR, target, ignore=shutil.ignore_patterns("Singleton*", "*.lock"))
+        return target
+
+    def get(self):
+        if self.context is None:
+            from playwright.sync_api import sync_playwright
+            self._pw = sync_playwright().start()
+            self.context = self._pw.chromium.launch_persistent_context(
+                user_data_dir=str(self.profile_dir()), headless=HEADLESS
+            )
+        return self.context
+
+    def close(self):
+        for closer in (getattr(self.context, "close", None), getattr(self._pw, "stop", None)):
+            try:
+                if closer:
+                    closer()
+            except Exception:
+                pass
+        self.context = None
+        self._pw = None
+
+
+class JobHeartbeat:
+    """
+    Keeps one job's heartbeat fresh while the worker thread that claimed it is inside this
+    block (a scrape without per-page hooks can be silent for minutes). It stops when the block
+    exits or that thread dies, so a job whose worker is gone turns stale and is requeued.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.owner = threading.current_thread()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f"job-{job_id}-heartbeat", daemon=True)
+
+    def _beat(self):
+        conn = q.connect()
+        try:
+            while not self._stop.wait(HEARTBEAT_SECS) and self.owner.is_alive():
+                try:
+                    q.touch_job(conn, self.job_id)
+                except Exception as e:
+                    print(f"heartbeat for job {self.job_id} failed: {e}")
+        finally:
+            conn.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class ScrapeWorker(threading.Thread):
+    def __init__(self, index, name, stop, busy):
+        super().__init__(name=f"scrape-worker-{index}", daemon=True)
+        self.index = index
+        self.worker = f"{name}/{index}"
+        self.stop = stop
+        self.busy = busy
+        self.browser = WarmBrowser(index)
+
+    def run(self):
+        # sqlite connections and Playwright's sync API both belong to the thread that made them
+        conn = q.connect()
+        try:
+            while not self.stop.is_set():
+                try:
+                    job = q.claim_job(conn, self.worker)
+                except Exception as e:
+                    # locked / unavailable DB: keep the slot alive and try again next poll
+                    print(f"[{self.worker}] claim failed: {e}")
+                    job = None
+                if job is None:
+                    self.stop.wait(POLL_SECS)
+                    continue
+                self.busy.add(self.index)
+                try:
+                    with JobHeartbeat(job["id"]):
+                        self.run_job(conn, job)
+                finally:
+                    self.busy.discard(self.index)
+        finally:
+            self.browser.close()
+            conn.close()
+
+    def run_job(self, conn, job):
+        """Run one claimed job; whatever goes wrong, the job ends up finished (done / failed)."""
+        print(f"[{self.worker}] job {job['id']}: {job['url']} ({job['pages']} pages)")
+        try:
+            status, message = self._scrape(conn, job)
+        except Exception as e:
+            traceback.print_exc()
+            # a crashed page can leave the context unusable; start a fresh one next job
+            self.browser.close()
+            status, message = "failed", f"{type(e).__name__}: {e}"[:500]
+        try:
+            q.finish_job(conn, job["id"], status, message)
+        except Exception as e:
+            # the heartbeat stops with this job, so requeue_stale picks it up again
+            print(f"[{self.worker}] could not finish job {job['id']}: {e}")
+            return
+        print(f"[{self.worker}] job {job['id']}: {status} — {message}")
+
+    def _scrape(self, conn, job):
+        last = {"t": 0.0, "stage": None}
+
+        def progress(**fields):
+            now = time.time()
+            stage = fields.get("stage", last["stage"])
+            if stage == last["stage"] and now - last["t"] < PROGRESS_SECS:
+                return
+            last.update(t=now, stage=stage)
+            q.update_job(conn, job["id"], **fields)
+
+        context = self.browser.get() if WARM_CONTEXT else None
+        result = scrape_and_store(job["url"], job["pages"], on_progress=progress, context=context)
+
+        q.update_job(conn, job["id"], stage="saving", reviews_found=result["reviews_found"],
+                     reviews_saved=result["reviews_saved"])
+        product_name = result["asin"]
+        try:
+            if result["platform"] == "Amazon":
+                product_name = get_product_title(result["asin"]) or product_name
+            else:
+                product_name = get_flipkart_title(job["url"]) or product_name
+        except Exception as e:
+            print(f"[{self.worker}] title lookup failed (non-fatal): {e}")
+        try:
+            add_to_watchlist(result["platform"], result["asin"], product_name, job["url"])
+        except Exception as e:
+            print(f"[{self.worker}] watchlist add failed (non-fatal): {e}")
+
+        q.update_job(conn, job["id"], product_name=product_name)
+        if result["reviews_saved"]:
+            return "done", f"{result['reviews_saved']} reviews saved"
+        return "failed", "No reviews were saved — check debug logs or try more pages."
+
+
+def serve(pool_size=POOL_SIZE):
+    q.init_queue()
+    name = q.worker_name()
+    conn = q.connect()
+    requeued = q.requeue_stale(conn, STALE_SECS)
+    if requeued:
+        print(f"Requeued {requeued} stale job(s)")
+
+    stop = threading.Event()
+    busy = set()
+    threads = [ScrapeWorker(i, name, stop, busy) for i in range(pool_size)]
+    for t in threads:
+        t.start()
+    print(f"Scraper worker {name} running with {pool_size} slot(s). Ctrl+C to stop.")
+
+    try:
+        while True:
+            try:
+                q.worker_heartbeat(conn, name, pool_size, len(busy))
+                q.requeue_stale(conn, STALE_SECS)
+            except Exception as e:
+                print(f"Worker heartbeat failed: {e}")
+            time.sleep(HEARTBEAT_SECS)
+    except KeyboardInterrupt:
+        print("Stopping — waiting for running jobs to finish...")
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+        q.remove_worker(conn, name)
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Long-lived scraper worker for the sentiment dashboard.")
+    parser.add_argument("--workers", type=int, default=POOL_SIZE, help="concurrent scrape jobs")
+    args = parser.parse_args()
+    serve(max(1, args.workers))